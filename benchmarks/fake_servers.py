@@ -0,0 +1,197 @@
+import abc
+import json
+import time
+import random
+import hashlib
+import threading
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Logins starting with this prefix don't exist on the fake GitHub.
+MISSING_PREFIX = "missing-"
+
+
+class FaultProfile:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, rate_limit_rate=0.0, error_rate=0.0, retry_after=1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+
+    def sleep(self):
+        delay_ms = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def fault(self):
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 503
+        return None
+
+
+def synthetic_user(login):
+    digest = hashlib.sha256(login.encode('utf-8')).hexdigest()
+    return {
+        "login": login,
+        "name": f"User {digest[:8]}",
+        "email": f"{login}@example.com",
+        "bio": f"Synthetic bio {digest[8:24]}",
+        "location": f"City {int(digest[24:26], 16)}",
+        "created_at": "2020-01-01T00:00:00Z",
+    }
+
+
+class _FakeServer(abc.ABC):
+    def __init__(self, profile=None):
+        self.profile = profile or FaultProfile()
+        self.requests = Counter()
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                server.profile.sleep()
+                status = server.profile.fault()
+                if status is not None:
+                    server.count(f"{self.command} {status}")
+                    self._reply(status, {"message": "Injected fault"}, {"Retry-After": str(server.profile.retry_after)})
+                    return
+                status, payload, headers = server.route(self.command, urlparse(self.path), self.headers, body)
+                server.count(f"{self.command} {status}")
+                self._reply(status, payload, headers)
+
+            def _reply(self, status, payload, headers=None):
+                data = json.dumps(payload).encode('utf-8') if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def count(self, key):
+        with self.lock:
+            self.requests[key] += 1
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @abc.abstractmethod
+    def route(self, method, url, headers, body):
+        # Returns (status, payload, headers) for one request.
+        ...
+
+
+class FakeGitHub(_FakeServer):
+    # REST /users/<login> with ETags and rate-limit headers, and aliased GraphQL user lookups.
+    def _rate_limit_headers(self):
+        return {"X-RateLimit-Limit": "1000000", "X-RateLimit-Remaining": "999999", "X-RateLimit-Reset": str(int(time.time()) + 60)}
+
+    def route(self, method, url, headers, body):
+        if method == "GET" and url.path.startswith("/users/"):
+            login = url.path[len("/users/"):]
+            if login.startswith(MISSING_PREFIX):
+                return 404, {"message": "Not Found"}, self._rate_limit_headers()
+            user = dict(synthetic_user(login), url=f"{self.url}/users/{login}")
+            etag = '"' + hashlib.sha256(json.dumps(user, sort_keys=True).encode('utf-8')).hexdigest() + '"'
+            response_headers = dict(self._rate_limit_headers(), ETag=etag)
+            if headers.get("If-None-Match") == etag:
+                return 304, None, response_headers
+            return 200, user, response_headers
+
+        if method == "POST" and url.path == "/graphql":
+            data = {}
+            errors = []
+            for alias, login in (body.get("variables") or {}).items():
+                if login.startswith(MISSING_PREFIX):
+                    data[alias] = None
+                    errors.append({"type": "NOT_FOUND", "path": [alias], "message": f"Could not resolve to a User with the login of '{login}'."})
+                else:
+                    user = synthetic_user(login)
+                    data[alias] = {
+                        "login": user["login"], "name": user["name"], "email": user["email"],
+                        "bio": user["bio"], "location": user["location"], "createdAt": user["created_at"],
+                    }
+            payload = {"data": data, "errors": errors} if errors else {"data": data}
+            return 200, payload, self._rate_limit_headers()
+
+        return 404, {"message": "Not Found"}, None
+
+
+class FakeFreshdesk(_FakeServer):
+    # In-memory contacts store behind POST/PUT/GET /api/v2/contacts.
+    def __init__(self, profile=None):
+        super().__init__(profile)
+        self.contacts = {}
+        self.emails = {}
+        self.next_id = 1
+
+    def _rate_limit_headers(self):
+        return {"X-RateLimit-Total": "1000000", "X-RateLimit-Remaining": "999999"}
+
+    def route(self, method, url, headers, body):
+        path = url.path.rstrip("/")
+        if method == "POST" and path == "/api/v2/contacts":
+            with self.lock:
+                if body.get("email") in self.emails:
+                    return 409, {"description": "Validation failed", "errors": [{
+                        "field": "email", "message": "It should be a unique value", "code": "duplicate_value",
+                        "additional_info": {"user_id": self.emails[body["email"]]},
+                    }]}, self._rate_limit_headers()
+                contact = dict(body, id=self.next_id)
+                self.next_id += 1
+                self.contacts[contact["id"]] = contact
+                if contact.get("email"):
+                    self.emails[contact["email"]] = contact["id"]
+            return 201, contact, self._rate_limit_headers()
+
+        if method == "PUT" and path.startswith("/api/v2/contacts/"):
+            contact_id = int(path.rsplit("/", 1)[1])
+            with self.lock:
+                if contact_id not in self.contacts:
+                    return 404, None, self._rate_limit_headers()
+                self.contacts[contact_id].update(body)
+                contact = dict(self.contacts[contact_id])
+            return 200, contact, self._rate_limit_headers()
+
+        if method == "GET" and path == "/api/v2/contacts":
+            query = parse_qs(url.query)
+            page = int(query.get("page", ["1"])[0])
+            per_page = min(int(query.get("per_page", ["30"])[0]), 100)
+            with self.lock:
+                contacts = sorted(self.contacts.values(), key=lambda contact: contact["id"])
+            start = (page - 1) * per_page
+            response_headers = self._rate_limit_headers()
+            if start + per_page < len(contacts):
+                response_headers["Link"] = f'<{self.url}{path}?page={page + 1}&per_page={per_page}>; rel="next"'
+            return 200, contacts[start:start + per_page], response_headers
+
+        return 404, None, self._rate_limit_headers()
@@ -0,0 +1,170 @@
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import contextlib
+
+from benchmarks.fake_servers import FakeGitHub, FakeFreshdesk, FaultProfile, MISSING_PREFIX
+
+# End-to-end throughput benchmark: drives main.run_batch against local stand-in
+# GitHub and Freshdesk servers and a scratch MariaDB database.
+#
+#   DB_HOST=... DB_USER=... DB_PASSWORD=... DB_PORT=... \
+#   python -m benchmarks.run_benchmark --users 1000 10000 --workers 32 --output results.json
+
+FRESHDESK_DOMAIN = "bench"
+
+
+def reset_database(db_name):
+    # Recreates the schema from database.sql in a scratch database.
+    from mariadb import connect
+
+    schema_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database.sql")
+    with open(schema_path, encoding="utf-8") as schema_file:
+        schema = schema_file.read().replace("github_users", db_name)
+
+    conn = connect(
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD'),
+        host=os.getenv('DB_HOST'),
+        port=int(os.getenv('DB_PORT')),
+    )
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS `{db_name}`")
+        for statement in schema.split(";"):
+            if statement.strip():
+                cursor.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def synthetic_usernames(count, missing_rate):
+    step = int(1 / missing_rate) if missing_rate else 0
+    for i in range(count):
+        if step and i % step == 0:
+            yield f"{MISSING_PREFIX}{i}"
+        else:
+            yield f"bench-user-{i}"
+
+
+def reset_peak_rss() -> bool:
+    # Writing 5 to clear_refs resets the process's peak RSS (VmHWM, Linux 4.0+), so
+    # each run reports its own peak rather than the largest one so far.
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_kb():
+    with open("/proc/self/status", encoding="utf-8") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return None
+
+
+def run_once(main, github, freshdesk, args, users):
+    github.requests.clear()
+    freshdesk.requests.clear()
+    main.metrics.reset()
+    # Without a reset the peak can't be told apart from earlier runs, so none is reported.
+    measure_rss = reset_peak_rss()
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.run_batch(synthetic_usernames(users, args.missing_rate), FRESHDESK_DOMAIN, workers=args.workers, graphql=args.graphql)
+    elapsed = time.perf_counter() - started
+
+    summary = main.metrics.summary()
+    return {
+        "users": users,
+        "workers": args.workers,
+        "graphql": args.graphql,
+        "elapsed_s": round(elapsed, 3),
+        "users_per_s": round(users / elapsed, 2) if elapsed > 0 else None,
+        "outcomes": summary["outcomes"],
+        "stages": summary["stages"],
+        "retries": summary["retries"],
+        "rate_limit_wait_s": summary["rate_limit_wait_s"],
+        "requests": {"github": dict(github.requests), "freshdesk": dict(freshdesk.requests)},
+        "peak_rss_kb": peak_rss_kb() if measure_rss else None,
+    }
+
+
+def main_benchmark(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end sync throughput benchmark against local stand-in servers.")
+    parser.add_argument("--users", type=int, nargs="+", default=[1000], help="Synthetic user counts to run (default: 1000)")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--graphql", action="store_true", help="Use the batched GraphQL and bulk upsert path")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Base latency of the stand-in servers")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="Fraction of logins that don't exist on GitHub")
+    parser.add_argument("--resync", action="store_true", help="Run every size twice and report the second, steady-state run")
+    parser.add_argument("--db-name", default=os.getenv('BENCH_DB_NAME', 'github_users_bench'), help="Scratch database, dropped and recreated for every run")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.db_name == "github_users":
+        parser.error("refusing to use the production database name; pick a scratch database")
+
+    profile = FaultProfile(args.latency_ms, args.jitter_ms, args.rate_limit_rate, args.error_rate)
+    github = FakeGitHub(profile).start()
+    freshdesk = FakeFreshdesk(profile).start()
+
+    # The clients read their endpoints and credentials on import.
+    os.environ.update({
+        "GITHUB_API_URL": github.url,
+        "GITHUB_TOKEN": "bench-token",
+        "FRESHDESK_API_URL": freshdesk.url + "/api/v2",
+        "FRESHDESK_TOKEN": "bench-token",
+        "FRESHDESK_PASSWORD": "X",
+        "DB_NAME": args.db_name,
+    })
+    import main
+
+    results = []
+    try:
+        for users in args.users:
+            main.close_pool()
+            reset_database(args.db_name)
+            result = run_once(main, github, freshdesk, args, users)
+            if args.resync:
+                result = dict(run_once(main, github, freshdesk, args, users), resync=True)
+            results.append(result)
+            print(f"{users} users: {result['users_per_s']} users/s, outcomes {result['outcomes']}", file=sys.stderr)
+    finally:
+        main.close_pool()
+        main.close_freshdesk_sessions()
+        main.close_github_client()
+        github.stop()
+        freshdesk.stop()
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "rate_limit_rate": args.rate_limit_rate,
+            "error_rate": args.error_rate,
+            "missing_rate": args.missing_rate,
+        },
+        "runs": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main_benchmark()
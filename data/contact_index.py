@@ -0,0 +1,41 @@
+import threading
+
+# Known Freshdesk contacts by subdomain and lower-cased email. It is warmed by
+# listing every contact and kept current by each create and update, so a user
+# whose email already has a contact is linked to it instead of failing with a 409.
+_ids = {}
+# Email last seen for each contact, so a contact whose email changes stops
+# matching its old address.
+_emails = {}
+_lock = threading.Lock()
+
+def _key(domain, email):
+    return domain, email.strip().lower()
+
+def get_contact_id(domain, email):
+    if not email:
+        return None
+    return _ids.get(_key(domain, email))
+
+def set_contact_id(domain, email, contact_id):
+    if not email or contact_id is None:
+        return
+    key = _key(domain, email)
+    with _lock:
+        previous = _emails.get((domain, contact_id))
+        if previous is not None and previous != key and _ids.get(previous) == contact_id:
+            del _ids[previous]
+        _ids[key] = contact_id
+        _emails[(domain, contact_id)] = key
+
+def warm_contact_index(domain, contacts) -> int:
+    count = 0
+    for contact in contacts:
+        set_contact_id(domain, contact.get("email"), contact["id"])
+        count += 1
+    return count
+
+def clear_contact_index():
+    with _lock:
+        _ids.clear()
+        _emails.clear()
@@ -1,18 +1,59 @@
-from mariadb import connect
+from mariadb import ConnectionPool, PoolError
 from mariadb.connections import Connection
+from mariadb.constants import CURSOR
 import os
+import time
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
 
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    pool_name='github_users',
+                    pool_size=int(os.getenv('DB_POOL_SIZE', '10')),
+                    pool_validation_interval=int(os.getenv('DB_POOL_VALIDATION_INTERVAL', '500')),
+                    user=os.getenv('DB_USER'),
+                    password=os.getenv('DB_PASSWORD'),
+                    host=os.getenv('DB_HOST'),
+                    port=int(os.getenv('DB_PORT')),
+                    database=os.getenv('DB_NAME', 'github_users')
+                )
+    return _pool
+
+def open_pool():
+    # Creates the pool ahead of the first query, e.g. when a long-running process starts.
+    _get_pool()
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
 def _get_connection() -> Connection:
-    return connect(
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        host=os.getenv('DB_HOST'),
-        port=int(os.getenv('DB_PORT')),
-        database='github_users'
-    )
+    # Connections are validated by the pool on checkout and go back to it on close().
+    pool = _get_pool()
+    deadline = time.monotonic() + float(os.getenv('DB_POOL_TIMEOUT', '10'))
+    while True:
+        try:
+            conn = pool.get_connection()
+        except PoolError:
+            conn = None
+        if conn is not None:
+            return conn
+        if time.monotonic() >= deadline:
+            raise Exception("Timed out waiting for a database connection from the pool.")
+        time.sleep(0.01)
 
 def insert_query(sql: str, sql_params=()) -> int:
     with _get_connection() as conn:
@@ -26,6 +67,24 @@ def read_query(sql: str, sql_params=()):
         cursor = conn.cursor()
         cursor.execute(sql, sql_params)
         return list(cursor)
+
+def stream_query(sql: str, sql_params=(), chunk_size=None):
+    # Yields the rows of a large scan through a server-side cursor, fetching
+    # chunk_size rows per round trip, so memory stays constant whatever the
+    # table size. The connection stays checked out until the generator is
+    # exhausted or closed; wrap it in contextlib.closing() when stopping early.
+    chunk_size = chunk_size or int(os.getenv('DB_STREAM_CHUNK_SIZE', '1000'))
+    with _get_connection() as conn:
+        cursor = conn.cursor(cursor_type=CURSOR.READ_ONLY, prefetch_size=chunk_size)
+        try:
+            cursor.execute(sql, sql_params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
     
 def update_query(sql: str, sql_params=()) -> bool:
     with _get_connection() as conn:
@@ -33,4 +92,22 @@ def update_query(sql: str, sql_params=()) -> bool:
         cursor.execute(sql, sql_params)
         conn.commit()
         return cursor.rowcount
-    
+
+def insert_many_query(sql: str, seq_params) -> int:
+    with _get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(sql, seq_params)
+        conn.commit()
+        return cursor.rowcount
+
+@contextmanager
+def transaction():
+    # Runs every statement executed on the yielded cursor in one transaction.
+    with _get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
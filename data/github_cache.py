@@ -0,0 +1,69 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# GitHub responses are cached in a local SQLite file rather than MariaDB so
+# lookups stay cheap; WAL mode lets several worker processes share the file.
+_local = threading.local()
+
+def is_cache_enabled() -> bool:
+    return bool(os.getenv('GITHUB_CACHE_PATH'))
+
+def _get_connection() -> sqlite3.Connection:
+    path = os.getenv('GITHUB_CACHE_PATH')
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'path', None) != path:
+        conn = sqlite3.connect(path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS github_users ("
+            "login TEXT PRIMARY KEY, etag TEXT NOT NULL, payload TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS github_missing_users (login TEXT PRIMARY KEY, checked_at REAL NOT NULL)")
+        conn.commit()
+        _local.conn = conn
+        _local.path = path
+    return conn
+
+def get_cached_user(github_username):
+    row = _get_connection().execute(
+        "SELECT etag, payload FROM github_users WHERE login = ?", (github_username.lower(),)
+    ).fetchone()
+    if row is None:
+        return None
+    etag, payload = row
+    return etag, json.loads(payload)
+
+def set_cached_user(github_username, etag, raw_data):
+    if not etag:
+        return
+    conn = _get_connection()
+    conn.execute(
+        "INSERT OR REPLACE INTO github_users (login, etag, payload, updated_at) VALUES (?, ?, ?, ?)",
+        (github_username.lower(), etag, json.dumps(raw_data), time.time())
+    )
+    conn.commit()
+
+# Logins GitHub answered 404 for are remembered for GITHUB_MISSING_TTL seconds,
+# after which they are looked up again in case the account came back.
+def _missing_ttl() -> float:
+    return float(os.getenv('GITHUB_MISSING_TTL', '86400'))
+
+def is_known_missing(github_username) -> bool:
+    row = _get_connection().execute(
+        "SELECT checked_at FROM github_missing_users WHERE login = ?", (github_username.lower(),)
+    ).fetchone()
+    return row is not None and time.time() - row[0] < _missing_ttl()
+
+def set_missing_user(github_username):
+    conn = _get_connection()
+    conn.execute(
+        "INSERT OR REPLACE INTO github_missing_users (login, checked_at) VALUES (?, ?)",
+        (github_username.lower(), time.time())
+    )
+    conn.commit()
@@ -0,0 +1,85 @@
+import os
+import json
+import time
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CONTACT = "contact"
+DONE = "done"
+
+
+class Journal:
+    # Append-only JSON lines checkpoint of a batch run. "done" records are buffered
+    # and fsynced in groups; a "contact" record, written right after a Freshdesk
+    # contact is created, is fsynced before the sync goes on so that a crash before
+    # the contact id reaches the database can't lead to a duplicate contact.
+    def __init__(self, path, fsync_every=None, fsync_interval=None):
+        self.path = path
+        self.fsync_every = fsync_every or int(os.getenv('JOURNAL_FSYNC_EVERY', '100'))
+        self.fsync_interval = fsync_interval if fsync_interval is not None else float(os.getenv('JOURNAL_FSYNC_INTERVAL', '1'))
+        self.completed = set()
+        self.contacts = {}
+        self.lock = threading.Lock()
+        self.pending = []
+        self.flushed_at = time.monotonic()
+        self._load()
+        self.file = open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line is cut short when the process died while writing it.
+                    continue
+                username = record["user"].lower()
+                if record["event"] == CONTACT:
+                    self.contacts[username] = record["contact_id"]
+                elif record["event"] == DONE:
+                    self.completed.add(username)
+                    self.contacts.pop(username, None)
+
+    def is_completed(self, github_username) -> bool:
+        return github_username.lower() in self.completed
+
+    def contact_id(self, github_username):
+        # Id of a contact created by an earlier run that never stored it.
+        with self.lock:
+            return self.contacts.get(github_username.lower())
+
+    def record_contact(self, github_username, contact_id):
+        with self.lock:
+            self.contacts[github_username.lower()] = contact_id
+            self.pending.append({"user": github_username, "event": CONTACT, "contact_id": contact_id})
+            self._flush()
+
+    def record_done(self, github_username, outcome):
+        with self.lock:
+            self.completed.add(github_username.lower())
+            self.contacts.pop(github_username.lower(), None)
+            self.pending.append({"user": github_username, "event": DONE, "outcome": outcome})
+            if len(self.pending) >= self.fsync_every or time.monotonic() - self.flushed_at >= self.fsync_interval:
+                self._flush()
+
+    def _flush(self):
+        if self.pending:
+            self.file.write("".join(json.dumps(record) + "\n" for record in self.pending))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.pending = []
+        self.flushed_at = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self._flush()
+                self.file.close()
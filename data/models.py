@@ -1,4 +1,6 @@
 
+import json
+import hashlib
 from pydantic import BaseModel, constr, EmailStr
 from typing import List
 from datetime import datetime
@@ -28,3 +30,7 @@ class User(BaseModel):
             freshdesk_contact_id=freshdesk_contact_id,
             )
 
+    def fingerprint(self) -> str:
+        # Hash of the fields pushed to Freshdesk, used to skip no-op updates.
+        synced_fields = [self.name, self.email, self.bio, self.location]
+        return hashlib.sha256(json.dumps(synced_fields).encode('utf-8')).hexdigest()
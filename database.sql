@@ -10,5 +10,31 @@ CREATE TABLE IF NOT EXISTS users (
     location VARCHAR(255),
     created_at DATETIME,
     is_recorded_fd BOOLEAN NOT NULL DEFAULT 0,
-    freshdesk_contact_id INT
+    freshdesk_contact_id INT,
+    sync_hash CHAR(64),
+    last_synced_at DATETIME,
+    last_changed_at DATETIME,
+    last_attempted_at DATETIME,
+    INDEX idx_users_last_synced_at (last_synced_at),
+    INDEX idx_users_last_attempted_at (last_attempted_at)
+);
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS sync_hash CHAR(64);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS last_synced_at DATETIME;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS last_changed_at DATETIME;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS last_attempted_at DATETIME;
+CREATE INDEX IF NOT EXISTS idx_users_last_synced_at ON users (last_synced_at);
+CREATE INDEX IF NOT EXISTS idx_users_last_attempted_at ON users (last_attempted_at);
+CREATE TABLE IF NOT EXISTS freshdesk_outbox (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    freshdesk_domain VARCHAR(255) NOT NULL,
+    version INT NOT NULL DEFAULT 1,
+    attempts INT NOT NULL DEFAULT 0,
+    last_error TEXT,
+    available_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_outbox_user_domain (user_id, freshdesk_domain),
+    INDEX idx_outbox_available_at (available_at),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
@@ -1,45 +1,625 @@
+import os
 import sys
-from routers.github_api import get_user_info_from_github
-from routers.freshdesk_api import create_freshdesk_contact, update_freshdesk_contact
-from services.record_user import persist_user_info
-from services.update_user import update_user_recorded_status, update_user_full_info
-from services.get_user import get_user_info_from_db
+import time
+import signal
+import argparse
+import threading
+import contextlib
+from data.database import open_pool, close_pool
+from data.journal import Journal
+from data.contact_index import get_contact_id, warm_contact_index
+from routers.github_api import get_user_info_from_github, get_users_info_from_github, iter_org_members, get_github_client, close_github_client, GithubUserNotFound, GRAPHQL_BATCH_SIZE
+from routers.freshdesk_api import create_freshdesk_contact, update_freshdesk_contact, iter_freshdesk_contacts, get_freshdesk_session, close_freshdesk_sessions, FreshdeskDuplicateContact
+from routers.concurrency import freshdesk_concurrency_limits
+from routers.rate_limiter import TokenBucket
+from services.record_user import upsert_user_info, bulk_upsert_user_info, needs_freshdesk_push
+from services.outbox import claim_outbox_entries, complete_outbox_entry, fail_outbox_entry
+from services.update_user import update_user_recorded_status, update_user_synced_at, update_users_attempted_at
+from services.get_user import get_stale_usernames, stream_users
+from services.worker_pool import run_concurrently, prefetch_in_background
+from services.metrics import metrics, write_metrics, OUTCOMES
+from services.daemon import SyncDaemon, daemon_settings
+from services.single_flight import SingleFlight
+from services.reconcile import reconcile, ORPHANED
+
+UPDATED = "updated"
+RECORDED = "recorded"
+CREATED = "created"
+UNCHANGED = "unchanged"
+QUEUED = "queued"
+COALESCED = "coalesced"
+MISSING = "missing"
+
+OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', '300'))
+OUTBOX_RETRY_BASE = int(os.getenv('OUTBOX_RETRY_BASE', '30'))
+OUTBOX_RETRY_MAX = int(os.getenv('OUTBOX_RETRY_MAX', '3600'))
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '5'))
+
+# --refresh picks users whose last sync is older than their refresh interval:
+# REFRESH_ACTIVE_INTERVAL for users whose profile changed within
+# REFRESH_ACTIVE_WINDOW, REFRESH_DORMANT_INTERVAL for everyone else.
+REFRESH_ACTIVE_INTERVAL = int(os.getenv('REFRESH_ACTIVE_INTERVAL', '3600'))
+REFRESH_DORMANT_INTERVAL = int(os.getenv('REFRESH_DORMANT_INTERVAL', '604800'))
+REFRESH_ACTIVE_WINDOW = int(os.getenv('REFRESH_ACTIVE_WINDOW', '2592000'))
+# A user whose last attempt failed is picked again after REFRESH_RETRY_INTERVAL.
+REFRESH_RETRY_INTERVAL = int(os.getenv('REFRESH_RETRY_INTERVAL', str(REFRESH_ACTIVE_INTERVAL)))
+
+sync_flights = SingleFlight(window=float(os.getenv('SYNC_COALESCE_WINDOW', '5')))
+
+NOT_FOUND = object()
+
+OUTCOME_MESSAGES = {
+    UPDATED: ["Contact updated successfully."],
+    UNCHANGED: ["Contact is already up to date."],
+    RECORDED: ["New freshdesk contact created successfully."],
+    CREATED: ["New db user created successfully.", "New freshdesk contact created successfully."],
+}
+
+
+def create_or_link_contact(user_info, freshdesk_subdomain):
+    # Returns (contact_id, created). A contact already holding the user's email,
+    # known from the contact index or named by a 409, is linked and brought up
+    # to date instead of failing the sync.
+    contact_id = get_contact_id(freshdesk_subdomain, user_info.email)
+    if contact_id is None:
+        try:
+            return create_freshdesk_contact(new_user=user_info, domain=freshdesk_subdomain)['id'], True
+        except FreshdeskDuplicateContact as e:
+            contact_id = e.contact_id
+    update_freshdesk_contact(user=user_info, domain=freshdesk_subdomain, contact_id=contact_id)
+    return contact_id, False
+
+
+def index_freshdesk_contacts(freshdesk_subdomain):
+    count = warm_contact_index(freshdesk_subdomain, iter_freshdesk_contacts(freshdesk_subdomain))
+    print(f"Indexed {count} Freshdesk contacts")
+
+
+def sync_user(github_username, freshdesk_subdomain, user_info=None, db_state=None, journal=None):
+    if user_info is None:
+        user_info = get_user_info_from_github(github_username)
+    if db_state is None:
+        db_state = upsert_user_info(user_info)
+
+    user_id, is_recorded_fd, freshdesk_contact_id, stored_sync_hash, created = db_state
+    sync_hash = user_info.fingerprint()
+
+    if is_recorded_fd:
+        if stored_sync_hash == sync_hash:
+            update_user_synced_at(user_id)
+            return UNCHANGED
+
+        update_freshdesk_contact(user=user_info, domain=freshdesk_subdomain, contact_id=freshdesk_contact_id)
+        update_user_recorded_status(user_id, freshdesk_contact_id, sync_hash)
+        return UPDATED
+
+    contact_id = journal.contact_id(github_username) if journal else None
+    if contact_id is None:
+        contact_id, created_contact = create_or_link_contact(user_info, freshdesk_subdomain)
+        if journal and created_contact:
+            journal.record_contact(github_username, contact_id)
+    else:
+        # An interrupted run created the contact but died before storing its id.
+        update_freshdesk_contact(user=user_info, domain=freshdesk_subdomain, contact_id=contact_id)
+
+    update_user_recorded_status(user_id, contact_id, sync_hash)
+    return CREATED if created else RECORDED
+
+
+def coalesced(sync, github_username, freshdesk_subdomain, **kwargs):
+    # Repeats of a username queued close together share one sync, and syncs of
+    # the same user never run concurrently, so they can't race to create its contact.
+    outcome, shared = sync_flights.do((github_username.lower(), freshdesk_subdomain), sync, github_username, freshdesk_subdomain, **kwargs)
+    return COALESCED if shared else outcome
+
+
+def enqueue_user(github_username, freshdesk_subdomain, user_info=None):
+    # Ingestion half of the outbox flow: the user row and its pending Freshdesk
+    # push are committed together and the push is left to drain_outbox.
+    if user_info is None:
+        user_info = get_user_info_from_github(github_username)
+    _, is_recorded_fd, _, stored_sync_hash, _ = upsert_user_info(user_info, outbox_domain=freshdesk_subdomain)
+    return QUEUED if needs_freshdesk_push(is_recorded_fd, stored_sync_hash, user_info) else UNCHANGED
+
+
+def push_outbox_entry(entry):
+    outbox_id, version, freshdesk_domain, user_info, stored_sync_hash, attempts = entry
+    db_state = (user_info.id, user_info.is_recorded_fd, user_info.freshdesk_contact_id, stored_sync_hash, False)
+    try:
+        outcome = sync_user(user_info.github_username, freshdesk_domain, user_info=user_info, db_state=db_state)
+    except Exception as e:
+        fail_outbox_entry(outbox_id, e, min(OUTBOX_RETRY_BASE * 2 ** (attempts - 1), OUTBOX_RETRY_MAX))
+        raise
+    complete_outbox_entry(outbox_id, version)
+    return outcome
+
+
+def claimed_outbox_entries(batch_size, follow=False):
+    while True:
+        entries = claim_outbox_entries(batch_size, OUTBOX_LEASE_SECONDS)
+        yield from entries
+        if not entries:
+            if not follow:
+                return
+            time.sleep(OUTBOX_POLL_INTERVAL)
+
+
+def drain_outbox(workers=1, batch_size=50, follow=False):
+    results = {}
+    failed = 0
+    started = time.perf_counter()
+
+    for entry, outcome, error in run_concurrently(push_outbox_entry, claimed_outbox_entries(batch_size, follow), workers):
+        github_username = entry[3].github_username
+        if error:
+            outcome = "failed"
+            failed += 1
+            print(f"{github_username}: failed: {error}")
+        else:
+            print(f"{github_username}: {outcome}")
+        results[outcome] = results.get(outcome, 0) + 1
+        metrics.inc(OUTCOMES, outcome=outcome)
+
+    elapsed = time.perf_counter() - started
+    summary = ", ".join(f"{outcome} {count}" for outcome, count in sorted(results.items()))
+    print(f"Drained {sum(results.values())} outbox entries in {elapsed:.2f}s: {summary or 'nothing to do'}")
+    return failed
+
+
+def read_usernames(stream):
+    for line in stream:
+        username = line.strip()
+        if username and not username.startswith('#'):
+            yield username
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def prefetch_users(usernames, chunk_size=GRAPHQL_BATCH_SIZE, bulk_upsert=True):
+    # Resolves each chunk of usernames with one GraphQL request and upserts the
+    # found users with one bulk statement. Users a bulk step failed for are
+    # yielded without info or state and handled one by one instead.
+    for chunk in _chunks(usernames, chunk_size):
+        try:
+            users, missing = get_users_info_from_github(chunk)
+        except Exception as e:
+            print(f"Error: {e}")
+            users, missing = {}, []
+
+        try:
+            db_states = bulk_upsert_user_info(list(users.values())) if users and bulk_upsert else {}
+        except Exception as e:
+            print(f"Error: {e}")
+            db_states = {}
+
+        for github_username in chunk:
+            if github_username in missing:
+                yield github_username, NOT_FOUND, None
+            else:
+                user_info = users.get(github_username)
+                db_state = db_states.get(user_info.github_username.lower()) if user_info else None
+                yield github_username, user_info, db_state
+
+
+def run_batch(usernames, freshdesk_subdomain, workers=1, graphql=False, journal=None, resume=False, outbox=False):
+    results = {}
+    failed = 0
+    skipped = 0
+    started = time.perf_counter()
+
+    if resume:
+        def pending(usernames):
+            nonlocal skipped
+            for github_username in usernames:
+                if journal.is_completed(github_username):
+                    skipped += 1
+                else:
+                    yield github_username
+        usernames = pending(usernames)
+
+    if graphql:
+        items = prefetch_users(usernames, bulk_upsert=not outbox)
+    else:
+        items = ((github_username, None, None) for github_username in usernames)
+
+    journal_kwargs = {"journal": journal} if journal else {}
+
+    def sync(item):
+        github_username, user_info, db_state = item
+        if user_info is NOT_FOUND:
+            raise GithubUserNotFound(f"Error fetching user info from GitHub: user {github_username} not found")
+        if outbox:
+            return coalesced(enqueue_user, github_username, freshdesk_subdomain, user_info=user_info)
+        if user_info is None:
+            return coalesced(sync_user, github_username, freshdesk_subdomain, **journal_kwargs)
+        return coalesced(sync_user, github_username, freshdesk_subdomain, user_info=user_info, db_state=db_state, **journal_kwargs)
+
+    for (github_username, _, _), outcome, error in run_concurrently(sync, items, workers):
+        # Logins that don't exist on GitHub are reported apart from real failures.
+        if isinstance(error, GithubUserNotFound):
+            outcome = MISSING
+        elif error:
+            outcome = "failed"
+            failed += 1
+            print(f"{github_username}: failed: {error}")
+        if outcome != "failed":
+            print(f"{github_username}: {outcome}")
+            if journal:
+                journal.record_done(github_username, outcome)
+        results[outcome] = results.get(outcome, 0) + 1
+        metrics.inc(OUTCOMES, outcome=outcome)
+
+    elapsed = time.perf_counter() - started
+    total = sum(results.values())
+    rate = total / elapsed if elapsed > 0 else 0.0
+    summary = ", ".join(f"{outcome} {count}" for outcome, count in sorted(results.items()))
+    print(f"Synced {total} users in {elapsed:.2f}s ({rate:.1f} users/s): {summary or 'nothing to do'}")
+    if skipped:
+        print(f"Skipped {skipped} users completed by an earlier run")
+    for stage, timing in metrics.summary()["stages"].items():
+        print(f"Stage {stage}: {timing['calls']} calls, {timing['errors']} errors, p50 {timing['p50_ms']}ms, p95 {timing['p95_ms']}ms, p99 {timing['p99_ms']}ms")
+    for domain, limit in freshdesk_concurrency_limits().items():
+        print(f"Freshdesk concurrency limit for {domain}: {limit}")
+    return failed
+
+
+def _add_batch_options(parser):
+    parser.add_argument("freshdesk_subdomain")
+    parser.add_argument("--workers", type=int, default=8, help="Number of users synced concurrently (default: 8)")
+    parser.add_argument("--graphql", action="store_true", help="Fetch GitHub profiles and upsert them in batches of 100")
+    parser.add_argument("--metrics-json", default=os.getenv('METRICS_JSON_PATH'), help="Write a JSON metrics summary to this file at the end of the run ('-' for stdout)")
+    parser.add_argument("--metrics-prometheus", default=os.getenv('METRICS_PROMETHEUS_PATH'), help="Write the metrics in Prometheus text format to this file at the end of the run")
+    parser.add_argument("--outbox", action="store_true", help="Only store the users and queue their Freshdesk pushes for --drain-outbox")
+    parser.add_argument("--journal", help="Checkpoint journal recording every completed user, kept across runs")
+    parser.add_argument("--index-contacts", action="store_true", help="List every Freshdesk contact first so users whose email already has one are linked to it")
+    parser.add_argument("--resume", action="store_true", help="Skip the users the --journal file records as completed")
+
+
+def _run_batch_command(parser, args, open_usernames):
+    # open_usernames() returns a context manager yielding the usernames to sync.
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.resume and not args.journal:
+        parser.error("--resume requires --journal")
+
+    journal = Journal(args.journal) if args.journal else None
+    batch_kwargs = {"workers": args.workers, "graphql": args.graphql, "journal": journal, "resume": args.resume, "outbox": args.outbox}
+    try:
+        if args.index_contacts:
+            index_freshdesk_contacts(args.freshdesk_subdomain)
+        with open_usernames() as usernames:
+            failed = run_batch(usernames, args.freshdesk_subdomain, **batch_kwargs)
+    finally:
+        if journal:
+            journal.close()
+        close_pool()
+        close_freshdesk_sessions()
+        close_github_client()
+        write_metrics(args.metrics_json, args.metrics_prometheus)
+
+    if failed:
+        sys.exit(1)
+
+
+def batch_main(argv):
+    parser = argparse.ArgumentParser(prog="main.py --batch", description="Sync many GitHub users in one process.")
+    parser.add_argument("usernames_file", help="File with one GitHub username per line, or '-' for stdin")
+    _add_batch_options(parser)
+    args = parser.parse_args(argv)
+
+    @contextlib.contextmanager
+    def open_usernames():
+        if args.usernames_file == '-':
+            yield read_usernames(sys.stdin)
+        else:
+            with open(args.usernames_file, encoding="utf-8") as stream:
+                yield read_usernames(stream)
+
+    _run_batch_command(parser, args, open_usernames)
+
+
+def org_main(argv):
+    parser = argparse.ArgumentParser(prog="main.py --org", description="Sync every member of a GitHub organization or team.")
+    parser.add_argument("org", help="GitHub organization login")
+    _add_batch_options(parser)
+    parser.add_argument("--team", help="Only sync the members of this team (its slug)")
+    args = parser.parse_args(argv)
+
+    # Member pages are listed on a background thread at most ORG_PREFETCH_PAGES
+    # pages ahead of the sync, so memory stays bounded for any organization size.
+    max_buffered = int(os.getenv('ORG_PREFETCH_PAGES', '2')) * int(os.getenv('GITHUB_PER_PAGE', '100'))
+
+    def open_usernames():
+        return contextlib.closing(prefetch_in_background(iter_org_members(args.org, args.team), max_buffered))
+
+    # A failed member listing stops the run after the users listed so far are synced.
+    try:
+        _run_batch_command(parser, args, open_usernames)
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+def drain_main(argv):
+    parser = argparse.ArgumentParser(prog="main.py --drain-outbox", description="Push the queued Freshdesk updates of --batch --outbox runs.")
+    parser.add_argument("--workers", type=int, default=8, help="Number of entries pushed concurrently (default: 8)")
+    parser.add_argument("--batch-size", type=int, default=50, help="Entries claimed per database round trip (default: 50)")
+    parser.add_argument("--follow", action="store_true", help="Keep polling for new entries instead of exiting when the outbox is empty")
+    parser.add_argument("--metrics-json", default=os.getenv('METRICS_JSON_PATH'), help="Write a JSON metrics summary to this file at the end of the run ('-' for stdout)")
+    parser.add_argument("--metrics-prometheus", default=os.getenv('METRICS_PROMETHEUS_PATH'), help="Write the metrics in Prometheus text format to this file at the end of the run")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1 or args.batch_size < 1:
+        parser.error("--workers and --batch-size must be at least 1")
+
+    try:
+        failed = drain_outbox(workers=args.workers, batch_size=args.batch_size, follow=args.follow)
+    finally:
+        close_pool()
+        close_freshdesk_sessions()
+        close_github_client()
+        write_metrics(args.metrics_json, args.metrics_prometheus)
+
+    if failed:
+        sys.exit(1)
+
+
+def _budgeted(usernames, budget_seconds=None, max_rate=None):
+    # Stops handing out usernames once the round's time budget is spent and
+    # paces them to at most max_rate per second; the rest wait for the next round.
+    deadline = time.monotonic() + budget_seconds if budget_seconds else None
+    pacer = None
+    if max_rate:
+        pacer = TokenBucket(capacity=1)
+        pacer.set_rate(max_rate)
+    for github_username in usernames:
+        if pacer:
+            pacer.acquire()
+        if deadline is not None and time.monotonic() >= deadline:
+            return
+        yield github_username
+
+
+def refresh_round(freshdesk_subdomain, limit, workers=1, budget_seconds=None, max_rate=None):
+    usernames = get_stale_usernames(limit, REFRESH_ACTIVE_INTERVAL, REFRESH_DORMANT_INTERVAL, REFRESH_ACTIVE_WINDOW, REFRESH_RETRY_INTERVAL)
+    if not usernames:
+        print("No stale users to refresh")
+        return 0
+
+    attempted = []
+
+    def attempting(usernames):
+        for github_username in usernames:
+            attempted.append(github_username)
+            yield github_username
+
+    try:
+        return run_batch(attempting(_budgeted(usernames, budget_seconds, max_rate)), freshdesk_subdomain, workers=workers)
+    finally:
+        update_users_attempted_at(attempted)
+
+
+def refresh_main(argv):
+    parser = argparse.ArgumentParser(prog="main.py --refresh", description="Keep Freshdesk fresh by repeatedly re-syncing the stalest users.")
+    parser.add_argument("freshdesk_subdomain")
+    parser.add_argument("--limit", type=int, default=500, help="Stale users picked per round (default: 500)")
+    parser.add_argument("--workers", type=int, default=8, help="Number of users synced concurrently (default: 8)")
+    parser.add_argument("--budget-seconds", type=float, help="Stop starting new syncs this many seconds into a round")
+    parser.add_argument("--max-rate", type=float, help="Start at most this many syncs per second")
+    parser.add_argument("--interval", type=float, default=60, help="Seconds to sleep between rounds (default: 60)")
+    parser.add_argument("--once", action="store_true", help="Run a single round and exit")
+    parser.add_argument("--index-contacts", action="store_true", help="List every Freshdesk contact first so users whose email already has one are linked to it")
+    parser.add_argument("--metrics-json", default=os.getenv('METRICS_JSON_PATH'), help="Write a JSON metrics summary to this file at the end of the run ('-' for stdout)")
+    parser.add_argument("--metrics-prometheus", default=os.getenv('METRICS_PROMETHEUS_PATH'), help="Write the metrics in Prometheus text format to this file at the end of the run")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1 or args.limit < 1:
+        parser.error("--workers and --limit must be at least 1")
+
+    failed = 0
+    try:
+        if args.index_contacts:
+            index_freshdesk_contacts(args.freshdesk_subdomain)
+        while True:
+            # A failed round (e.g. the database is unreachable) is retried next round.
+            try:
+                failed = refresh_round(args.freshdesk_subdomain, args.limit, args.workers, args.budget_seconds, args.max_rate)
+            except Exception as e:
+                failed = 1
+                print(f"Error: {e}")
+            if args.once:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_pool()
+        close_freshdesk_sessions()
+        close_github_client()
+        write_metrics(args.metrics_json, args.metrics_prometheus)
+
+    if args.once and failed:
+        sys.exit(1)
+
+
+def repair_record(record, freshdesk_subdomain):
+    kind, user_info, contact_id = record
+    if kind == ORPHANED:
+        # Contacts without a user may have been created outside this tool, so
+        # they are only reported, never deleted.
+        return None
+    if contact_id is None:
+        contact_id, _ = create_or_link_contact(user_info, freshdesk_subdomain)
+    else:
+        update_freshdesk_contact(user=user_info, domain=freshdesk_subdomain, contact_id=contact_id)
+    update_user_recorded_status(user_info.id, contact_id, user_info.fingerprint())
+    return "repaired"
+
+
+def reconcile_contacts(freshdesk_subdomain, repair=False, workers=1):
+    # Hash join of every Freshdesk contact (build side, listed first) with the
+    # streamed users table (probe side), reporting and optionally repairing
+    # the records that differ.
+    results = {}
+    failed = 0
+    started = time.perf_counter()
+
+    records = reconcile(iter_freshdesk_contacts(freshdesk_subdomain), stream_users())
+    if repair:
+        records = run_concurrently(lambda record: repair_record(record, freshdesk_subdomain), records, workers)
+    else:
+        records = ((record, None, None) for record in records)
+
+    for (kind, user_info, contact_id), repaired, error in records:
+        label = user_info.github_username if user_info else f"contact {contact_id}"
+        if user_info and contact_id is not None:
+            label += f" (contact {contact_id})"
+        if error:
+            failed += 1
+            print(f"{kind}: {label}: repair failed: {error}")
+        else:
+            print(f"{kind}: {label}" + (f": {repaired}" if repaired else ""))
+        results[kind] = results.get(kind, 0) + 1
+
+    elapsed = time.perf_counter() - started
+    summary = ", ".join(f"{kind} {count}" for kind, count in sorted(results.items()))
+    print(f"Reconciled in {elapsed:.2f}s: {summary or 'no differences'}")
+    if repair and failed:
+        print(f"Failed to repair {failed} records")
+    return failed
+
+
+def reconcile_main(argv):
+    parser = argparse.ArgumentParser(prog="main.py --reconcile", description="Compare every Freshdesk contact with the users table.")
+    parser.add_argument("freshdesk_subdomain")
+    parser.add_argument("--repair", action="store_true", help="Create missing contacts, push divergent ones and store the ids of unlinked ones")
+    parser.add_argument("--workers", type=int, default=8, help="Number of records repaired concurrently (default: 8)")
+    parser.add_argument("--metrics-json", default=os.getenv('METRICS_JSON_PATH'), help="Write a JSON metrics summary to this file at the end of the run ('-' for stdout)")
+    parser.add_argument("--metrics-prometheus", default=os.getenv('METRICS_PROMETHEUS_PATH'), help="Write the metrics in Prometheus text format to this file at the end of the run")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    try:
+        failed = reconcile_contacts(args.freshdesk_subdomain, repair=args.repair, workers=args.workers)
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        close_pool()
+        close_freshdesk_sessions()
+        close_github_client()
+        write_metrics(args.metrics_json, args.metrics_prometheus)
+
+    if failed:
+        sys.exit(1)
+
+
+def daemon_main(argv):
+    settings = daemon_settings()
+    parser = argparse.ArgumentParser(prog="main.py --daemon", description="Sync users queued by GitHub webhooks and the admin endpoint.")
+    parser.add_argument("freshdesk_subdomain")
+    parser.add_argument("--host", default=settings["host"], help="Address to listen on (default: DAEMON_HOST or 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=settings["port"], help="Port to listen on (default: DAEMON_PORT or 8080)")
+    parser.add_argument("--workers", type=int, default=8, help="Number of users synced concurrently (default: 8)")
+    parser.add_argument("--outbox", action="store_true", help="Only store the users and queue their Freshdesk pushes for --drain-outbox")
+    parser.add_argument("--index-contacts", action="store_true", help="List every Freshdesk contact at startup so users whose email already has one are linked to it")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.outbox:
+        sync = lambda github_username: coalesced(enqueue_user, github_username, args.freshdesk_subdomain)
+    else:
+        sync = lambda github_username: coalesced(sync_user, github_username, args.freshdesk_subdomain)
+
+    daemon = SyncDaemon(
+        sync,
+        workers=args.workers,
+        host=args.host,
+        port=args.port,
+        webhook_secret=settings["webhook_secret"],
+        admin_token=settings["admin_token"],
+        queue_size=settings["queue_size"],
+    )
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=daemon.shutdown).start())
+
+    try:
+        # Warm the shared clients so the first events don't pay for their setup.
+        open_pool()
+        get_github_client()
+        if not args.outbox:
+            get_freshdesk_session(args.freshdesk_subdomain)
+        if args.index_contacts:
+            index_freshdesk_contacts(args.freshdesk_subdomain)
+
+        host, port = daemon.address[:2]
+        print(f"Listening on http://{host}:{port}")
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_pool()
+        close_freshdesk_sessions()
+        close_github_client()
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--daemon":
+        daemon_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        batch_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "--org":
+        org_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "--drain-outbox":
+        drain_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "--refresh":
+        refresh_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "--reconcile":
+        reconcile_main(sys.argv[2:])
+        return
+
     if len(sys.argv) != 3:
         print("Usage: python3 main.py <github_username> <freshdesk_subdomain>")
+        print("       python3 main.py --batch <usernames_file|-> <freshdesk_subdomain>")
+        print("       python3 main.py --org <github_org> <freshdesk_subdomain> [--team <team_slug>]")
+        print("       python3 main.py --drain-outbox")
+        print("       python3 main.py --refresh <freshdesk_subdomain> [--once]")
+        print("       python3 main.py --reconcile <freshdesk_subdomain> [--repair]")
+        print("       python3 main.py --daemon <freshdesk_subdomain>")
         sys.exit(1)
 
     github_username = sys.argv[1]
     freshdesk_subdomain = sys.argv[2]
 
     try:
-        user_info = get_user_info_from_github(github_username)
-        
-        user_exists = get_user_info_from_db(user_info.github_username)
-        
-        if user_exists:
-            user_id, is_recorded_fd, freshdesk_contact_id = user_exists[0]
-            
-            if is_recorded_fd:
-                update_freshdesk_contact(user=user_info, domain=freshdesk_subdomain, contact_id=freshdesk_contact_id)
-                update_user_full_info(id=user_id, user=user_info)
-                print(f"Contact updated successfully.")
-            else: 
-                new_contact = create_freshdesk_contact(new_user=user_info, domain=freshdesk_subdomain)
-                update_user_recorded_status(user_id, new_contact['id'])
-                print(f"New freshdesk contact created successfully.")
-        else:
-            user_id = persist_user_info(user_info)
-            print(f"New db user created successfully.")
-            new_contact = create_freshdesk_contact(new_user=user_info, domain=freshdesk_subdomain)
-            update_user_recorded_status(user_id, new_contact['id'])
-            print(f"New freshdesk contact created successfully.")
-            
+        outcome = sync_user(github_username, freshdesk_subdomain)
+        metrics.inc(OUTCOMES, outcome=outcome)
+        for message in OUTCOME_MESSAGES[outcome]:
+            print(message)
+
     except Exception as e:
+        metrics.inc(OUTCOMES, outcome="failed")
         print(f"Error: {e}")
         sys.exit(1)
+    finally:
+        write_metrics(os.getenv('METRICS_JSON_PATH'), os.getenv('METRICS_PROMETHEUS_PATH'))
 
 if __name__ == "__main__":
     main()
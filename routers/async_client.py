@@ -0,0 +1,42 @@
+import os
+import asyncio
+import weakref
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# An httpx.AsyncClient is bound to the event loop it first ran on, so each loop
+# gets its own client; it is dropped together with its loop.
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    # Must be called from a coroutine; the client keeps connections alive across
+    # all async calls of the running loop.
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        max_connections = int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', '200'))
+        # Failed connection attempts are retried, as no request was sent yet.
+        transport = httpx.AsyncHTTPTransport(
+            retries=int(os.getenv('ASYNC_HTTP_CONNECT_RETRIES', '3')),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        client = _clients[loop] = httpx.AsyncClient(timeout=float(os.getenv('ASYNC_HTTP_TIMEOUT', '15')), transport=transport)
+    return client
+
+
+def set_async_client(client: httpx.AsyncClient | None):
+    # Replaces the client of the running loop.
+    loop = asyncio.get_running_loop()
+    if client is None:
+        _clients.pop(loop, None)
+    else:
+        _clients[loop] = client
+
+
+async def close_async_client():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
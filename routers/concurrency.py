@@ -0,0 +1,187 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from dotenv import load_dotenv
+from services.metrics import metrics, CONCURRENCY_LIMIT
+
+load_dotenv()
+
+
+class _Slot:
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.status_code = None
+
+    def __enter__(self):
+        self.limiter._acquire()
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        latency = time.monotonic() - self.started
+        self.limiter._release(latency, None if exc_type else self.status_code, self.started)
+        return False
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _AsyncSlot(_Slot):
+    async def __aenter__(self):
+        # Waits on a future of the running loop that _release resolves, so a
+        # waiter holds no thread and a cancelled one never takes a slot.
+        loop = asyncio.get_running_loop()
+        while True:
+            waiter = self.limiter._acquire_or_wait(loop)
+            if waiter is None:
+                break
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                self.limiter._cancel_wait(loop, waiter)
+                raise
+        self.started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class AdaptiveLimiter:
+    # AIMD limit on in-flight requests: grows by one per window of healthy responses
+    # and is cut by `backoff` on a 429, a 5xx, a connection error or a latency spike.
+    # Bad responses to requests started before the last cut belong to the same
+    # congestion event and don't cut it again.
+    # A limiter given a `key` publishes its limit as the concurrency_limit gauge.
+    def __init__(self, initial=4, min_limit=1, max_limit=64, backoff=0.5, spike_factor=3.0, smoothing=0.1, key=None):
+        self.limit = float(initial)
+        self.key = key
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.spike_factor = spike_factor
+        self.smoothing = smoothing
+        self.baseline_latency = None
+        self.last_decrease = None
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        # (loop, future) of coroutines waiting in async_slot().
+        self.waiters = deque()
+        self._publish()
+
+    def _publish(self):
+        if self.key is not None:
+            metrics.set(CONCURRENCY_LIMIT, self.current_limit, key=self.key)
+
+    def slot(self) -> _Slot:
+        # Usage: `with limiter.slot() as slot: ...; slot.status_code = response.status_code`
+        return _Slot(self)
+
+    def async_slot(self) -> _AsyncSlot:
+        # Usage: `async with limiter.async_slot() as slot: ...`
+        return _AsyncSlot(self)
+
+    def _acquire_or_wait(self, loop):
+        # Takes a slot and returns None, or returns a future resolved once one may be free.
+        with self.condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return None
+            waiter = loop.create_future()
+            self.waiters.append((loop, waiter))
+            return waiter
+
+    def _cancel_wait(self, loop, waiter):
+        with self.condition:
+            try:
+                self.waiters.remove((loop, waiter))
+            except ValueError:
+                # Already woken; the wake-up passes on to the next waiter.
+                self._wake_waiters()
+
+    def _wake_waiters(self):
+        # Called with the condition held; wakes one waiter per free slot.
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self.waiters:
+            loop, waiter = self.waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # The waiter's loop is closed.
+                continue
+            free -= 1
+
+    def _acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def _release(self, latency, status_code, started=None):
+        with self.condition:
+            self.in_flight -= 1
+            previous = self.current_limit
+            self._record(latency, status_code, started)
+            if self.current_limit != previous:
+                self._publish()
+            self.condition.notify_all()
+            self._wake_waiters()
+
+    def _decrease(self, started):
+        if started is not None and self.last_decrease is not None and started < self.last_decrease:
+            return
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self.last_decrease = time.monotonic()
+
+    def _record(self, latency, status_code, started=None):
+        if status_code is None or status_code == 429 or status_code >= 500:
+            self._decrease(started)
+            return
+
+        # The baseline also follows spikes, so a lasting latency shift stops
+        # counting as a spike after a while.
+        spike = self.baseline_latency is not None and latency > self.baseline_latency * self.spike_factor
+        if self.baseline_latency is None:
+            self.baseline_latency = latency
+        else:
+            self.baseline_latency += self.smoothing * (latency - self.baseline_latency)
+
+        if spike:
+            self._decrease(started)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_freshdesk_limiter(domain) -> AdaptiveLimiter:
+    with _limiters_lock:
+        if domain not in _limiters:
+            _limiters[domain] = AdaptiveLimiter(
+                initial=int(os.getenv('FRESHDESK_CONCURRENCY_INITIAL', '4')),
+                min_limit=int(os.getenv('FRESHDESK_CONCURRENCY_MIN', '1')),
+                max_limit=int(os.getenv('FRESHDESK_CONCURRENCY_MAX', '64')),
+                spike_factor=float(os.getenv('FRESHDESK_LATENCY_SPIKE_FACTOR', '3')),
+                key=f"freshdesk:{domain}",
+            )
+        return _limiters[domain]
+
+
+def freshdesk_concurrency_limits():
+    with _limiters_lock:
+        return {domain: limiter.current_limit for domain, limiter in _limiters.items()}
+
+
+def reset_freshdesk_limiters():
+    with _limiters_lock:
+        _limiters.clear()
@@ -1,70 +1,275 @@
 import os
 import json
+import asyncio
+import threading
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
+from data.contact_index import set_contact_id
+from routers.async_client import get_async_client
+from routers.rate_limiter import scheduler
+from routers.concurrency import get_freshdesk_limiter
+from services.metrics import metrics, HTTP_RESPONSES, HTTP_RETRIES
 
 load_dotenv()
-    
-def create_freshdesk_contact(new_user, domain):
+
+FRESHDESK_API_URL = os.getenv('FRESHDESK_API_URL', "https://{domain}.freshdesk.com/api/v2")
+RATE_LIMIT_MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', '5'))
+# Freshdesk returns at most 100 contacts per page.
+FRESHDESK_PER_PAGE = 100
+FRESHDESK_LIST_CONCURRENCY = int(os.getenv('FRESHDESK_LIST_CONCURRENCY', '4'))
+# Transient server errors retried for GET and PUT requests.
+RETRY_STATUSES = (502, 503, 504)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+class FreshdeskDuplicateContact(Exception):
+    # A contact with the user's email already exists in Freshdesk.
+    def __init__(self, message, contact_id):
+        super().__init__(message)
+        self.contact_id = contact_id
+
+def _get_credentials():
     freshdesk_token = os.getenv('FRESHDESK_TOKEN')
     freshdesk_password =  os.getenv('FRESHDESK_PASSWORD')
     
     if not freshdesk_token or not freshdesk_password:
         raise Exception("Freshdesk credentials are not set in the environment variables.")
+    return freshdesk_token, freshdesk_password
+
+def _create_session():
+    freshdesk_token, freshdesk_password = _get_credentials()
+
+    # POST is not retried so that a timed out create can't produce a duplicate contact.
+    # 429s are left to _send, so the scheduler and the limiter see every one of them.
+    retries = Retry(
+        total=int(os.getenv('FRESHDESK_MAX_RETRIES', '3')),
+        backoff_factor=float(os.getenv('FRESHDESK_RETRY_BACKOFF', '0.5')),
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "PUT"}),
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_maxsize=int(os.getenv('FRESHDESK_POOL_SIZE', '10')), max_retries=retries)
+
+    session = requests.Session()
+    session.auth = (freshdesk_token, freshdesk_password)
+    session.headers.update({ "Content-Type" : "application/json" })
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_freshdesk_session(domain):
+    session = _sessions.get(domain)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(domain)
+            if session is None:
+                session = _sessions[domain] = _create_session()
+    return session
+
+def set_freshdesk_session(domain, session):
+    with _sessions_lock:
+        _sessions[domain] = session
+
+def close_freshdesk_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+def _send(session, domain, method, url, **kwargs):
+    # Paced by the subdomain's token bucket and its adaptive in-flight limit; a 429
+    # parks the bucket for Retry-After seconds and the request is sent again once it resumes.
+    key = f"freshdesk:{domain}"
+    for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+        scheduler.acquire(key)
+        with get_freshdesk_limiter(domain).slot() as slot:
+            try:
+                response = getattr(session, method)(url, **kwargs)
+            except Exception:
+                metrics.inc(HTTP_RESPONSES, api=key, status="error")
+                raise
+            slot.status_code = response.status_code
+        metrics.inc(HTTP_RESPONSES, api=key, status=response.status_code)
+        if scheduler.observe(key, response.status_code, response.headers) is None or attempt == RATE_LIMIT_MAX_RETRIES:
+            return response
+        metrics.inc(HTTP_RETRIES, api=key)
+
+async def _send_async(domain, method, url, **kwargs):
+    # Async twin of _send, paced by the same token bucket and in-flight limit.
+    # Like the sync session, PUTs are retried on 502/503/504 with exponential
+    # backoff and POSTs never are.
+    key = f"freshdesk:{domain}"
+    client = get_async_client()
+    max_retries = int(os.getenv('FRESHDESK_MAX_RETRIES', '3'))
+    backoff = float(os.getenv('FRESHDESK_RETRY_BACKOFF', '0.5'))
+    rate_limited = 0
+    server_errors = 0
+    while True:
+        await scheduler.acquire_async(key)
+        async with get_freshdesk_limiter(domain).async_slot() as slot:
+            try:
+                response = await getattr(client, method)(url, **kwargs)
+            except Exception:
+                metrics.inc(HTTP_RESPONSES, api=key, status="error")
+                raise
+            slot.status_code = response.status_code
+        metrics.inc(HTTP_RESPONSES, api=key, status=response.status_code)
+        if scheduler.observe(key, response.status_code, response.headers) is not None and rate_limited < RATE_LIMIT_MAX_RETRIES:
+            rate_limited += 1
+        elif response.status_code in RETRY_STATUSES and method != "post" and server_errors < max_retries:
+            await asyncio.sleep(backoff * 2 ** server_errors)
+            server_errors += 1
+        else:
+            return response
+        metrics.inc(HTTP_RETRIES, api=key)
 
-    contact_info = {
-            "name": new_user.name,
-            "email": new_user.email,
-            "description": new_user.bio,    
-            "address": new_user.location
+def _contact_info(user):
+    return {
+            "name": user.name,
+            "email": user.email,
+            "description": user.bio,    
+            "address": user.location
         }
-    headers = { "Content-Type" : "application/json" }
+
+def _contacts_url(domain):
+    return FRESHDESK_API_URL.format(domain=domain) + "/contacts"
+
+def _duplicate_contact_id(response):
+    # Freshdesk rejects a create for a known email with a 409 naming the existing contact.
+    try:
+        errors = response.json().get("errors") or []
+    except ValueError:
+        return None
+    for error in errors:
+        if error.get("code") == "duplicate_value":
+            contact_id = (error.get("additional_info") or {}).get("user_id")
+            if contact_id is not None:
+                return contact_id
+    return None
+
+def _check_create_response(response):
+    if response.status_code == 201:
+        return response.json()
+    error_message = (
+        f"Failed to create contact. "
+        f"Status Code: {response.status_code}, "
+        f"Response: {response.text}"
+    )
+    contact_id = _duplicate_contact_id(response) if response.status_code == 409 else None
+    if contact_id is not None:
+        raise FreshdeskDuplicateContact(error_message, contact_id)
+    raise Exception(error_message)
+
+def _check_update_response(response):
+    if response.status_code == 200:
+        return response.json()
+    error_message = (
+        f"Failed to update the contact. "
+        f"Status Code: {response.status_code}, "
+        f"Response: {response.text}"
+    )
+    raise Exception(error_message)
+
+@metrics.timed("freshdesk_list")
+def _list_contacts_page(session, domain, page, per_page):
+    response = _send(session, domain, "get", _contacts_url(domain), params={"page": page, "per_page": per_page})
+    if response.status_code == 200:
+        return response.json()
+    error_message = (
+        f"Failed to list contacts. "
+        f"Status Code: {response.status_code}, "
+        f"Response: {response.text}"
+    )
+    raise Exception(error_message)
+
+def iter_freshdesk_contacts(domain, per_page=FRESHDESK_PER_PAGE, pages_in_flight=FRESHDESK_LIST_CONCURRENCY):
+    # Yields every contact of the account in page order. Up to pages_in_flight
+    # pages are requested at once, still paced by the rate limiter, and the
+    # listing stops at the first page shorter than per_page.
+    session = get_freshdesk_session(domain)
+    with ThreadPoolExecutor(max_workers=pages_in_flight) as executor:
+        pages = deque(executor.submit(_list_contacts_page, session, domain, page, per_page) for page in range(1, pages_in_flight + 1))
+        next_page = pages_in_flight + 1
+        try:
+            while True:
+                contacts = pages.popleft().result()
+                yield from contacts
+                if len(contacts) < per_page:
+                    return
+                pages.append(executor.submit(_list_contacts_page, session, domain, next_page, per_page))
+                next_page += 1
+        finally:
+            for future in pages:
+                future.cancel()
+    
+@metrics.timed("freshdesk_create")
+def create_freshdesk_contact(new_user, domain):
+    session = get_freshdesk_session(domain)
     
     try:
-        response  = requests.post("https://"+ domain +".freshdesk.com/api/v2/contacts", auth = (freshdesk_token, freshdesk_password), data = json.dumps(contact_info), headers = headers)
-        
-        if response.status_code == 201:
-                return response.json()
-        else:
-                error_message = (
-                f"Failed to create contact. "
-                f"Status Code: {response.status_code}, "
-                f"Response: {response.text}"
-            )
-                raise Exception(error_message)
+        response  = _send(session, domain, "post", _contacts_url(domain), data = json.dumps(_contact_info(new_user)))
+        contact = _check_create_response(response)
    
+    except FreshdeskDuplicateContact as e:
+        set_contact_id(domain, new_user.email, e.contact_id)
+        raise
     except Exception as e:
                  raise Exception(f"{str(e)}") from e
+
+    set_contact_id(domain, new_user.email, contact["id"])
+    return contact
              
              
+@metrics.timed("freshdesk_update")
 def update_freshdesk_contact(user, domain, contact_id):
-    freshdesk_token = os.getenv('FRESHDESK_TOKEN')
-    freshdesk_password =  os.getenv('FRESHDESK_PASSWORD')
+    session = get_freshdesk_session(domain)
     contact_id_str = str(contact_id)
-    if not freshdesk_token or not freshdesk_password:
-        raise Exception("Freshdesk credentials are not set in the environment variables.")
-
-    contact_info = {
-            "name": user.name,
-            "email": user.email,
-            "description": user.bio,    
-            "address": user.location
-        }
-    headers = { "Content-Type" : "application/json" }
     
     try: 
-        response = requests.put("https://"+ domain +".freshdesk.com/api/v2/contacts/"+contact_id_str, auth = (freshdesk_token, freshdesk_password), data = json.dumps(contact_info), headers = headers)
-
-        if response.status_code == 200:
-            return response.json()
-        else:
-            error_message = (
-                f"Failed to update the contact. "
-                f"Status Code: {response.status_code}, "
-                f"Response: {response.text}"
-            )
-            raise Exception(error_message)
+        response = _send(session, domain, "put", _contacts_url(domain)+"/"+contact_id_str, data = json.dumps(_contact_info(user)))
+        contact = _check_update_response(response)
     
     except Exception as e:
                  raise Exception(f"{str(e)}") from e
-        
\ No newline at end of file
+
+    set_contact_id(domain, user.email, contact_id)
+    return contact
+
+
+@metrics.timed("freshdesk_create")
+async def create_freshdesk_contact_async(new_user, domain):
+    freshdesk_token, freshdesk_password = _get_credentials()
+
+    try:
+        response = await _send_async(domain, "post", _contacts_url(domain), auth=(freshdesk_token, freshdesk_password), json=_contact_info(new_user))
+        contact = _check_create_response(response)
+
+    except FreshdeskDuplicateContact as e:
+        set_contact_id(domain, new_user.email, e.contact_id)
+        raise
+    except Exception as e:
+        raise Exception(f"{str(e)}") from e
+
+    set_contact_id(domain, new_user.email, contact["id"])
+    return contact
+
+
+@metrics.timed("freshdesk_update")
+async def update_freshdesk_contact_async(user, domain, contact_id):
+    freshdesk_token, freshdesk_password = _get_credentials()
+
+    try:
+        response = await _send_async(domain, "put", _contacts_url(domain)+"/"+str(contact_id), auth=(freshdesk_token, freshdesk_password), json=_contact_info(user))
+        contact = _check_update_response(response)
+
+    except Exception as e:
+        raise Exception(f"{str(e)}") from e
+
+    set_contact_id(domain, user.email, contact_id)
+    return contact
@@ -1,32 +1,281 @@
 import os
-from github import Github
+import asyncio
+import threading
+from github import Github, Auth, GithubException, UnknownObjectException
+from github.NamedUser import NamedUser
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 from data.models import User
+from data.github_cache import is_cache_enabled, get_cached_user, set_cached_user, is_known_missing, set_missing_user
+from routers.async_client import get_async_client
+from routers.rate_limiter import scheduler
+from services.metrics import metrics, HTTP_RESPONSES, HTTP_RETRIES
 
 load_dotenv()
 
-def get_user_info_from_github(github_username):
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', "https://api.github.com")
+RATE_LIMIT_MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', '5'))
+# Transient server errors retried by the client's connection pool.
+RETRY_STATUSES = (500, 502, 503, 504)
+
+_github_client = None
+_github_client_lock = threading.Lock()
+
+class GithubUserNotFound(Exception):
+    # The login doesn't exist on GitHub (or the account is suspended).
+    pass
+
+def _get_github_token():
     github_token = os.getenv('GITHUB_TOKEN')
     
     if not github_token:
         raise Exception("Github token is not set in the environment variables.")
+    return github_token
+
+def get_github_client():
+    # Shared by every lookup in the process so the pooled connection is reused.
+    global _github_client
+    if _github_client is None:
+        with _github_client_lock:
+            if _github_client is None:
+                github_token = _get_github_token()
+                _github_client = Github(
+                    auth=Auth.Token(github_token),
+                    base_url=GITHUB_API_URL,
+                    timeout=int(os.getenv('GITHUB_TIMEOUT', '15')),
+                    per_page=int(os.getenv('GITHUB_PER_PAGE', '100')),
+                    # Only server errors are retried here; rate limits are parked by _call_github.
+                    retry=Retry(
+                        total=int(os.getenv('GITHUB_MAX_RETRIES', '3')),
+                        status_forcelist=RETRY_STATUSES,
+                        allowed_methods=frozenset({"GET", "POST"}),
+                        respect_retry_after_header=False,
+                        raise_on_status=False,
+                    ),
+                    pool_size=int(os.getenv('GITHUB_POOL_SIZE', '10')),
+                    seconds_between_requests=float(os.getenv('GITHUB_SECONDS_BETWEEN_REQUESTS', '0')),
+                )
+    return _github_client
+
+def close_github_client():
+    global _github_client
+    with _github_client_lock:
+        if _github_client is not None:
+            _github_client.close()
+            _github_client = None
+
+def _observe_rate_limit(g, key):
+    # PyGithub keeps the rate-limit headers of the last response on its requester.
+    rate_limiting = g.requester.rate_limiting
+    if not isinstance(rate_limiting, tuple):
+        return
+    remaining, _ = rate_limiting
+    if remaining >= 0:
+        headers = {'X-RateLimit-Remaining': remaining, 'X-RateLimit-Reset': g.requester.rate_limiting_resettime}
+        scheduler.observe(key, 200, headers)
+
+def _call_github(g, key, func, *args, **kwargs):
+    # Paced by the scheduler's GitHub bucket. When the rate limit is hit (a 429, or
+    # a 403 with no requests left or a Retry-After) the bucket is parked until the
+    # limit resets and the call is retried.
+    for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+        scheduler.acquire(key)
+        try:
+            result = func(*args, **kwargs)
+        except GithubException as e:
+            metrics.inc(HTTP_RESPONSES, api=key, status=e.status)
+            if e.status not in (403, 429) or scheduler.observe(key, e.status, e.headers) is None or attempt == RATE_LIMIT_MAX_RETRIES:
+                raise
+            metrics.inc(HTTP_RETRIES, api=key)
+            continue
+        except Exception:
+            metrics.inc(HTTP_RESPONSES, api=key, status="error")
+            raise
+        # NamedUser.update() returns False when the server answered 304 Not Modified.
+        metrics.inc(HTTP_RESPONSES, api=key, status=304 if result is False else 200)
+        _observe_rate_limit(g, key)
+        return result
+
+def _to_user(login, name, email, bio, location, created_at):
+    return User.from_query_result(
+        id=None,  
+        github_username=login,
+        name=name,
+        email=email,
+        bio=bio,
+        location=location,
+        created_at=created_at,
+        is_recorded_fd=False, 
+        freshdesk_contact_id=None 
+    )
+
+def _get_named_user(g, github_username):
+    # With the cache enabled, a known profile is revalidated with If-None-Match;
+    # a 304 Not Modified answer doesn't count against the rate limit.
+    if not is_cache_enabled():
+        return _call_github(g, "github", g.get_user, github_username)
+
+    cached = get_cached_user(github_username)
+    if cached is None:
+        user = _call_github(g, "github", g.get_user, github_username)
+    else:
+        etag, raw_data = cached
+        user = g.create_from_raw_data(NamedUser, raw_data, headers={"etag": etag})
+        if not _call_github(g, "github", user.update):
+            return user
+
+    set_cached_user(github_username, user.etag, user.raw_data)
+    return user
+
+def _check_known_missing(github_username):
+    # Known-missing logins are skipped without a request while the cache entry is fresh.
+    if is_cache_enabled() and is_known_missing(github_username):
+        raise GithubUserNotFound(f"Error fetching user info from GitHub: user {github_username} not found (cached)")
+
+def _remember_missing(github_username):
+    if is_cache_enabled():
+        set_missing_user(github_username)
+
+@metrics.timed("github_fetch")
+def get_user_info_from_github(github_username):
+    _check_known_missing(github_username)
+    g = get_github_client()
     
     try:
-        g = Github(github_token)
-        user = g.get_user(github_username)
+        user = _get_named_user(g, github_username)
         
-        new_user = User.from_query_result(
-            id=None,  
-            github_username=user.login,
-            name=user.name,
-            email=user.email,
-            bio=user.bio,
-            location=user.location,
-            created_at=user.created_at,
-            is_recorded_fd=False, 
-            freshdesk_contact_id=None 
-        )
-        return new_user
+        return _to_user(user.login, user.name, user.email, user.bio, user.location, user.created_at)
+    except UnknownObjectException as e:
+        _remember_missing(github_username)
+        raise GithubUserNotFound(f"Error fetching user info from GitHub: {e}") from e
     except Exception as e:
         error_message = f"Error fetching user info from GitHub: {e}"
-        raise Exception(error_message) from e
\ No newline at end of file
+        raise Exception(error_message) from e
+
+async def _get_github_async(url, headers):
+    # Paced by the same "github" bucket as the sync lookups; a rate-limited
+    # request parks the bucket and is sent again once it resumes.
+    for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+        await scheduler.acquire_async("github")
+        response = await get_async_client().get(url, headers=headers)
+        metrics.inc(HTTP_RESPONSES, api="github", status=response.status_code)
+        if scheduler.observe("github", response.status_code, response.headers) is None or attempt == RATE_LIMIT_MAX_RETRIES:
+            return response
+        metrics.inc(HTTP_RETRIES, api="github")
+
+@metrics.timed("github_fetch")
+async def get_user_info_from_github_async(github_username):
+    # Uses the same ETag cache as the sync lookup; its sqlite calls run on a worker
+    # thread so they don't block the event loop.
+    await asyncio.to_thread(_check_known_missing, github_username)
+    github_token = _get_github_token()
+    headers = {
+        "Authorization": f"Bearer {github_token}",
+        "Accept": "application/vnd.github+json",
+    }
+    cached = await asyncio.to_thread(get_cached_user, github_username) if is_cache_enabled() else None
+    if cached is not None:
+        headers["If-None-Match"] = cached[0]
+
+    try:
+        response = await _get_github_async(f"{GITHUB_API_URL}/users/{github_username}", headers)
+
+        if response.status_code == 404:
+            await asyncio.to_thread(_remember_missing, github_username)
+            raise GithubUserNotFound(f"Status Code: {response.status_code}, Response: {response.text}")
+        if response.status_code == 304 and cached is not None:
+            user = cached[1]
+        elif response.status_code == 200:
+            user = response.json()
+            if is_cache_enabled():
+                await asyncio.to_thread(set_cached_user, github_username, response.headers.get("ETag"), user)
+        else:
+            raise Exception(f"Status Code: {response.status_code}, Response: {response.text}")
+
+        return _to_user(user['login'], user['name'], user['email'], user['bio'], user['location'], user['created_at'])
+    except GithubUserNotFound as e:
+        raise GithubUserNotFound(f"Error fetching user info from GitHub: {e}") from e
+    except Exception as e:
+        error_message = f"Error fetching user info from GitHub: {e}"
+        raise Exception(error_message) from e
+
+def iter_org_members(org, team=None):
+    # Yields the logins of an organization's (or one of its teams') members. Each
+    # page is requested only once the previous one has been consumed.
+    g = get_github_client()
+
+    try:
+        organization = _call_github(g, "github", g.get_organization, org)
+        if team:
+            members = _call_github(g, "github", organization.get_team_by_slug, team).get_members()
+        else:
+            members = organization.get_members()
+
+        page = 0
+        while True:
+            logins = [member.login for member in _call_github(g, "github", members.get_page, page)]
+            yield from logins
+            if len(logins) < g.per_page:
+                return
+            page += 1
+    except Exception as e:
+        target = f"team {org}/{team}" if team else f"organization {org}"
+        raise Exception(f"Error listing members of {target}: {e}") from e
+
+GRAPHQL_BATCH_SIZE = 100
+_GRAPHQL_USER_FIELDS = "login name email bio location createdAt"
+
+def _query_users_chunk(g, github_usernames):
+    aliases = {f"u{i}": github_username for i, github_username in enumerate(github_usernames)}
+    query = "query({}) {{ {} }}".format(
+        ", ".join(f"${alias}: String!" for alias in aliases),
+        " ".join(f"{alias}: user(login: ${alias}) {{ {_GRAPHQL_USER_FIELDS} }}" for alias in aliases),
+    )
+
+    _, response = _call_github(g, "github:graphql", g.requester.requestJsonAndCheck, "POST", g.requester.graphql_url, input={"query": query, "variables": aliases})
+    data = response.get("data") or {}
+    errors = [error for error in response.get("errors", []) if error.get("type") != "NOT_FOUND"]
+    if errors and not data:
+        raise Exception(errors[0].get("message"))
+
+    # Only a NOT_FOUND error on its own alias marks a login as missing. An alias
+    # that failed any other way (FORBIDDEN, RATE_LIMITED, ...) is left out of
+    # both results, so the caller looks that user up one by one instead.
+    not_found = {error["path"][0] for error in response.get("errors", []) if error.get("type") == "NOT_FOUND" and error.get("path")}
+
+    users = {}
+    missing = []
+    for alias, github_username in aliases.items():
+        user = data.get(alias)
+        if user is None:
+            if alias in not_found:
+                missing.append(github_username)
+        else:
+            users[github_username] = _to_user(user['login'], user['name'], user['email'] or None, user['bio'], user['location'], user['createdAt'])
+    return users, missing
+
+@metrics.timed("github_fetch_batch")
+def get_users_info_from_github(github_usernames):
+    # Resolves up to GRAPHQL_BATCH_SIZE logins per GraphQL request. Returns the
+    # users keyed by the requested login and the list of logins that don't exist;
+    # logins that failed for another reason are in neither.
+    g = get_github_client()
+    github_usernames = list(dict.fromkeys(github_usernames))
+    users = {}
+    missing = []
+
+    try:
+        if is_cache_enabled():
+            missing = [github_username for github_username in github_usernames if is_known_missing(github_username)]
+            github_usernames = [github_username for github_username in github_usernames if github_username not in missing]
+
+        for start in range(0, len(github_usernames), GRAPHQL_BATCH_SIZE):
+            chunk_users, chunk_missing = _query_users_chunk(g, github_usernames[start:start + GRAPHQL_BATCH_SIZE])
+            users.update(chunk_users)
+            missing.extend(chunk_missing)
+            for github_username in chunk_missing:
+                _remember_missing(github_username)
+        return users, missing
+    except Exception as e:
+        error_message = f"Error fetching users info from GitHub: {e}"
+        raise Exception(error_message) from e
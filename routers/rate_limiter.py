@@ -0,0 +1,135 @@
+import os
+import time
+import asyncio
+import threading
+from dotenv import load_dotenv
+from services.metrics import metrics, RATE_LIMIT_WAIT
+
+load_dotenv()
+
+# Window assumed for APIs that report a remaining budget without a reset time
+# (Freshdesk limits are per minute).
+DEFAULT_WINDOW_SECONDS = 60
+
+
+def _header_number(headers, name):
+    # PyGithub hands over plain dicts with lower-cased header names.
+    value = (headers.get(name) or headers.get(name.lower())) if headers else None
+    if isinstance(value, (str, int, float)):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+class TokenBucket:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.tokens = capacity
+        self.rate = None
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.rate is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _take(self) -> float:
+        # Takes a token and returns 0, or returns the seconds to wait before trying again.
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.rate is None or self.tokens >= 1:
+                self.tokens = max(self.tokens - 1, 0)
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self) -> float:
+        # Blocks until a request may be sent and returns the seconds spent waiting.
+        waited = 0.0
+        while True:
+            delay = self._take()
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    async def acquire_async(self) -> float:
+        # Same as acquire(), but waits without blocking the event loop.
+        waited = 0.0
+        while True:
+            delay = self._take()
+            if not delay:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def set_rate(self, rate):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RateLimitScheduler:
+    # One token bucket per API key ("github", "freshdesk:<subdomain>", ...). Buckets
+    # start unthrottled and learn their rate from the rate-limit response headers.
+    def __init__(self, burst=None):
+        self.burst = burst or int(os.getenv('RATE_LIMIT_BURST', '10'))
+        self.buckets = {}
+        self.waits = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, key) -> TokenBucket:
+        with self.lock:
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(self.burst)
+            return self.buckets[key]
+
+    def acquire(self, key) -> float:
+        return self._record_wait(key, self.bucket(key).acquire())
+
+    async def acquire_async(self, key) -> float:
+        return self._record_wait(key, await self.bucket(key).acquire_async())
+
+    def _record_wait(self, key, waited):
+        if waited:
+            with self.lock:
+                self.waits[key] = self.waits.get(key, 0.0) + waited
+            metrics.inc(RATE_LIMIT_WAIT, waited, key=key)
+        return waited
+
+    def observe(self, key, status_code, headers):
+        # Returns the seconds to wait before retrying when the request was rate limited.
+        bucket = self.bucket(key)
+        remaining = _header_number(headers, 'X-RateLimit-Remaining')
+        reset = _header_number(headers, 'X-RateLimit-Reset')
+        retry_after = _header_number(headers, 'Retry-After')
+
+        window = max(reset - time.time(), 1.0) if reset is not None else DEFAULT_WINDOW_SECONDS
+        if remaining is not None:
+            bucket.set_rate(max(remaining, 1.0) / window)
+
+        if status_code == 429 or (status_code == 403 and (remaining == 0 or retry_after is not None)):
+            delay = retry_after if retry_after is not None else window
+            bucket.pause(delay)
+            return delay
+        if remaining == 0:
+            bucket.pause(window)
+        return None
+
+    def reset(self):
+        with self.lock:
+            self.buckets.clear()
+            self.waits.clear()
+
+
+scheduler = RateLimitScheduler()
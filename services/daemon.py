@@ -0,0 +1,205 @@
+import os
+import hmac
+import json
+import queue
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from dotenv import load_dotenv
+from routers.github_api import GithubUserNotFound
+from services.metrics import metrics, OUTCOMES
+
+load_dotenv()
+
+MAX_BODY_BYTES = 5 * 1024 * 1024
+
+# Webhook actions that don't leave a profile worth syncing.
+IGNORED_ACTIONS = {"removed", "member_removed", "deleted"}
+
+
+def verify_signature(secret, body, signature):
+    # GitHub signs the raw body with HMAC-SHA256 in the X-Hub-Signature-256 header.
+    if not secret or not signature:
+        return False
+    expected = "sha256=" + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def usernames_from_event(event, payload):
+    # Returns the GitHub logins a webhook event asks to sync.
+    if payload.get("action") in IGNORED_ACTIONS:
+        return []
+    if event in ("member", "membership"):
+        user = payload.get("member")
+    elif event == "organization":
+        user = (payload.get("membership") or {}).get("user")
+    elif event == "user":
+        user = payload.get("user")
+    else:
+        return []
+    return [user["login"]] if user and user.get("login") else []
+
+
+class SyncDaemon:
+    # Long-running HTTP front end of the sync pipeline: GitHub webhooks and the
+    # admin endpoint queue usernames, and worker threads feed them to `sync`.
+    def __init__(self, sync, workers=4, host="127.0.0.1", port=8080, webhook_secret=None, admin_token=None, queue_size=10000):
+        self.sync = sync
+        self.workers = workers
+        self.webhook_secret = webhook_secret
+        self.admin_token = admin_token
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.threads = []
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def address(self):
+        return self.httpd.server_address
+
+    def enqueue(self, usernames) -> int:
+        queued = 0
+        for github_username in usernames:
+            try:
+                self.queue.put_nowait(github_username)
+            except queue.Full:
+                break
+            queued += 1
+        return queued
+
+    def _work(self):
+        while True:
+            github_username = self.queue.get()
+            if github_username is None:
+                return
+            try:
+                outcome = self.sync(github_username)
+                print(f"{github_username}: {outcome}")
+            except GithubUserNotFound:
+                outcome = "missing"
+                print(f"{github_username}: missing")
+            except Exception as e:
+                outcome = "failed"
+                print(f"{github_username}: failed: {e}")
+            metrics.inc(OUTCOMES, outcome=outcome)
+
+    def start_workers(self):
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def serve_forever(self):
+        # Returns after shutdown() or Ctrl-C, once the workers have synced
+        # every username still in the queue.
+        self.start_workers()
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.httpd.server_close()
+            for _ in self.threads:
+                self.queue.put(None)
+            for thread in self.threads:
+                thread.join()
+            self.threads = []
+
+    def shutdown(self):
+        # Must be called from another thread than serve_forever().
+        self.httpd.shutdown()
+
+    def _handler(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, payload, content_type="application/json"):
+                data = payload.encode('utf-8') if isinstance(payload, str) else json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _read_body(self):
+                # Replies with an error and returns None when the body can't be read.
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    self._reply(400, {"error": "invalid Content-Length"})
+                    return None
+                if length > MAX_BODY_BYTES:
+                    self._reply(413, {"error": "payload too large"})
+                    return None
+                return self.rfile.read(length)
+
+            def do_GET(self):
+                if self.path == "/healthz":
+                    self._reply(200, {"status": "ok", "queued": daemon.queue.qsize()})
+                elif self.path == "/metrics":
+                    self._reply(200, metrics.to_prometheus(), "text/plain; version=0.0.4")
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                body = self._read_body()
+                if body is None:
+                    return
+                if self.path == "/webhooks/github":
+                    self._webhook(body)
+                elif self.path == "/admin/enqueue":
+                    self._admin_enqueue(body)
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def _webhook(self, body):
+                if not verify_signature(daemon.webhook_secret, body, self.headers.get('X-Hub-Signature-256')):
+                    self._reply(401, {"error": "invalid signature"})
+                    return
+                event = self.headers.get('X-GitHub-Event', '')
+                if event == "ping":
+                    self._reply(200, {"status": "pong"})
+                    return
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    self._reply(400, {"error": "invalid JSON"})
+                    return
+                self._queue(usernames_from_event(event, payload))
+
+            def _admin_enqueue(self, body):
+                authorization = self.headers.get('Authorization', '')
+                if not daemon.admin_token or not hmac.compare_digest(authorization, f"Bearer {daemon.admin_token}"):
+                    self._reply(401, {"error": "invalid admin token"})
+                    return
+                try:
+                    usernames = json.loads(body)["usernames"]
+                except (ValueError, KeyError, TypeError):
+                    self._reply(400, {"error": "expected {\"usernames\": [...]}"})
+                    return
+                if not isinstance(usernames, list) or not all(isinstance(username, str) and username for username in usernames):
+                    self._reply(400, {"error": "usernames must be a list of GitHub logins"})
+                    return
+                self._queue(usernames)
+
+            def _queue(self, usernames):
+                queued = daemon.enqueue(usernames)
+                if queued < len(usernames):
+                    self._reply(503, {"queued": queued, "error": "sync queue is full"})
+                else:
+                    self._reply(202, {"queued": queued})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def daemon_settings():
+    return {
+        "host": os.getenv('DAEMON_HOST', '127.0.0.1'),
+        "port": int(os.getenv('DAEMON_PORT', '8080')),
+        "webhook_secret": os.getenv('GITHUB_WEBHOOK_SECRET'),
+        "admin_token": os.getenv('DAEMON_ADMIN_TOKEN'),
+        "queue_size": int(os.getenv('DAEMON_QUEUE_SIZE', '10000')),
+    }
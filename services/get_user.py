@@ -1,7 +1,42 @@
-from data.database import read_query
+from data.database import read_query, stream_query
+from data.models import User
+from services.metrics import metrics
 
+@metrics.timed("db_read")
 def get_user_info_from_db(github_username):
-    sql = "SELECT id, is_recorded_fd, freshdesk_contact_id FROM users WHERE github_username = ?"
+    sql = "SELECT id, is_recorded_fd, freshdesk_contact_id, sync_hash FROM users WHERE github_username = ?"
     params = (github_username,)
     result = read_query(sql, params)
     return result
+
+@metrics.timed("db_read")
+def get_stale_usernames(limit, active_interval, dormant_interval, active_window, retry_interval):
+    # A user whose profile changed within active_window seconds is stale after
+    # active_interval seconds, any other user after dormant_interval seconds.
+    # Users attempted within retry_interval seconds are skipped, whether or not
+    # that attempt succeeded, and the least recently attempted come first.
+    sql = (
+        "SELECT github_username FROM users "
+        "WHERE (last_synced_at IS NULL OR last_synced_at < NOW() - INTERVAL "
+        "(CASE WHEN last_changed_at >= NOW() - INTERVAL ? SECOND THEN ? ELSE ? END) SECOND) "
+        "AND (last_attempted_at IS NULL OR last_attempted_at < NOW() - INTERVAL ? SECOND) "
+        f"ORDER BY last_attempted_at LIMIT {int(limit)}"
+    )
+    result = read_query(sql, (int(active_window), int(active_interval), int(dormant_interval), int(retry_interval)))
+    return [github_username for github_username, in result]
+
+@metrics.timed("db_read")
+def get_users_info_from_db(github_usernames):
+    # One IN (...) query for a whole chunk, indexed by lower-cased username.
+    if not github_usernames:
+        return {}
+    placeholders = ", ".join("?" for _ in github_usernames)
+    sql = f"SELECT github_username, id, is_recorded_fd, freshdesk_contact_id, sync_hash FROM users WHERE github_username IN ({placeholders})"
+    result = read_query(sql, tuple(github_usernames))
+    return {github_username.lower(): tuple(row) for github_username, *row in result}
+
+def stream_users():
+    # Yields every stored user without loading the table into memory.
+    sql = "SELECT id, github_username, name, email, bio, location, created_at, is_recorded_fd, freshdesk_contact_id FROM users"
+    for row in stream_query(sql):
+        yield User.from_query_result(*row)
@@ -0,0 +1,235 @@
+import json
+import time
+import bisect
+import inspect
+import functools
+import threading
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = "sync_stage_duration_seconds"
+STAGE_CALLS = "sync_stage_calls_total"
+OUTCOMES = "sync_outcomes_total"
+HTTP_RESPONSES = "http_responses_total"
+HTTP_RETRIES = "http_retries_total"
+RATE_LIMIT_WAIT = "rate_limit_wait_seconds_total"
+CONCURRENCY_LIMIT = "concurrency_limit"
+
+_HELP = {
+    STAGE_SECONDS: "Latency of each sync stage.",
+    STAGE_CALLS: "Calls of each sync stage by result.",
+    OUTCOMES: "Synced users by outcome.",
+    HTTP_RESPONSES: "HTTP responses by API and status code.",
+    HTTP_RETRIES: "Requests sent again after a rate limit.",
+    RATE_LIMIT_WAIT: "Seconds spent waiting for the rate-limit scheduler.",
+    CONCURRENCY_LIMIT: "Current adaptive limit on in-flight requests.",
+}
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Interpolates inside the bucket holding the q-th observation, like
+        # Prometheus' histogram_quantile(); the overflow bucket reports its lower bound.
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+def _labels_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        f'{name}="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    # Process-wide counters, gauges and latency histograms, keyed by metric name and labels.
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _labels_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        key = (name, _labels_key(labels))
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels_key(labels))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        result = "error"
+        try:
+            yield
+            result = "ok"
+        finally:
+            self.observe(STAGE_SECONDS, time.perf_counter() - started, stage=stage)
+            self.inc(STAGE_CALLS, stage=stage, result=result)
+
+    def timed(self, stage):
+        # Decorator recording the latency and result of every call as `stage`.
+        def decorator(func):
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def timed_async(*args, **kwargs):
+                    with self.timer(stage):
+                        return await func(*args, **kwargs)
+                return timed_async
+
+            @functools.wraps(func)
+            def timed_sync(*args, **kwargs):
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+            return timed_sync
+        return decorator
+
+    def _counter_values(self, name):
+        with self.lock:
+            return {labels: value for (metric, labels), value in self.counters.items() if metric == name}
+
+    def _gauge_values(self, name):
+        with self.lock:
+            return {labels: value for (metric, labels), value in self.gauges.items() if metric == name}
+
+    def to_prometheus(self) -> str:
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted((key, histogram.counts[:], histogram.count, histogram.sum, histogram.buckets) for key, histogram in self.histograms.items())
+
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            declare(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+
+        for (name, labels), value in gauges:
+            declare(name, "gauge")
+            lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+
+        for (name, labels), counts, count, total, buckets in histograms:
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', repr(float(bound)))])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def summary(self) -> dict:
+        stages = {}
+        with self.lock:
+            histograms = {dict(labels)["stage"]: histogram for (name, labels), histogram in self.histograms.items() if name == STAGE_SECONDS}
+            for stage, histogram in sorted(histograms.items()):
+                stages[stage] = {
+                    "calls": histogram.count,
+                    "errors": 0,
+                    "total_s": round(histogram.sum, 6),
+                    "avg_ms": _ms(histogram.sum / histogram.count) if histogram.count else None,
+                    "p50_ms": _ms(histogram.quantile(0.50)),
+                    "p95_ms": _ms(histogram.quantile(0.95)),
+                    "p99_ms": _ms(histogram.quantile(0.99)),
+                }
+        for labels, value in self._counter_values(STAGE_CALLS).items():
+            labels = dict(labels)
+            if labels["result"] == "error" and labels["stage"] in stages:
+                stages[labels["stage"]]["errors"] = value
+
+        http_responses = {}
+        for labels, value in sorted(self._counter_values(HTTP_RESPONSES).items()):
+            labels = dict(labels)
+            http_responses.setdefault(labels["api"], {})[labels["status"]] = value
+
+        return {
+            "stages": stages,
+            "outcomes": {dict(labels)["outcome"]: value for labels, value in sorted(self._counter_values(OUTCOMES).items())},
+            "http_responses": http_responses,
+            "retries": {dict(labels)["api"]: value for labels, value in sorted(self._counter_values(HTTP_RETRIES).items())},
+            "rate_limit_wait_s": {dict(labels)["key"]: round(value, 3) for labels, value in sorted(self._counter_values(RATE_LIMIT_WAIT).items())},
+            "concurrency_limits": {dict(labels)["key"]: value for labels, value in sorted(self._gauge_values(CONCURRENCY_LIMIT).items())},
+        }
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+metrics = MetricsRegistry()
+
+
+def write_metrics(json_path=None, prometheus_path=None):
+    # '-' writes to stdout.
+    if json_path:
+        _write(json_path, json.dumps(metrics.summary(), indent=2) + "\n")
+    if prometheus_path:
+        _write(prometheus_path, metrics.to_prometheus())
+
+
+def _write(path, text):
+    if path == '-':
+        print(text, end="")
+        return
+    with open(path, "w", encoding="utf-8") as output:
+        output.write(text)
@@ -0,0 +1,61 @@
+from data.database import transaction, update_query
+from data.models import User
+from services.metrics import metrics
+
+# Re-enqueueing a user that is already waiting only bumps the version, so a
+# drainer pushing the older version leaves the entry for the next round.
+ENQUEUE_SQL = (
+    "INSERT INTO freshdesk_outbox (user_id, freshdesk_domain) VALUES (?, ?) "
+    "ON DUPLICATE KEY UPDATE version = version + 1"
+)
+
+def enqueue_freshdesk_push(cursor, user_id, freshdesk_domain):
+    # Runs on the caller's cursor so the entry commits together with the user row.
+    cursor.execute(ENQUEUE_SQL, (user_id, freshdesk_domain))
+
+@metrics.timed("outbox_claim")
+def claim_outbox_entries(limit, lease_seconds):
+    # Claimed entries are leased rather than kept locked, so no transaction stays
+    # open during the Freshdesk call; an entry whose drainer died is claimed
+    # again once its lease runs out.
+    with transaction() as cursor:
+        cursor.execute(
+            "SELECT id FROM freshdesk_outbox WHERE available_at <= NOW() "
+            f"ORDER BY available_at LIMIT {int(limit)} FOR UPDATE SKIP LOCKED"
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return []
+
+        placeholders = ", ".join("?" for _ in ids)
+        cursor.execute(
+            "UPDATE freshdesk_outbox SET attempts = attempts + 1, available_at = NOW() + INTERVAL ? SECOND "
+            f"WHERE id IN ({placeholders})",
+            (int(lease_seconds), *ids)
+        )
+        cursor.execute(
+            "SELECT o.id, o.version, o.freshdesk_domain, u.id, u.github_username, u.name, u.email, u.bio, u.location, "
+            "u.created_at, u.is_recorded_fd, u.freshdesk_contact_id, u.sync_hash, o.attempts "
+            f"FROM freshdesk_outbox o JOIN users u ON u.id = o.user_id WHERE o.id IN ({placeholders})",
+            tuple(ids)
+        )
+        rows = cursor.fetchall()
+
+    entries = []
+    for outbox_id, version, freshdesk_domain, user_id, github_username, name, email, bio, location, created_at, is_recorded_fd, freshdesk_contact_id, sync_hash, attempts in rows:
+        user_info = User.from_query_result(user_id, github_username, name, email, bio, location, created_at, is_recorded_fd, freshdesk_contact_id)
+        entries.append((outbox_id, version, freshdesk_domain, user_info, sync_hash, attempts))
+    return entries
+
+def complete_outbox_entry(outbox_id, version):
+    with transaction() as cursor:
+        cursor.execute("DELETE FROM freshdesk_outbox WHERE id = ? AND version = ?", (outbox_id, version))
+        if cursor.rowcount == 0:
+            # Re-enqueued while it was being pushed: push the newer version next.
+            cursor.execute("UPDATE freshdesk_outbox SET attempts = 0, last_error = NULL, available_at = NOW() WHERE id = ?", (outbox_id,))
+
+def fail_outbox_entry(outbox_id, error, retry_in):
+    update_query(
+        "UPDATE freshdesk_outbox SET last_error = ?, available_at = NOW() + INTERVAL ? SECOND WHERE id = ?",
+        (str(error), int(retry_in), outbox_id)
+    )
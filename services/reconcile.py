@@ -0,0 +1,57 @@
+import json
+import hashlib
+
+MISSING = "missing"
+ORPHANED = "orphaned"
+DIVERGENT = "divergent"
+UNLINKED = "unlinked"
+
+
+def _digest(name, email, bio, location):
+    # Compact hash of the synced fields. Freshdesk stores emails lower-cased and
+    # empty fields as empty strings, so both are normalised before hashing.
+    fields = [name or None, email.lower() if email else None, bio or None, location or None]
+    return int.from_bytes(hashlib.sha256(json.dumps(fields).encode('utf-8')).digest()[:8], 'big')
+
+
+def index_contacts(contacts):
+    # Build side of the join: only the id, email and a 64-bit digest of each
+    # contact are kept, so 500k contacts fit in a few dozen MB.
+    by_id = {}
+    by_email = {}
+    for contact in contacts:
+        by_id[contact["id"]] = _digest(contact.get("name"), contact.get("email"), contact.get("description"), contact.get("address"))
+        if contact.get("email"):
+            by_email[contact["email"].lower()] = contact["id"]
+    return by_id, by_email
+
+
+def reconcile(contacts, users):
+    # Joins the streamed users to the indexed contacts on the stored contact id,
+    # falling back to the email, and yields (kind, user, contact_id) for every
+    # record that differs:
+    #   missing   - the user has no contact in Freshdesk
+    #   unlinked  - a contact with the user's email exists but isn't stored as theirs
+    #   divergent - the linked contact's fields differ from the user's
+    #   orphaned  - a contact no user links or matches (user is None)
+    by_id, by_email = index_contacts(contacts)
+
+    for user in users:
+        contact_id = user.freshdesk_contact_id
+        if contact_id not in by_id:
+            contact_id = by_email.get(user.email.lower()) if user.email else None
+            if contact_id not in by_id:
+                yield MISSING, user, None
+                continue
+            kind = UNLINKED
+        elif by_id[contact_id] != _digest(user.name, user.email, user.bio, user.location):
+            kind = DIVERGENT
+        else:
+            kind = None
+
+        del by_id[contact_id]
+        if kind:
+            yield kind, user, contact_id
+
+    for contact_id in by_id:
+        yield ORPHANED, None, contact_id
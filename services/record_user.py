@@ -1,24 +1,68 @@
-from data.database import insert_query
-          
-def persist_user_info(user_info):
-    sql = (
-        "INSERT INTO users (github_username, name, email, bio, location, created_at, is_recorded_fd, freshdesk_contact_id) "
-        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
-    )
-    params = (
+from data.database import insert_many_query, transaction
+from services.get_user import get_users_info_from_db
+from services.metrics import metrics
+from services.outbox import enqueue_freshdesk_push
+
+# The IF() guards keep a conflict on the unique email from overwriting another user's row.
+UPSERT_SQL = (
+    "INSERT INTO users (github_username, name, email, bio, location, created_at, is_recorded_fd, freshdesk_contact_id) "
+    "VALUES (?, ?, ?, ?, ?, ?, 0, NULL) "
+    "ON DUPLICATE KEY UPDATE "
+    "name = IF(github_username = VALUES(github_username), VALUES(name), name), "
+    "email = IF(github_username = VALUES(github_username), VALUES(email), email), "
+    "bio = IF(github_username = VALUES(github_username), VALUES(bio), bio), "
+    "location = IF(github_username = VALUES(github_username), VALUES(location), location)"
+)
+
+def _upsert_params(user_info):
+    return (
         user_info.github_username,
-        user_info.name, 
-        user_info.email, 
-        user_info.bio, 
-        user_info.location, 
-        user_info.created_at,
-        0,  
-        None
+        user_info.name,
+        user_info.email,
+        user_info.bio,
+        user_info.location,
+        user_info.created_at
     )
+
+def needs_freshdesk_push(is_recorded_fd, stored_sync_hash, user_info):
+    return not is_recorded_fd or stored_sync_hash != user_info.fingerprint()
+
+@metrics.timed("db_persist")
+def upsert_user_info(user_info, outbox_domain=None):
+    # Inserts the user or refreshes its GitHub fields in a single atomic statement,
+    # then reads back its sync state in the same transaction. With an outbox domain,
+    # a pending Freshdesk push is enqueued in that transaction as well.
+    upsert_params = _upsert_params(user_info)
+    select_sql = "SELECT id, is_recorded_fd, freshdesk_contact_id, sync_hash FROM users WHERE github_username = ?"
     try:
-        user_id = insert_query(sql, params)
-        return user_id
+        with transaction() as cursor:
+            cursor.execute(UPSERT_SQL, upsert_params)
+            created = cursor.rowcount == 1
+            cursor.execute(select_sql, (user_info.github_username,))
+            row = cursor.fetchone()
+            if outbox_domain and row is not None and needs_freshdesk_push(row[1], row[3], user_info):
+                enqueue_freshdesk_push(cursor, row[0], outbox_domain)
     except Exception as e:
         raise Exception(f"Failed to persist user info: {e}")
 
- 
\ No newline at end of file
+    if row is None:
+        raise Exception(f"Failed to persist user info: email {user_info.email} is already used by another user")
+    return (*row, created)
+
+
+@metrics.timed("db_persist_batch")
+def bulk_upsert_user_info(users):
+    # Upserts a whole chunk with one executemany and returns the sync state of each
+    # user keyed by lower-cased username, in the same shape as upsert_user_info.
+    usernames = [user_info.github_username for user_info in users]
+    try:
+        existing = get_users_info_from_db(usernames)
+        insert_many_query(UPSERT_SQL, [_upsert_params(user_info) for user_info in users])
+        new_usernames = [username for username in usernames if username.lower() not in existing]
+        created = get_users_info_from_db(new_usernames)
+    except Exception as e:
+        raise Exception(f"Failed to persist users info: {e}")
+
+    states = {username: (*row, False) for username, row in existing.items()}
+    states.update({username: (*row, True) for username, row in created.items()})
+    return states
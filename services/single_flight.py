@@ -0,0 +1,67 @@
+import time
+import threading
+
+
+class _Flight:
+    def __init__(self, previous, started):
+        self.previous = previous
+        self.started = started
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Calls with the same key registered within `window` seconds of each other
+    # share one execution and its result. A later call never shares a run that
+    # started long before it, so it can't miss a change made in between; it
+    # waits for the running one instead, so runs of a key never overlap.
+    def __init__(self, window=0.0):
+        self.window = window
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.pruned_at = 0.0
+
+    def do(self, key, func, *args, **kwargs):
+        # Returns (result, shared); shared is True when another call did the work.
+        now = time.monotonic()
+        with self.lock:
+            self._prune(now)
+            flight = self.flights.get(key)
+            failed = flight is not None and flight.done.is_set() and flight.error is not None
+            if flight is not None and now - flight.started <= self.window and not failed:
+                leader = False
+            else:
+                previous = flight if flight is not None and not flight.done.is_set() else None
+                flight = self.flights[key] = _Flight(previous, now)
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            if flight.previous is not None:
+                flight.previous.done.wait()
+                flight.previous = None
+            flight.result = func(*args, **kwargs)
+            return flight.result, False
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            flight.done.set()
+
+    def reset(self):
+        with self.lock:
+            self.flights.clear()
+
+    def _prune(self, now):
+        if now - self.pruned_at < 1.0:
+            return
+        self.pruned_at = now
+        expired = [key for key, flight in self.flights.items() if flight.done.is_set() and now - flight.started > self.window]
+        for key in expired:
+            del self.flights[key]
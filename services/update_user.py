@@ -1,31 +1,29 @@
 from data.database import update_query
+from services.metrics import metrics
 
-def update_user_recorded_status(user_id, freshdesk_contact_id):
+@metrics.timed("db_mark_synced")
+def update_user_recorded_status(user_id, freshdesk_contact_id, sync_hash=None):
+    # last_changed_at only moves when a stored hash changes, not when a user is
+    # first linked; it is assigned before sync_hash, which MariaDB updates in order.
     update_sql = """
     UPDATE users
-    SET is_recorded_fd = 1, freshdesk_contact_id = ?
+    SET last_changed_at = IF(sync_hash IS NULL OR sync_hash <=> ?, last_changed_at, NOW()),
+        is_recorded_fd = 1, freshdesk_contact_id = ?, sync_hash = ?,
+        last_synced_at = NOW(), last_attempted_at = NOW()
     WHERE id = ?
     """
-    update_params = (freshdesk_contact_id, user_id)
+    update_params = (sync_hash, freshdesk_contact_id, sync_hash, user_id)
     update_query(update_sql, update_params)
-    
-def update_user_full_info(id, user):
-    update_sql = """
-    UPDATE users
-    SET 
-        name = ?, 
-        email = ?, 
-        bio = ?, 
-        location = ? 
-    WHERE id = ?
-    """
-    
-    update_params = (
-        user.name,
-        user.email,
-        user.bio,
-        user.location,
-        id
-    )
-    
-    update_query(update_sql, update_params)
\ No newline at end of file
+
+@metrics.timed("db_mark_synced")
+def update_user_synced_at(user_id):
+    # Records a sync that found nothing to push to Freshdesk.
+    update_query("UPDATE users SET last_synced_at = NOW(), last_attempted_at = NOW() WHERE id = ?", (user_id,))
+
+@metrics.timed("db_mark_synced")
+def update_users_attempted_at(github_usernames):
+    # Stamped whatever the outcome, so users that keep failing are not picked first every refresh round.
+    if not github_usernames:
+        return
+    placeholders = ", ".join("?" for _ in github_usernames)
+    update_query(f"UPDATE users SET last_attempted_at = NOW() WHERE github_username IN ({placeholders})", tuple(github_usernames))
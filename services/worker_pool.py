@@ -0,0 +1,87 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def run_concurrently(func, items, workers, max_pending=None):
+    # Yields (item, result, error) tuples in completion order. Items are pulled
+    # from the iterable lazily, so at most `max_pending` of them are in memory.
+    # An error raised by the iterable is raised once the items already started
+    # have been yielded.
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    max_pending = max_pending or workers * 2
+    items = iter(items)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        source_error = None
+
+        def submit_next():
+            nonlocal source_error
+            if source_error is not None:
+                return False
+            try:
+                for item in items:
+                    pending[executor.submit(func, item)] = item
+                    return True
+            except Exception as e:
+                source_error = e
+            return False
+
+        while len(pending) < max_pending and submit_next():
+            pass
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                error = future.exception()
+                yield item, (None if error else future.result()), error
+                submit_next()
+
+    if source_error is not None:
+        raise source_error
+
+
+_END = object()
+
+
+def prefetch_in_background(items, max_buffered):
+    # Iterates `items` on a background thread, at most `max_buffered` items ahead
+    # of the consumer, so producing the next items overlaps with handling the
+    # current ones. An error raised by `items` is raised to the consumer.
+    buffer = queue.Queue(maxsize=max_buffered)
+    stopped = threading.Event()
+
+    def put(entry):
+        while not stopped.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+        except Exception as e:
+            put((_END, e))
+            return
+        put((_END, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
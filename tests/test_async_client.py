@@ -0,0 +1,31 @@
+import asyncio
+import unittest
+from routers.async_client import get_async_client, close_async_client
+
+
+class AsyncClient_Should(unittest.TestCase):
+
+    def test_is_shared_within_an_event_loop(self):
+        async def lookup():
+            client = get_async_client()
+            self.assertIs(get_async_client(), client)
+            await close_async_client()
+            return client
+
+        asyncio.run(lookup())
+
+    def test_is_separate_per_event_loop(self):
+        async def lookup():
+            client = get_async_client()
+            await close_async_client()
+            return client
+
+        first = asyncio.run(lookup())
+        second = asyncio.run(lookup())
+
+        self.assertIsNot(first, second)
+        self.assertTrue(first.is_closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
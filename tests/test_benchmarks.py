@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import patch
+import argparse
+import itertools
+import threading
+import main
+from benchmarks.fake_servers import _FakeServer, FakeGitHub, FakeFreshdesk
+from benchmarks.run_benchmark import run_once
+from data.contact_index import clear_contact_index
+from routers.github_api import close_github_client
+from routers.freshdesk_api import close_freshdesk_sessions
+
+
+class _Users:
+    # In-memory stand-in for the users table, as no MariaDB runs under the tests.
+    def __init__(self):
+        self.rows = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def upsert(self, user_info):
+        with self.lock:
+            if user_info.github_username in self.rows:
+                return (*self.rows[user_info.github_username], False)
+            self.rows[user_info.github_username] = (next(self.ids), False, None, None)
+            return (*self.rows[user_info.github_username], True)
+
+    def bulk_upsert(self, users):
+        return {user_info.github_username.lower(): self.upsert(user_info) for user_info in users}
+
+    def mark_recorded(self, user_id, freshdesk_contact_id, sync_hash):
+        with self.lock:
+            for github_username, row in self.rows.items():
+                if row[0] == user_id:
+                    self.rows[github_username] = (user_id, True, freshdesk_contact_id, sync_hash)
+
+
+class FakeServer_Should(unittest.TestCase):
+    def test_require_a_route(self):
+        with self.assertRaises(TypeError):
+            _FakeServer()
+
+
+class RunBenchmark_Should(unittest.TestCase):
+    def setUp(self):
+        main.sync_flights.reset()
+        clear_contact_index()
+        close_github_client()
+        self.github = FakeGitHub().start()
+        self.freshdesk = FakeFreshdesk().start()
+        self.users = _Users()
+
+        for patcher in (
+            patch('routers.github_api.GITHUB_API_URL', self.github.url),
+            patch('routers.freshdesk_api.FRESHDESK_API_URL', self.freshdesk.url + "/api/v2"),
+            patch.dict('os.environ', {"GITHUB_TOKEN": "bench-token", "FRESHDESK_TOKEN": "bench-token", "FRESHDESK_PASSWORD": "X"}),
+            patch('main.upsert_user_info', self.users.upsert),
+            patch('main.bulk_upsert_user_info', self.users.bulk_upsert),
+            patch('main.update_user_recorded_status', self.users.mark_recorded),
+            patch('main.update_user_synced_at'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        close_github_client()
+        close_freshdesk_sessions()
+        self.github.stop()
+        self.freshdesk.stop()
+
+    def _args(self, graphql):
+        return argparse.Namespace(workers=4, graphql=graphql, missing_rate=0.2)
+
+    def test_sync_every_user_over_rest(self):
+        result = run_once(main, self.github, self.freshdesk, self._args(graphql=False), 10)
+
+        self.assertEqual(result["outcomes"], {"created": 8, "missing": 2})
+        self.assertEqual(result["requests"]["freshdesk"]["POST 201"], 8)
+        self.assertEqual(len(self.users.rows), 8)
+        self.assertGreater(result["peak_rss_kb"], 0)
+
+    def test_report_the_peak_rss_of_each_run(self):
+        ballast = bytearray(64 * 1024 * 1024)
+        ballast[::4096] = b"x" * len(ballast[::4096])
+        first = run_once(main, self.github, self.freshdesk, self._args(graphql=False), 2)["peak_rss_kb"]
+        del ballast
+
+        second = run_once(main, self.github, self.freshdesk, self._args(graphql=False), 2)["peak_rss_kb"]
+
+        self.assertLess(second, first - 32 * 1024)
+
+    def test_sync_every_user_over_graphql(self):
+        result = run_once(main, self.github, self.freshdesk, self._args(graphql=True), 10)
+
+        self.assertEqual(result["outcomes"], {"created": 8, "missing": 2})
+        self.assertEqual(result["requests"]["freshdesk"]["POST 201"], 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
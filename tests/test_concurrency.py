@@ -0,0 +1,155 @@
+import time
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+from routers.concurrency import AdaptiveLimiter, get_freshdesk_limiter, freshdesk_concurrency_limits, reset_freshdesk_limiters
+from services.metrics import metrics
+
+
+class AdaptiveLimiter_Should(unittest.TestCase):
+
+    def test_increases_additively_on_healthy_responses(self):
+        limiter = AdaptiveLimiter(initial=2, max_limit=10)
+
+        for _ in range(4):
+            limiter._record(0.1, 200)
+
+        self.assertEqual(limiter.current_limit, 3)
+
+    def test_backs_off_multiplicatively_on_429_and_5xx(self):
+        limiter = AdaptiveLimiter(initial=16, min_limit=1)
+
+        limiter._record(0.1, 429)
+        self.assertEqual(limiter.current_limit, 8)
+        limiter._record(0.1, 503)
+        self.assertEqual(limiter.current_limit, 4)
+
+    def test_backs_off_once_per_congestion_event(self):
+        limiter = AdaptiveLimiter(initial=32, max_limit=32)
+        slots = [limiter.slot() for _ in range(8)]
+        for slot in slots:
+            slot.__enter__()
+
+        for slot in slots:
+            slot.status_code = 429
+            slot.__exit__(None, None, None)
+        self.assertEqual(limiter.current_limit, 16)
+
+        with limiter.slot() as slot:
+            slot.status_code = 429
+        self.assertEqual(limiter.current_limit, 8)
+
+    def test_backs_off_on_latency_spike(self):
+        limiter = AdaptiveLimiter(initial=8, spike_factor=3)
+        limiter._record(0.1, 200)
+
+        limiter._record(1.0, 200)
+
+        self.assertEqual(limiter.current_limit, 4)
+
+    def test_stays_within_bounds(self):
+        limiter = AdaptiveLimiter(initial=2, min_limit=2, max_limit=3)
+
+        limiter._record(0.1, 429)
+        self.assertEqual(limiter.current_limit, 2)
+        for _ in range(20):
+            limiter._record(0.1, 200)
+        self.assertEqual(limiter.current_limit, 3)
+
+    def test_slot_records_errors(self):
+        limiter = AdaptiveLimiter(initial=4)
+
+        with self.assertRaises(ConnectionError):
+            with limiter.slot():
+                raise ConnectionError("Connection reset")
+
+        self.assertEqual(limiter.current_limit, 2)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_limits_requests_in_flight(self):
+        limiter = AdaptiveLimiter(initial=2, max_limit=2)
+        peak = []
+        lock = threading.Lock()
+
+        def request():
+            with limiter.slot() as slot:
+                with lock:
+                    peak.append(limiter.in_flight)
+                time.sleep(0.02)
+                slot.status_code = 200
+
+        threads = [threading.Thread(target=request) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLessEqual(max(peak), 2)
+
+
+class AdaptiveLimiterAsync_Should(unittest.IsolatedAsyncioTestCase):
+
+    async def test_waiters_get_released_slots(self):
+        limiter = AdaptiveLimiter(initial=1, max_limit=1)
+        order = []
+
+        async def request(name):
+            async with limiter.async_slot() as slot:
+                order.append(name)
+                await asyncio.sleep(0.01)
+                slot.status_code = 200
+
+        await asyncio.gather(*(request(name) for name in "abc"))
+
+        self.assertEqual(order, ["a", "b", "c"])
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_cancelled_waiter_takes_no_slot(self):
+        limiter = AdaptiveLimiter(initial=1, max_limit=1)
+        holder = limiter.async_slot()
+        await holder.__aenter__()
+        waiter = asyncio.create_task(limiter.async_slot().__aenter__())
+        await asyncio.sleep(0.01)
+
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        holder.status_code = 200
+        await holder.__aexit__(None, None, None)
+
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(len(limiter.waiters), 0)
+        async with limiter.async_slot():
+            self.assertEqual(limiter.in_flight, 1)
+
+
+class FreshdeskLimiters_Should(unittest.TestCase):
+
+    def setUp(self):
+        reset_freshdesk_limiters()
+        metrics.reset()
+
+    def tearDown(self):
+        reset_freshdesk_limiters()
+
+    @patch.dict('os.environ', {'FRESHDESK_CONCURRENCY_INITIAL': '6'})
+    def test_exposes_current_limit_per_domain(self):
+        self.assertIs(get_freshdesk_limiter('example'), get_freshdesk_limiter('example'))
+
+        self.assertEqual(freshdesk_concurrency_limits(), {'example': 6})
+
+    @patch.dict('os.environ', {'FRESHDESK_CONCURRENCY_INITIAL': '8'})
+    def test_publishes_limit_changes_as_a_gauge(self):
+        limiter = get_freshdesk_limiter('example')
+        self.assertEqual(metrics.summary()["concurrency_limits"], {'freshdesk:example': 8})
+
+        with limiter.slot() as slot:
+            slot.status_code = 429
+
+        self.assertEqual(metrics.summary()["concurrency_limits"], {'freshdesk:example': 4})
+        self.assertIn('concurrency_limit{key="freshdesk:example"} 4', metrics.to_prometheus())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import hmac
+import json
+import hashlib
+import threading
+import unittest
+import urllib.request
+import urllib.error
+import http.client
+from unittest.mock import patch
+from services.daemon import SyncDaemon, usernames_from_event, verify_signature, MAX_BODY_BYTES
+
+
+def _sign(secret, body):
+    return "sha256=" + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+class Webhooks_Should(unittest.TestCase):
+
+    def test_verify_signature(self):
+        body = b'{"action": "member_added"}'
+
+        self.assertTrue(verify_signature('secret', body, _sign('secret', body)))
+        self.assertFalse(verify_signature('secret', body, _sign('other', body)))
+        self.assertFalse(verify_signature(None, body, _sign('secret', body)))
+
+    def test_extract_usernames_from_events(self):
+        self.assertEqual(usernames_from_event('organization', {'action': 'member_added', 'membership': {'user': {'login': 'octocat'}}}), ['octocat'])
+        self.assertEqual(usernames_from_event('member', {'action': 'added', 'member': {'login': 'hubot'}}), ['hubot'])
+        self.assertEqual(usernames_from_event('user', {'action': 'created', 'user': {'login': 'monalisa'}}), ['monalisa'])
+        self.assertEqual(usernames_from_event('organization', {'action': 'member_removed', 'membership': {'user': {'login': 'octocat'}}}), [])
+        self.assertEqual(usernames_from_event('push', {'sender': {'login': 'octocat'}}), [])
+
+
+class SyncDaemon_Should(unittest.TestCase):
+
+    def setUp(self):
+        self.synced = []
+        self.synced_event = threading.Event()
+
+        def sync(github_username):
+            self.synced.append(github_username)
+            self.synced_event.set()
+            return 'updated'
+
+        self.daemon = SyncDaemon(sync, workers=2, port=0, webhook_secret='secret', admin_token='token')
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        with patch('builtins.print'):
+            self.thread.start()
+        host, port = self.daemon.address[:2]
+        self.url = f"http://{host}:{port}"
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.thread.join()
+
+    def _request(self, path, body=None, headers=None):
+        request = urllib.request.Request(self.url + path, data=body, headers=headers or {}, method="POST" if body is not None else "GET")
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def test_syncs_users_from_signed_webhooks(self):
+        body = json.dumps({'action': 'member_added', 'membership': {'user': {'login': 'octocat'}}}).encode('utf-8')
+
+        with patch('builtins.print'):
+            status, _ = self._request('/webhooks/github', body, {'X-GitHub-Event': 'organization', 'X-Hub-Signature-256': _sign('secret', body)})
+            self.assertTrue(self.synced_event.wait(5))
+
+        self.assertEqual(status, 202)
+        self.assertEqual(self.synced, ['octocat'])
+
+    def test_rejects_unsigned_webhooks(self):
+        body = json.dumps({'action': 'member_added', 'membership': {'user': {'login': 'octocat'}}}).encode('utf-8')
+
+        status, _ = self._request('/webhooks/github', body, {'X-GitHub-Event': 'organization', 'X-Hub-Signature-256': _sign('wrong', body)})
+
+        self.assertEqual(status, 401)
+        self.assertEqual(self.synced, [])
+
+    def test_admin_enqueue_requires_token(self):
+        body = json.dumps({'usernames': ['octocat']}).encode('utf-8')
+
+        status, _ = self._request('/admin/enqueue', body, {'Authorization': 'Bearer wrong'})
+        self.assertEqual(status, 401)
+
+        with patch('builtins.print'):
+            status, response = self._request('/admin/enqueue', body, {'Authorization': 'Bearer token'})
+            self.assertTrue(self.synced_event.wait(5))
+
+        self.assertEqual(status, 202)
+        self.assertEqual(json.loads(response), {'queued': 1})
+        self.assertEqual(self.synced, ['octocat'])
+
+    def _post_with_length(self, path, content_length):
+        # urllib always sends the real length, so the header is written by hand.
+        host, port = self.daemon.address[:2]
+        connection = http.client.HTTPConnection(host, port, timeout=5)
+        try:
+            connection.putrequest("POST", path)
+            connection.putheader("Content-Length", content_length)
+            connection.endheaders()
+            return connection.getresponse().status
+        finally:
+            connection.close()
+
+    def test_rejects_invalid_content_length(self):
+        self.assertEqual(self._post_with_length('/admin/enqueue', 'abc'), 400)
+        self.assertEqual(self._post_with_length('/admin/enqueue', '-1'), 400)
+
+    def test_rejects_oversized_bodies(self):
+        self.assertEqual(self._post_with_length('/webhooks/github', str(MAX_BODY_BYTES + 1)), 413)
+        self.assertEqual(self.synced, [])
+
+    def test_serves_health_and_metrics(self):
+        status, response = self._request('/healthz')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(response)['status'], 'ok')
+
+        status, _ = self._request('/metrics')
+        self.assertEqual(status, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from mariadb import PoolError
+import data.database as database
+
+
+class Database_Should(unittest.TestCase):
+
+    def setUp(self):
+        database._pool = None
+
+    def tearDown(self):
+        database._pool = None
+
+    @patch.dict('os.environ', {'DB_PORT': '3306', 'DB_POOL_SIZE': '4'})
+    @patch('data.database.ConnectionPool')
+    def test_pool_is_created_once(self, MockConnectionPool):
+        database._get_connection()
+        database._get_connection()
+
+        MockConnectionPool.assert_called_once()
+        self.assertEqual(MockConnectionPool.call_args.kwargs['pool_size'], 4)
+        self.assertEqual(MockConnectionPool.return_value.get_connection.call_count, 2)
+
+    @patch.dict('os.environ', {'DB_PORT': '3306'})
+    @patch('data.database.ConnectionPool')
+    def test_read_query_uses_pooled_connection(self, MockConnectionPool):
+        mock_conn = MockConnectionPool.return_value.get_connection.return_value
+        mock_cursor = mock_conn.__enter__.return_value.cursor.return_value
+        mock_cursor.__iter__.return_value = iter([(1, True, 432)])
+
+        result = database.read_query("SELECT id FROM users WHERE github_username = ?", ('test',))
+
+        self.assertEqual(result, [(1, True, 432)])
+        mock_cursor.execute.assert_called_once_with("SELECT id FROM users WHERE github_username = ?", ('test',))
+        mock_conn.__exit__.assert_called_once()
+
+    @patch.dict('os.environ', {'DB_PORT': '3306'})
+    @patch('data.database.ConnectionPool')
+    def test_stream_query_fetches_in_chunks(self, MockConnectionPool):
+        mock_conn = MockConnectionPool.return_value.get_connection.return_value
+        mock_cursor = mock_conn.__enter__.return_value.cursor.return_value
+        mock_cursor.fetchmany.side_effect = [[(1,), (2,)], [(3,)], []]
+
+        rows = list(database.stream_query("SELECT id FROM users", chunk_size=2))
+
+        self.assertEqual(rows, [(1,), (2,), (3,)])
+        mock_conn.__enter__.return_value.cursor.assert_called_once_with(cursor_type=database.CURSOR.READ_ONLY, prefetch_size=2)
+        mock_cursor.fetchmany.assert_called_with(2)
+        mock_cursor.close.assert_called_once()
+        mock_conn.__exit__.assert_called_once()
+
+    @patch.dict('os.environ', {'DB_PORT': '3306'})
+    @patch('data.database.ConnectionPool')
+    def test_stream_query_releases_connection_on_early_exit(self, MockConnectionPool):
+        mock_conn = MockConnectionPool.return_value.get_connection.return_value
+        mock_cursor = mock_conn.__enter__.return_value.cursor.return_value
+        mock_cursor.fetchmany.return_value = [(1,), (2,)]
+
+        rows = database.stream_query("SELECT id FROM users", chunk_size=2)
+        self.assertEqual(next(rows), (1,))
+        rows.close()
+
+        self.assertEqual(mock_cursor.fetchmany.call_count, 1)
+        mock_cursor.close.assert_called_once()
+        mock_conn.__exit__.assert_called_once()
+
+    @patch.dict('os.environ', {'DB_PORT': '3306'})
+    @patch('data.database.ConnectionPool')
+    def test_waits_for_a_free_connection(self, MockConnectionPool):
+        mock_conn = MagicMock()
+        MockConnectionPool.return_value.get_connection.side_effect = [PoolError("No connection available"), None, mock_conn]
+
+        self.assertIs(database._get_connection(), mock_conn)
+
+    @patch.dict('os.environ', {'DB_PORT': '3306', 'DB_POOL_TIMEOUT': '0'})
+    @patch('data.database.ConnectionPool')
+    def test_checkout_timeout(self, MockConnectionPool):
+        MockConnectionPool.return_value.get_connection.side_effect = PoolError("No connection available")
+
+        with self.assertRaises(Exception) as context:
+            database._get_connection()
+
+        self.assertEqual(str(context.exception), "Timed out waiting for a database connection from the pool.")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,18 +1,36 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from routers.freshdesk_api import create_freshdesk_contact, update_freshdesk_contact  
+import json
+import httpx
+from routers.freshdesk_api import create_freshdesk_contact, update_freshdesk_contact, iter_freshdesk_contacts, close_freshdesk_sessions, FreshdeskDuplicateContact, set_freshdesk_session, create_freshdesk_contact_async, update_freshdesk_contact_async
+from routers.async_client import set_async_client, close_async_client
+from routers.rate_limiter import scheduler
+from routers.concurrency import reset_freshdesk_limiters
+from data.contact_index import clear_contact_index, get_contact_id
+from services.metrics import metrics
+from benchmarks.fake_servers import FakeFreshdesk, FaultProfile
 from data.models import User
 
 class FreshdeskAPI_Should(unittest.TestCase):
+
+    def setUp(self):
+        close_freshdesk_sessions()
+        clear_contact_index()
+        scheduler.reset()
+        metrics.reset()
+
+    def tearDown(self):
+        close_freshdesk_sessions()
     
-    @patch('routers.freshdesk_api.requests.post')
+    @patch('routers.freshdesk_api.requests.Session')
     @patch('routers.freshdesk_api.os.getenv')
-    def test_missing_freshdesk_credentials(self, mock_getenv, mock_post):
+    def test_missing_freshdesk_credentials(self, mock_getenv, MockSession):
+        mock_post = MockSession.return_value.post
 
-        mock_getenv.side_effect = lambda key: {
+        mock_getenv.side_effect = lambda key, default=None: {
             'FRESHDESK_TOKEN': None,
             'FRESHDESK_PASSWORD': None
-        }[key]
+        }.get(key, default)
 
         test_user_info = User(
             id=None,  
@@ -34,14 +52,15 @@ class FreshdeskAPI_Should(unittest.TestCase):
         self.assertEqual(str(context.exception), "Freshdesk credentials are not set in the environment variables.")
         mock_post.assert_not_called()
     
-    @patch('routers.freshdesk_api.requests.post')
+    @patch('routers.freshdesk_api.requests.Session')
     @patch('routers.freshdesk_api.os.getenv')
-    def test_success_create_freshdesk_contact(self, mock_getenv, mock_post):
+    def test_success_create_freshdesk_contact(self, mock_getenv, MockSession):
+        mock_post = MockSession.return_value.post
         
-        mock_getenv.side_effect = lambda key: {
+        mock_getenv.side_effect = lambda key, default=None: {
             'FRESHDESK_TOKEN': 'test_token',
             'FRESHDESK_PASSWORD': 'test_password'
-        }[key]
+        }.get(key, default)
 
         mock_response = MagicMock()
         mock_response.status_code = 201
@@ -81,14 +100,15 @@ class FreshdeskAPI_Should(unittest.TestCase):
         
         self.assertEqual(actual_response, expected_response)
 
-    @patch('routers.freshdesk_api.requests.post')
+    @patch('routers.freshdesk_api.requests.Session')
     @patch('routers.freshdesk_api.os.getenv')
-    def test_failure_create_freshdesk_contact(self, mock_getenv, mock_post):
+    def test_failure_create_freshdesk_contact(self, mock_getenv, MockSession):
+        mock_post = MockSession.return_value.post
         
-        mock_getenv.side_effect = lambda key: {
+        mock_getenv.side_effect = lambda key, default=None: {
             'FRESHDESK_TOKEN': 'test_token',
             'FRESHDESK_PASSWORD': 'test_password'
-        }[key]
+        }.get(key, default)
         mock_response = MagicMock()
         mock_response.status_code = 400
         mock_response.text = 'Invalid request'
@@ -117,14 +137,15 @@ class FreshdeskAPI_Should(unittest.TestCase):
         
         
     
-    @patch('routers.freshdesk_api.requests.put')
+    @patch('routers.freshdesk_api.requests.Session')
     @patch('routers.freshdesk_api.os.getenv')
-    def test_missing_freshdesk_credentials_update(self, mock_getenv, mock_put):
+    def test_missing_freshdesk_credentials_update(self, mock_getenv, MockSession):
+        mock_put = MockSession.return_value.put
         
-        mock_getenv.side_effect = lambda key: {
+        mock_getenv.side_effect = lambda key, default=None: {
             'FRESHDESK_TOKEN': None,
             'FRESHDESK_PASSWORD': None
-        }[key]
+        }.get(key, default)
 
         user = {
             "name": "Test User",
@@ -141,14 +162,15 @@ class FreshdeskAPI_Should(unittest.TestCase):
         self.assertEqual(str(context.exception), "Freshdesk credentials are not set in the environment variables.")
         mock_put.assert_not_called()
         
-    @patch('routers.freshdesk_api.requests.put')
+    @patch('routers.freshdesk_api.requests.Session')
     @patch('routers.freshdesk_api.os.getenv')
-    def test_successful_contact_update(self, mock_getenv, mock_put):
+    def test_successful_contact_update(self, mock_getenv, MockSession):
+        mock_put = MockSession.return_value.put
         
-        mock_getenv.side_effect = lambda key: {
+        mock_getenv.side_effect = lambda key, default=None: {
             'FRESHDESK_TOKEN': 'test_token',
             'FRESHDESK_PASSWORD': 'test_password'
-        }[key]
+        }.get(key, default)
 
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -174,14 +196,15 @@ class FreshdeskAPI_Should(unittest.TestCase):
         
         self.assertEqual(actual_response, expected_response)
     
-    @patch('routers.freshdesk_api.requests.put')
+    @patch('routers.freshdesk_api.requests.Session')
     @patch('routers.freshdesk_api.os.getenv')
-    def test_failed_contact_update(self, mock_getenv, mock_put):
+    def test_failed_contact_update(self, mock_getenv, MockSession):
+        mock_put = MockSession.return_value.put
 
-        mock_getenv.side_effect = lambda key: {
+        mock_getenv.side_effect = lambda key, default=None: {
             'FRESHDESK_TOKEN': 'test_token',
             'FRESHDESK_PASSWORD': 'test_password'
-        }[key]
+        }.get(key, default)
 
         mock_response = MagicMock()
         mock_response.status_code = 400
@@ -207,5 +230,288 @@ class FreshdeskAPI_Should(unittest.TestCase):
         
         self.assertEqual(str(context.exception), "Failed to update the contact. Status Code: 400, Response: Bad Request")
 
+    @patch('routers.freshdesk_api.requests.Session')
+    @patch.dict('os.environ', {'FRESHDESK_TOKEN': 'test_token', 'FRESHDESK_PASSWORD': 'test_password'})
+    def test_session_is_reused_per_domain(self, MockSession):
+        mock_session = MockSession.return_value
+        mock_session.post.return_value = MagicMock(status_code=201)
+        mock_session.put.return_value = MagicMock(status_code=200)
+        test_user = User(
+            id=None,
+            github_username="test",
+            name="Test User",
+            email="test_user@example.com",
+            bio="Test bio",
+            location="Test location",
+            created_at=None,
+            is_recorded_fd=None,
+            freshdesk_contact_id=None
+        )
+
+        create_freshdesk_contact(test_user, 'example')
+        update_freshdesk_contact(test_user, 'example', 432)
+
+        MockSession.assert_called_once()
+        self.assertEqual(mock_session.auth, ('test_token', 'test_password'))
+        mock_session.post.assert_called_once_with('https://example.freshdesk.com/api/v2/contacts', data=json.dumps({
+            "name": "Test User",
+            "email": "test_user@example.com",
+            "description": "Test bio",
+            "address": "Test location"
+        }))
+        self.assertEqual(mock_session.put.call_args.args[0], 'https://example.freshdesk.com/api/v2/contacts/432')
+
+    def test_injected_session_is_used(self):
+        mock_session = MagicMock()
+        mock_session.put.return_value = MagicMock(status_code=200)
+        mock_session.put.return_value.json.return_value = {"id": 432}
+        set_freshdesk_session('example', mock_session)
+        test_user = User(
+            id=None,
+            github_username="test",
+            name="Test User",
+            email="test_user@example.com",
+            bio="Test bio",
+            location="Test location",
+            created_at=None,
+            is_recorded_fd=None,
+            freshdesk_contact_id=None
+        )
+
+        self.assertEqual(update_freshdesk_contact(test_user, 'example', 432), {"id": 432})
+        mock_session.put.assert_called_once()
+
+    def test_rate_limited_request_is_retried(self):
+        mock_session = MagicMock()
+        mock_session.post.side_effect = [
+            MagicMock(status_code=429, headers={'Retry-After': '0.01'}, text='Too Many Requests'),
+            MagicMock(status_code=201, headers={'X-RateLimit-Remaining': '99'}),
+        ]
+        mock_session.post.return_value.json.return_value = {"id": 432}
+        set_freshdesk_session('example', mock_session)
+        test_user = User(
+            id=None,
+            github_username="test",
+            name="Test User",
+            email="test_user@example.com",
+            bio="Test bio",
+            location="Test location",
+            created_at=None,
+            is_recorded_fd=None,
+            freshdesk_contact_id=None
+        )
+
+        create_freshdesk_contact(test_user, 'example')
+
+        self.assertEqual(mock_session.post.call_count, 2)
+        self.assertGreater(scheduler.waits['freshdesk:example'], 0.0)
+        summary = metrics.summary()
+        self.assertEqual(summary["http_responses"]["freshdesk:example"], {"201": 1, "429": 1})
+        self.assertEqual(summary["retries"]["freshdesk:example"], 1)
+        self.assertEqual(summary["stages"]["freshdesk_create"]["calls"], 1)
+
+    @patch('routers.freshdesk_api.RATE_LIMIT_MAX_RETRIES', 1)
+    def test_rate_limit_error_after_retries(self):
+        mock_session = MagicMock()
+        mock_session.put.return_value = MagicMock(status_code=429, headers={'Retry-After': '0.01'}, text='Too Many Requests')
+        set_freshdesk_session('example', mock_session)
+        test_user = User(
+            id=None,
+            github_username="test",
+            name="Test User",
+            email="test_user@example.com",
+            bio="Test bio",
+            location="Test location",
+            created_at=None,
+            is_recorded_fd=None,
+            freshdesk_contact_id=None
+        )
+
+        with self.assertRaises(Exception) as context:
+            update_freshdesk_contact(test_user, 'example', 432)
+
+        self.assertEqual(mock_session.put.call_count, 2)
+        self.assertEqual(str(context.exception), "Failed to update the contact. Status Code: 429, Response: Too Many Requests")
+
+    @patch('routers.freshdesk_api.RATE_LIMIT_MAX_RETRIES', 2)
+    @patch.dict('os.environ', {'FRESHDESK_TOKEN': 'test_token', 'FRESHDESK_PASSWORD': 'test_password'})
+    def test_session_leaves_rate_limits_to_the_scheduler(self):
+        server = FakeFreshdesk(FaultProfile(rate_limit_rate=1.0, retry_after=0)).start()
+        self.addCleanup(server.stop)
+        test_user = User(
+            id=None,
+            github_username="test",
+            name="Test User",
+            email="test_user@example.com",
+            bio="Test bio",
+            location="Test location",
+            created_at=None,
+            is_recorded_fd=None,
+            freshdesk_contact_id=None
+        )
+
+        with patch('routers.freshdesk_api.FRESHDESK_API_URL', server.url + "/api/v2"):
+            with self.assertRaises(Exception):
+                update_freshdesk_contact(test_user, 'example', 432)
+
+        self.assertEqual(server.requests["PUT 429"], 3)
+        summary = metrics.summary()
+        self.assertEqual(summary["http_responses"]["freshdesk:example"], {"429": 3})
+        self.assertEqual(summary["retries"]["freshdesk:example"], 2)
+
+    def test_duplicate_email_names_existing_contact(self):
+        mock_session = MagicMock()
+        mock_session.post.return_value = MagicMock(status_code=409, headers={}, text='Validation failed')
+        mock_session.post.return_value.json.return_value = {"description": "Validation failed", "errors": [
+            {"field": "email", "message": "It should be a unique value", "code": "duplicate_value", "additional_info": {"user_id": 432}}
+        ]}
+        set_freshdesk_session('example', mock_session)
+        test_user = User(id=None, github_username="test", name="Test User", email="test_user@example.com", bio=None, location=None, created_at=None, is_recorded_fd=None, freshdesk_contact_id=None)
+
+        with self.assertRaises(FreshdeskDuplicateContact) as context:
+            create_freshdesk_contact(test_user, 'example')
+
+        self.assertEqual(context.exception.contact_id, 432)
+        self.assertEqual(get_contact_id('example', 'test_user@example.com'), 432)
+
+    def test_writes_update_the_contact_index(self):
+        mock_session = MagicMock()
+        mock_session.post.return_value = MagicMock(status_code=201, headers={})
+        mock_session.post.return_value.json.return_value = {"id": 432}
+        mock_session.put.return_value = MagicMock(status_code=200, headers={})
+        mock_session.put.return_value.json.return_value = {"id": 432}
+        set_freshdesk_session('example', mock_session)
+        test_user = User(id=None, github_username="test", name="Test User", email="test_user@example.com", bio=None, location=None, created_at=None, is_recorded_fd=None, freshdesk_contact_id=None)
+
+        create_freshdesk_contact(test_user, 'example')
+        self.assertEqual(get_contact_id('example', 'Test_User@example.com'), 432)
+
+        test_user.email = "new_email@example.com"
+        update_freshdesk_contact(test_user, 'example', 432)
+
+        self.assertEqual(get_contact_id('example', 'new_email@example.com'), 432)
+        self.assertIsNone(get_contact_id('example', 'test_user@example.com'))
+
+    def test_iter_contacts_pages_until_a_short_page(self):
+        pages = {1: [{"id": 1}, {"id": 2}], 2: [{"id": 3}, {"id": 4}], 3: [{"id": 5}]}
+        mock_session = MagicMock()
+
+        def get(url, params):
+            response = MagicMock(status_code=200, headers={})
+            response.json.return_value = pages.get(params["page"], [])
+            return response
+
+        mock_session.get.side_effect = get
+        set_freshdesk_session('example', mock_session)
+
+        contacts = list(iter_freshdesk_contacts('example', per_page=2, pages_in_flight=2))
+
+        self.assertEqual([contact["id"] for contact in contacts], [1, 2, 3, 4, 5])
+        self.assertEqual(mock_session.get.call_args.args[0], 'https://example.freshdesk.com/api/v2/contacts')
+        self.assertLessEqual(mock_session.get.call_count, 5)
+
+    def test_iter_contacts_failure(self):
+        mock_session = MagicMock()
+        mock_session.get.return_value = MagicMock(status_code=403, headers={}, text='Forbidden')
+        set_freshdesk_session('example', mock_session)
+
+        with self.assertRaises(Exception) as context:
+            list(iter_freshdesk_contacts('example', per_page=2, pages_in_flight=1))
+
+        self.assertEqual(str(context.exception), "Failed to list contacts. Status Code: 403, Response: Forbidden")
+
+
+class FreshdeskAPIAsync_Should(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        scheduler.reset()
+        reset_freshdesk_limiters()
+        metrics.reset()
+
+    async def asyncTearDown(self):
+        await close_async_client()
+
+    def _test_user(self):
+        return User(
+            id=None,
+            github_username="test",
+            name="Test User",
+            email="test_user@example.com",
+            bio="Test bio",
+            location="Test location",
+            created_at=None,
+            is_recorded_fd=None,
+            freshdesk_contact_id=None
+        )
+
+    @patch.dict('os.environ', {'FRESHDESK_TOKEN': 'test_token', 'FRESHDESK_PASSWORD': 'test_password'})
+    async def test_success_create_freshdesk_contact_async(self):
+        def handler(request):
+            self.assertEqual(request.method, 'POST')
+            self.assertEqual(str(request.url), 'https://yourdomain.freshdesk.com/api/v2/contacts')
+            self.assertEqual(json.loads(request.content)['description'], 'Test bio')
+            return httpx.Response(201, json={"id": 432})
+        set_async_client(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+        actual_response = await create_freshdesk_contact_async(self._test_user(), "yourdomain")
+
+        self.assertEqual(actual_response, {"id": 432})
+
+    @patch.dict('os.environ', {'FRESHDESK_TOKEN': 'test_token', 'FRESHDESK_PASSWORD': 'test_password'})
+    async def test_failed_contact_update_async(self):
+        def handler(request):
+            self.assertEqual(request.method, 'PUT')
+            self.assertEqual(request.url.path, '/api/v2/contacts/432')
+            return httpx.Response(400, text='Bad Request')
+        set_async_client(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+        with self.assertRaises(Exception) as context:
+            await update_freshdesk_contact_async(self._test_user(), 'example', 432)
+
+        self.assertEqual(str(context.exception), "Failed to update the contact. Status Code: 400, Response: Bad Request")
+
+    @patch.dict('os.environ', {'FRESHDESK_TOKEN': 'test_token', 'FRESHDESK_PASSWORD': 'test_password'})
+    async def test_rate_limited_request_is_retried_async(self):
+        statuses = [429, 201]
+
+        def handler(request):
+            status = statuses.pop(0)
+            return httpx.Response(status, json={"id": 432}, headers={'Retry-After': '0.01'} if status == 429 else {})
+        set_async_client(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+        await create_freshdesk_contact_async(self._test_user(), 'example')
+
+        summary = metrics.summary()
+        self.assertEqual(summary["http_responses"]["freshdesk:example"], {"201": 1, "429": 1})
+        self.assertEqual(summary["retries"]["freshdesk:example"], 1)
+        self.assertGreater(scheduler.waits['freshdesk:example'], 0.0)
+
+    @patch.dict('os.environ', {'FRESHDESK_TOKEN': 'test_token', 'FRESHDESK_PASSWORD': 'test_password', 'FRESHDESK_RETRY_BACKOFF': '0'})
+    async def test_only_updates_are_retried_on_server_errors_async(self):
+        requests_seen = []
+
+        def handler(request):
+            requests_seen.append(request.method)
+            if request.method == 'PUT' and requests_seen.count('PUT') == 1:
+                return httpx.Response(503, text='Service Unavailable')
+            if request.method == 'POST':
+                return httpx.Response(503, text='Service Unavailable')
+            return httpx.Response(200, json={"id": 432})
+        set_async_client(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+        self.assertEqual(await update_freshdesk_contact_async(self._test_user(), 'example', 432), {"id": 432})
+        with self.assertRaises(Exception):
+            await create_freshdesk_contact_async(self._test_user(), 'example')
+
+        self.assertEqual(requests_seen, ['PUT', 'PUT', 'POST'])
+
+    @patch.dict('os.environ', {'FRESHDESK_TOKEN': '', 'FRESHDESK_PASSWORD': ''})
+    async def test_missing_freshdesk_credentials_async(self):
+        with self.assertRaises(Exception) as context:
+            await create_freshdesk_contact_async(self._test_user(), 'example')
+
+        self.assertEqual(str(context.exception), "Freshdesk credentials are not set in the environment variables.")
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,10 +1,26 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
-from routers.github_api import get_user_info_from_github
+import httpx
+from routers.github_api import get_user_info_from_github, get_users_info_from_github, get_github_client, close_github_client, get_user_info_from_github_async, GithubUserNotFound, iter_org_members
+from routers.async_client import set_async_client, close_async_client
+from routers.rate_limiter import scheduler
+from services.metrics import metrics
+from github import RateLimitExceededException, UnknownObjectException
+from benchmarks.fake_servers import FakeGitHub, FaultProfile
 from data.models import User
 from datetime import datetime
 
 class GitHubAPI_Should(unittest.TestCase):
+
+    def setUp(self):
+        close_github_client()
+        scheduler.reset()
+        metrics.reset()
+
+    def tearDown(self):
+        close_github_client()
     
     @patch('os.getenv')
     def test_github_token_not_set(self, mock_getenv):
@@ -63,6 +79,325 @@ class GitHubAPI_Should(unittest.TestCase):
         self.assertEqual(str(context.exception), "Error fetching user info from GitHub: Error fetching user info")
         mock_github_instance.get_user.assert_called_once_with(test_github_username)
 
-    
+    @patch('routers.github_api.Github')
+    def test_lookup_is_timed(self, MockGithub):
+        MockGithub.return_value.get_user.side_effect = Exception("Server Error")
+
+        with self.assertRaises(Exception):
+            get_user_info_from_github("Test")
+
+        stage = metrics.summary()["stages"]["github_fetch"]
+        self.assertEqual(stage["calls"], 1)
+        self.assertEqual(stage["errors"], 1)
+
+    @patch('routers.github_api.Github')
+    def test_client_is_shared_between_lookups(self, MockGithub):
+        mock_user = MagicMock()
+        mock_user.login = "Test"
+        mock_user.name = None
+        mock_user.email = None
+        mock_user.bio = None
+        mock_user.location = None
+        mock_user.created_at = None
+        MockGithub.return_value.get_user.return_value = mock_user
+
+        get_user_info_from_github("Test")
+        get_user_info_from_github("Test")
+
+        MockGithub.assert_called_once()
+        self.assertEqual(MockGithub.return_value.get_user.call_count, 2)
+
+    @patch('routers.github_api.Github')
+    def test_close_github_client(self, MockGithub):
+        get_github_client()
+        close_github_client()
+        get_github_client()
+
+        MockGithub.return_value.close.assert_called_once()
+        self.assertEqual(MockGithub.call_count, 2)
+
+    @patch('routers.github_api.Github')
+    def test_get_users_info_from_github_batches_logins(self, MockGithub):
+        mock_requester = MockGithub.return_value.requester
+        mock_requester.requestJsonAndCheck.return_value = ({}, {
+            "data": {
+                "u0": {"login": "Test", "name": "Test User", "email": "", "bio": "Test bio", "location": "Test location", "createdAt": "2021-01-01T00:00:00Z"},
+                "u1": None,
+            },
+            "errors": [{"type": "NOT_FOUND", "path": ["u1"], "message": "Could not resolve to a User with the login of 'missing'."}],
+        })
+
+        users, missing = get_users_info_from_github(["Test", "missing", "Test"])
+
+        mock_requester.requestJsonAndCheck.assert_called_once()
+        variables = mock_requester.requestJsonAndCheck.call_args.kwargs['input']['variables']
+        self.assertEqual(variables, {"u0": "Test", "u1": "missing"})
+        self.assertEqual(list(users), ["Test"])
+        self.assertEqual(users["Test"].name, "Test User")
+        self.assertIsNone(users["Test"].email)
+        self.assertEqual(missing, ["missing"])
+
+    @patch('routers.github_api.GRAPHQL_BATCH_SIZE', 2)
+    @patch('routers.github_api.Github')
+    def test_get_users_info_from_github_splits_large_batches(self, MockGithub):
+        mock_requester = MockGithub.return_value.requester
+        mock_requester.requestJsonAndCheck.return_value = ({}, {"data": {}})
+
+        users, missing = get_users_info_from_github(["a", "b", "c"])
+
+        self.assertEqual(mock_requester.requestJsonAndCheck.call_count, 2)
+        self.assertEqual(users, {})
+        self.assertEqual(missing, [])
+
+    @patch('routers.github_api.Github')
+    def test_get_users_info_from_github_leaves_out_failed_aliases(self, MockGithub):
+        MockGithub.return_value.requester.requestJsonAndCheck.return_value = ({}, {
+            "data": {
+                "u0": None,
+                "u1": {"login": "b", "name": None, "email": None, "bio": None, "location": None, "createdAt": None},
+                "u2": None,
+            },
+            "errors": [
+                {"type": "FORBIDDEN", "path": ["u0"], "message": "Resource not accessible by integration"},
+                {"type": "NOT_FOUND", "path": ["u2"], "message": "Could not resolve to a User with the login of 'c'."},
+            ],
+        })
+
+        users, missing = get_users_info_from_github(["a", "b", "c"])
+
+        self.assertEqual(list(users), ["b"])
+        self.assertEqual(missing, ["c"])
+
+    @patch('routers.github_api.Github')
+    def test_get_users_info_from_github_failure(self, MockGithub):
+        MockGithub.return_value.requester.requestJsonAndCheck.return_value = ({}, {"errors": [{"type": "RATE_LIMITED", "message": "API rate limit exceeded"}]})
+
+        with self.assertRaises(Exception) as context:
+            get_users_info_from_github(["Test"])
+
+        self.assertEqual(str(context.exception), "Error fetching users info from GitHub: API rate limit exceeded")
+
+    @patch.dict('os.environ', {'GITHUB_CACHE_PATH': '/tmp/github_cache.sqlite3'})
+    @patch('routers.github_api.set_cached_user')
+    @patch('routers.github_api.get_cached_user')
+    @patch('routers.github_api.Github')
+    def test_cached_user_is_revalidated_with_etag(self, MockGithub, mock_get_cached_user, mock_set_cached_user):
+        mock_get_cached_user.return_value = ('"abc"', {"login": "Test"})
+        mock_user = MockGithub.return_value.create_from_raw_data.return_value
+        mock_user.login = "Test"
+        mock_user.name = "Test User"
+        mock_user.email = None
+        mock_user.bio = None
+        mock_user.location = None
+        mock_user.created_at = None
+        mock_user.update.return_value = False
+
+        actual_user_info = get_user_info_from_github("Test")
+
+        self.assertEqual(actual_user_info.name, "Test User")
+        self.assertEqual(MockGithub.return_value.create_from_raw_data.call_args.kwargs['headers'], {"etag": '"abc"'})
+        MockGithub.return_value.get_user.assert_not_called()
+        mock_set_cached_user.assert_not_called()
+
+    @patch.dict('os.environ', {'GITHUB_CACHE_PATH': '/tmp/github_cache.sqlite3'})
+    @patch('routers.github_api.set_cached_user')
+    @patch('routers.github_api.get_cached_user')
+    @patch('routers.github_api.Github')
+    def test_uncached_user_is_stored(self, MockGithub, mock_get_cached_user, mock_set_cached_user):
+        mock_get_cached_user.return_value = None
+        mock_user = MockGithub.return_value.get_user.return_value
+        mock_user.login = "Test"
+        mock_user.name = "Test User"
+        mock_user.email = None
+        mock_user.bio = None
+        mock_user.location = None
+        mock_user.created_at = None
+        mock_user.etag = '"abc"'
+        mock_user.raw_data = {"login": "Test"}
+
+        get_user_info_from_github("Test")
+
+        mock_set_cached_user.assert_called_once_with("Test", '"abc"', {"login": "Test"})
+
+    @patch.dict('os.environ', {'GITHUB_CACHE_PATH': '/tmp/github_cache.sqlite3'})
+    @patch('routers.github_api.set_missing_user')
+    @patch('routers.github_api.is_known_missing')
+    @patch('routers.github_api.get_cached_user')
+    @patch('routers.github_api.Github')
+    def test_missing_user_is_remembered(self, MockGithub, mock_get_cached_user, mock_is_known_missing, mock_set_missing_user):
+        mock_get_cached_user.return_value = None
+        mock_is_known_missing.return_value = False
+        MockGithub.return_value.get_user.side_effect = UnknownObjectException(404, {"message": "Not Found"}, {})
+
+        with self.assertRaises(GithubUserNotFound):
+            get_user_info_from_github("ghost")
+
+        mock_set_missing_user.assert_called_once_with("ghost")
+
+    @patch.dict('os.environ', {'GITHUB_CACHE_PATH': '/tmp/github_cache.sqlite3'})
+    @patch('routers.github_api.set_missing_user')
+    @patch('routers.github_api.is_known_missing')
+    @patch('routers.github_api.Github')
+    def test_only_not_found_batch_logins_are_remembered(self, MockGithub, mock_is_known_missing, mock_set_missing_user):
+        mock_is_known_missing.return_value = False
+        MockGithub.return_value.requester.requestJsonAndCheck.return_value = ({}, {
+            "data": {"u0": None, "u1": {"login": "b", "name": None, "email": None, "bio": None, "location": None, "createdAt": None}, "u2": None},
+            "errors": [
+                {"type": "FORBIDDEN", "path": ["u0"], "message": "Resource not accessible by integration"},
+                {"type": "NOT_FOUND", "path": ["u2"], "message": "Could not resolve to a User with the login of 'c'."},
+            ],
+        })
+
+        users, missing = get_users_info_from_github(["a", "b", "c"])
+
+        self.assertEqual(missing, ["c"])
+        mock_set_missing_user.assert_called_once_with("c")
+
+    @patch.dict('os.environ', {'GITHUB_CACHE_PATH': '/tmp/github_cache.sqlite3'})
+    @patch('routers.github_api.is_known_missing')
+    @patch('routers.github_api.Github')
+    def test_known_missing_user_is_skipped_without_a_request(self, MockGithub, mock_is_known_missing):
+        mock_is_known_missing.return_value = True
+
+        with self.assertRaises(GithubUserNotFound) as context:
+            get_user_info_from_github("ghost")
+
+        self.assertEqual(str(context.exception), "Error fetching user info from GitHub: user ghost not found (cached)")
+        MockGithub.return_value.get_user.assert_not_called()
+
+    @patch('routers.github_api.Github')
+    def test_org_members_are_listed_page_by_page(self, MockGithub):
+        MockGithub.return_value.per_page = 2
+        pages = [[MagicMock(login='octocat'), MagicMock(login='hubot')], [MagicMock(login='monalisa')]]
+        members = MockGithub.return_value.get_organization.return_value.get_members.return_value
+        members.get_page.side_effect = lambda page: pages[page]
+
+        logins = iter_org_members('acme')
+
+        self.assertEqual(next(logins), 'octocat')
+        members.get_page.assert_called_once_with(0)
+        self.assertEqual(list(logins), ['hubot', 'monalisa'])
+        self.assertEqual(members.get_page.call_count, 2)
+        MockGithub.return_value.get_organization.assert_called_once_with('acme')
+
+    @patch('routers.github_api.Github')
+    def test_team_members_are_listed(self, MockGithub):
+        MockGithub.return_value.per_page = 100
+        organization = MockGithub.return_value.get_organization.return_value
+        organization.get_team_by_slug.return_value.get_members.return_value.get_page.return_value = [MagicMock(login='octocat')]
+
+        self.assertEqual(list(iter_org_members('acme', 'core')), ['octocat'])
+        organization.get_team_by_slug.assert_called_once_with('core')
+        organization.get_members.assert_not_called()
+
+    @patch('routers.github_api.Github')
+    def test_org_listing_error(self, MockGithub):
+        MockGithub.return_value.get_organization.side_effect = Exception("Not Found")
+
+        with self.assertRaises(Exception) as context:
+            list(iter_org_members('acme'))
+
+        self.assertEqual(str(context.exception), "Error listing members of organization acme: Not Found")
+
+    @patch('routers.github_api.Github')
+    def test_rate_limited_lookup_is_retried(self, MockGithub):
+        mock_user = MagicMock()
+        mock_user.login = "Test"
+        mock_user.name = None
+        mock_user.email = None
+        mock_user.bio = None
+        mock_user.location = None
+        mock_user.created_at = None
+        mock_github_instance = MockGithub.return_value
+        mock_github_instance.requester.rate_limiting = (4999, 5000)
+        mock_github_instance.get_user.side_effect = [
+            RateLimitExceededException(403, {"message": "API rate limit exceeded"}, {"retry-after": "0.01", "x-ratelimit-remaining": "0"}),
+            mock_user,
+        ]
+
+        actual_user_info = get_user_info_from_github("Test")
+
+        self.assertEqual(actual_user_info.github_username, "Test")
+        self.assertEqual(mock_github_instance.get_user.call_count, 2)
+        self.assertGreater(scheduler.waits['github'], 0.0)
+
+    @patch('routers.github_api.RATE_LIMIT_MAX_RETRIES', 2)
+    @patch.dict('os.environ', {'GITHUB_TOKEN': 'test_token'})
+    def test_too_many_requests_are_parked_by_the_scheduler(self):
+        server = FakeGitHub(FaultProfile(rate_limit_rate=1.0, retry_after=0)).start()
+        self.addCleanup(server.stop)
+
+        with patch('routers.github_api.GITHUB_API_URL', server.url):
+            with self.assertRaises(Exception):
+                get_user_info_from_github("Test")
+
+        self.assertEqual(server.requests["GET 429"], 3)
+        summary = metrics.summary()
+        self.assertEqual(summary["http_responses"]["github"], {"429": 3})
+        self.assertEqual(summary["retries"]["github"], 2)
+
+
+class GitHubAPIAsync_Should(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncTearDown(self):
+        await close_async_client()
+
+    @patch.dict('os.environ', {'GITHUB_TOKEN': 'test_token'})
+    async def test_success_get_user_info_from_github_async(self):
+        def handler(request):
+            self.assertEqual(request.url.path, '/users/Test')
+            self.assertEqual(request.headers['Authorization'], 'Bearer test_token')
+            return httpx.Response(200, json={
+                "login": "Test",
+                "name": "Test User",
+                "email": "test_email@example.com",
+                "bio": "Test bio",
+                "location": "Test location",
+                "created_at": "2021-01-01T00:00:00Z",
+            })
+        set_async_client(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+        actual_user_info = await get_user_info_from_github_async("Test")
+
+        self.assertEqual(actual_user_info.github_username, "Test")
+        self.assertEqual(actual_user_info.name, "Test User")
+        self.assertEqual(actual_user_info.created_at.year, 2021)
+        self.assertFalse(actual_user_info.is_recorded_fd)
+
+    @patch.dict('os.environ', {'GITHUB_TOKEN': 'test_token'})
+    async def test_failure_get_user_info_from_github_async(self):
+        set_async_client(httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(404, text="Not Found"))))
+
+        with self.assertRaises(Exception) as context:
+            await get_user_info_from_github_async("missing")
+
+        self.assertEqual(str(context.exception), "Error fetching user info from GitHub: Status Code: 404, Response: Not Found")
+
+    async def test_async_lookup_revalidates_cached_profiles(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request.headers.get('If-None-Match'))
+            if request.headers.get('If-None-Match') == '"abc"':
+                return httpx.Response(304)
+            return httpx.Response(200, headers={'ETag': '"abc"'}, json={
+                "login": "Test",
+                "name": "Test User",
+                "email": None,
+                "bio": None,
+                "location": None,
+                "created_at": "2021-01-01T00:00:00Z",
+            })
+        set_async_client(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with patch.dict('os.environ', {'GITHUB_TOKEN': 'test_token', 'GITHUB_CACHE_PATH': os.path.join(tmp_dir, 'cache.sqlite3')}):
+                await get_user_info_from_github_async("Test")
+                actual_user_info = await get_user_info_from_github_async("Test")
+
+        self.assertEqual(requests, [None, '"abc"'])
+        self.assertEqual(actual_user_info.name, "Test User")
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,58 @@
+import os
+import unittest
+import tempfile
+from unittest.mock import patch
+from data.github_cache import get_cached_user, set_cached_user, is_cache_enabled, is_known_missing, set_missing_user
+
+
+class GithubCache_Should(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.env = patch.dict('os.environ', {'GITHUB_CACHE_PATH': os.path.join(self.tmp_dir.name, 'cache.sqlite3')})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp_dir.cleanup()
+
+    def test_is_enabled_when_path_is_set(self):
+        self.assertTrue(is_cache_enabled())
+
+        with patch.dict('os.environ', {'GITHUB_CACHE_PATH': ''}):
+            self.assertFalse(is_cache_enabled())
+
+    def test_returns_none_for_unknown_user(self):
+        self.assertIsNone(get_cached_user('octocat'))
+
+    def test_stores_etag_and_payload(self):
+        set_cached_user('Octocat', '"abc"', {"login": "Octocat", "name": "Test User"})
+
+        self.assertEqual(get_cached_user('octocat'), ('"abc"', {"login": "Octocat", "name": "Test User"}))
+
+    def test_replaces_previous_entry(self):
+        set_cached_user('octocat', '"abc"', {"name": "Old"})
+        set_cached_user('octocat', '"def"', {"name": "New"})
+
+        self.assertEqual(get_cached_user('octocat'), ('"def"', {"name": "New"}))
+
+    def test_skips_responses_without_etag(self):
+        set_cached_user('octocat', None, {"name": "Test User"})
+
+        self.assertIsNone(get_cached_user('octocat'))
+
+    def test_remembers_missing_users(self):
+        set_missing_user('Ghost')
+
+        self.assertTrue(is_known_missing('ghost'))
+        self.assertFalse(is_known_missing('octocat'))
+
+    def test_missing_users_expire(self):
+        set_missing_user('ghost')
+
+        with patch.dict('os.environ', {'GITHUB_MISSING_TTL': '0'}):
+            self.assertFalse(is_known_missing('ghost'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import json
+import tempfile
+import unittest
+from data.journal import Journal
+
+
+class Journal_Should(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'batch.journal')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _records(self):
+        with open(self.path, encoding='utf-8') as journal_file:
+            return [json.loads(line) for line in journal_file]
+
+    def test_reloads_completed_users(self):
+        journal = Journal(self.path)
+        journal.record_done('Octocat', 'created')
+        journal.close()
+
+        reopened = Journal(self.path)
+
+        self.assertTrue(reopened.is_completed('octocat'))
+        self.assertFalse(reopened.is_completed('hubot'))
+        reopened.close()
+
+    def test_batches_done_records(self):
+        journal = Journal(self.path, fsync_every=3, fsync_interval=60)
+        journal.record_done('octocat', 'created')
+        journal.record_done('hubot', 'updated')
+
+        self.assertEqual(self._records(), [])
+
+        journal.record_done('monalisa', 'unchanged')
+
+        self.assertEqual([record['user'] for record in self._records()], ['octocat', 'hubot', 'monalisa'])
+        journal.close()
+
+    def test_writes_contact_records_immediately(self):
+        journal = Journal(self.path, fsync_every=100, fsync_interval=60)
+        journal.record_contact('octocat', 432)
+
+        self.assertEqual(self._records(), [{'user': 'octocat', 'event': 'contact', 'contact_id': 432}])
+        journal.close()
+
+    def test_keeps_contacts_of_unfinished_users(self):
+        journal = Journal(self.path)
+        journal.record_contact('octocat', 432)
+        journal.record_contact('hubot', 433)
+        journal.record_done('hubot', 'created')
+        journal.close()
+
+        reopened = Journal(self.path)
+
+        self.assertEqual(reopened.contact_id('octocat'), 432)
+        self.assertIsNone(reopened.contact_id('hubot'))
+        reopened.close()
+
+    def test_ignores_a_torn_last_line(self):
+        with open(self.path, 'w', encoding='utf-8') as journal_file:
+            journal_file.write('{"user": "octocat", "event": "done", "outcome": "created"}\n{"user": "hub')
+
+        journal = Journal(self.path)
+
+        self.assertTrue(journal.is_completed('octocat'))
+        self.assertFalse(journal.is_completed('hubot'))
+        journal.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,21 +2,63 @@ import unittest
 from unittest.mock import patch, MagicMock
 import sys
 import io
-from main import main
-from services.get_user import get_user_info_from_db
-from services.record_user import  persist_user_info
-from services.update_user import update_user_recorded_status
+import os
+import json
+import tempfile
+from main import main, read_usernames, run_batch, sync_user, drain_outbox, sync_flights, refresh_round, _budgeted, reconcile_contacts
+from services.metrics import metrics
+from data.journal import Journal
+from data.contact_index import clear_contact_index, set_contact_id, get_contact_id
+from routers.freshdesk_api import FreshdeskDuplicateContact
+from routers.github_api import GithubUserNotFound
 from data.models import User
 from datetime import datetime
-from routers.github_api import get_user_info_from_github
-from routers.freshdesk_api import create_freshdesk_contact, update_freshdesk_contact
 
 class Main_Should(unittest.TestCase):
+
+    def setUp(self):
+        clear_contact_index()
+        self.test_user_info = User(
+            id=None,
+            github_username="test_github_user",
+            name="Test User",
+            email="test_user@example.com",
+            bio="Test bio",
+            location="Test location",
+            created_at=None,
+            is_recorded_fd=False,
+            freshdesk_contact_id=None
+        )
     
     def test_main_invalid_args(self):
         with self.assertRaises(SystemExit):
             main()
     
+    @patch('main.create_freshdesk_contact')
+    @patch('main.update_freshdesk_contact')
+    @patch('main.update_user_recorded_status')
+    def test_sync_user_links_indexed_contact(self, mock_update_user_recorded_status, mock_update_freshdesk_contact, mock_create_freshdesk_contact):
+        set_contact_id('freshdesk_subdomain', 'Test_User@example.com', 432)
+
+        outcome = sync_user('test_github_user', 'freshdesk_subdomain', user_info=self.test_user_info, db_state=(1, False, None, None, False))
+
+        self.assertEqual(outcome, 'recorded')
+        mock_create_freshdesk_contact.assert_not_called()
+        mock_update_freshdesk_contact.assert_called_once_with(user=self.test_user_info, domain='freshdesk_subdomain', contact_id=432)
+        mock_update_user_recorded_status.assert_called_once_with(1, 432, self.test_user_info.fingerprint())
+
+    @patch('main.create_freshdesk_contact')
+    @patch('main.update_freshdesk_contact')
+    @patch('main.update_user_recorded_status')
+    def test_sync_user_links_duplicate_contact(self, mock_update_user_recorded_status, mock_update_freshdesk_contact, mock_create_freshdesk_contact):
+        mock_create_freshdesk_contact.side_effect = FreshdeskDuplicateContact("Failed to create contact. Status Code: 409", 432)
+
+        outcome = sync_user('test_github_user', 'freshdesk_subdomain', user_info=self.test_user_info, db_state=(1, False, None, None, True))
+
+        self.assertEqual(outcome, 'created')
+        mock_update_freshdesk_contact.assert_called_once_with(user=self.test_user_info, domain='freshdesk_subdomain', contact_id=432)
+        mock_update_user_recorded_status.assert_called_once_with(1, 432, self.test_user_info.fingerprint())
+
     @patch('main.get_user_info_from_github')
     @patch('sys.argv', ['main.py', 'test_github_user', 'test_subdomain'])
     def test_main_github_failure(self, mock_get_user_info_from_github):
@@ -28,126 +70,262 @@ class Main_Should(unittest.TestCase):
             printed_output = mock_stdout.getvalue()
             self.assertIn("Error: GitHub API Error", printed_output)
 
-    @patch('main.get_user_info_from_github')
-    @patch('main.get_user_info_from_db')
     @patch('sys.argv', ['main.py', 'test_github_user', 'test_subdomain'])
-    def test_main_db_failure(self, mock_get_user_info_from_github, mock_get_user_info_from_db):
-        
-        test_user_info = User(
-            id=None,
-            github_username="new_github_user",
-            name="Test User",
-            email="test_user@example.com",
-            bio="Test bio",
-            location="Test location",
-            created_at=None,
-            is_recorded_fd=False,
-            freshdesk_contact_id=None
-        )
-        
-        mock_get_user_info_from_github.return_value = test_user_info
-        
-        mock_get_user_info_from_db.side_effect = Exception("Database Error")
+    @patch('main.get_user_info_from_github')
+    @patch('main.upsert_user_info')
+    @patch('main.create_freshdesk_contact')
+    def test_main_db_failure(self, mock_create_freshdesk_contact, mock_upsert_user_info, mock_get_user_info_from_github):
+        mock_get_user_info_from_github.return_value = self.test_user_info
+        mock_upsert_user_info.side_effect = Exception("Database Error")
 
         with patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
-            with self.assertRaises(SystemExit):
+            with self.assertRaises(SystemExit) as cm:
                 main()
             printed_output = mock_stdout.getvalue()
             self.assertIn("Error: Database Error", printed_output)
+
+        self.assertEqual(cm.exception.code, 1)
+        mock_upsert_user_info.assert_called_once_with(self.test_user_info)
+        mock_create_freshdesk_contact.assert_not_called()
            
-    @patch('sys.argv', ['main.py', 'new_github_user', 'freshdesk_subdomain'])
+    @patch('sys.argv', ['main.py', 'test_github_user', 'freshdesk_subdomain'])
     @patch('main.get_user_info_from_github')
-    @patch('main.get_user_info_from_db')
+    @patch('main.upsert_user_info')
     @patch('main.create_freshdesk_contact')
     @patch('main.update_user_recorded_status')
-    @patch('main.persist_user_info')
-    def test_main_user_creation(self, mock_persist_user_info, mock_update_user_recorded_status, mock_create_freshdesk_contact, mock_get_user_info_from_db, mock_get_user_info_from_github):
-        
-        test_user_info = User(
-            id=None,
-            github_username="new_github_user",
-            name="Test User",
-            email="test_user@example.com",
-            bio="Test bio",
-            location="Test location",
-            created_at=None,
-            is_recorded_fd=False,
-            freshdesk_contact_id=None
-        )
-
-        mock_get_user_info_from_github.return_value = test_user_info
-        mock_get_user_info_from_db.return_value = None
-        mock_persist_user_info.return_value = 1  
+    def test_main_user_creation(self, mock_update_user_recorded_status, mock_create_freshdesk_contact, mock_upsert_user_info, mock_get_user_info_from_github):
+        mock_get_user_info_from_github.return_value = self.test_user_info
+        mock_upsert_user_info.return_value = (1, False, None, None, True)
         mock_create_freshdesk_contact.return_value = {'id': 432}
         
-        
         with patch('builtins.print') as mock_print:
             main()
 
-
-        mock_get_user_info_from_github.assert_called_once_with('new_github_user')
-        mock_get_user_info_from_db.assert_called_once_with('new_github_user')
-        mock_persist_user_info.assert_called_once_with(test_user_info)
+        mock_get_user_info_from_github.assert_called_once_with('test_github_user')
+        mock_upsert_user_info.assert_called_once_with(self.test_user_info)
         mock_create_freshdesk_contact.assert_called_once_with(
-            new_user=test_user_info,
+            new_user=self.test_user_info,
             domain='freshdesk_subdomain'
         )
-        mock_update_user_recorded_status.assert_called_once_with(1, 432)
+        mock_update_user_recorded_status.assert_called_once_with(1, 432, self.test_user_info.fingerprint())
         mock_print.assert_any_call('New db user created successfully.')
         mock_print.assert_any_call('New freshdesk contact created successfully.')
 
-    @patch('sys.argv', ['main.py', 'new_github_user', 'freshdesk_subdomain'])
+    @patch('sys.argv', ['main.py', 'test_github_user', 'freshdesk_subdomain'])
     @patch('main.get_user_info_from_github')
-    @patch('main.get_user_info_from_db')
+    @patch('main.upsert_user_info')
     @patch('main.create_freshdesk_contact')
     @patch('main.update_user_recorded_status')
-    @patch('main.persist_user_info')
-    def test_main_user_creation_db_error(self, mock_persist_user_info, mock_update_user_recorded_status, mock_create_freshdesk_contact, mock_get_user_info_from_db, mock_get_user_info_from_github):
- 
-        test_user_info = User(
-            id=None,
-            github_username="new_github_user",
-            name="Test User",
-            email="test_user@example.com",
-            bio="Test bio",
-            location="Test location",
-            created_at=None,
-            is_recorded_fd=False,
-            freshdesk_contact_id=None
-        )
-        
-        mock_get_user_info_from_github.return_value = test_user_info
-        mock_get_user_info_from_db.return_value = None
-        mock_persist_user_info.side_effect = Exception("Database error")
+    def test_main_user_creation_create_freshdesk_contact_error(self, mock_update_user_recorded_status, mock_create_freshdesk_contact, mock_upsert_user_info, mock_get_user_info_from_github):
+        mock_get_user_info_from_github.return_value = self.test_user_info
+        mock_upsert_user_info.return_value = (1, False, None, None, True)
+        mock_create_freshdesk_contact.side_effect = Exception("Freshdesk API error")
+
+        with patch('builtins.print') as mock_print:
+            with self.assertRaises(SystemExit) as cm:
+                main()
+            
+        self.assertEqual(cm.exception.code, 1)
+        mock_create_freshdesk_contact.assert_called_once_with(
+                new_user=self.test_user_info,
+                domain='freshdesk_subdomain'
+            )
+        mock_update_user_recorded_status.assert_not_called()
+        mock_print.assert_any_call('Error: Freshdesk API error')
+    
+    @patch('sys.argv', ['main.py', 'test_github_user', 'freshdesk_subdomain'])
+    @patch('main.get_user_info_from_github')
+    @patch('main.upsert_user_info')
+    @patch('main.create_freshdesk_contact')
+    @patch('main.update_user_recorded_status')
+    def test_main_user_creation_update_status_error(self, mock_update_user_recorded_status, mock_create_freshdesk_contact, mock_upsert_user_info, mock_get_user_info_from_github):
+        mock_get_user_info_from_github.return_value = self.test_user_info
+        mock_upsert_user_info.return_value = (1, False, None, None, True)
+        mock_create_freshdesk_contact.return_value = {'id': 432}
+        mock_update_user_recorded_status.side_effect = Exception("Database update error")
         
+        with patch('builtins.print') as mock_print:
+            with self.assertRaises(SystemExit) as cm:
+                main()
+            
+        self.assertEqual(cm.exception.code, 1)
+        mock_update_user_recorded_status.assert_called_once_with(1, 432, self.test_user_info.fingerprint())
+        mock_print.assert_any_call('Error: Database update error')
+    
+    @patch('sys.argv', ['main.py', 'test_github_user', 'freshdesk_subdomain'])
+    @patch('main.get_user_info_from_github')
+    @patch('main.upsert_user_info')
+    @patch('main.update_freshdesk_contact')
+    @patch('main.update_user_recorded_status')
+    def test_main_existing_user_updated(self, mock_update_user_recorded_status, mock_update_freshdesk_contact, mock_upsert_user_info, mock_get_user_info_from_github):
+        mock_get_user_info_from_github.return_value = self.test_user_info
+        mock_upsert_user_info.return_value = (1, True, 432, None, False)
+
+        with patch('builtins.print') as mock_print:
+            main()
+
+        mock_update_freshdesk_contact.assert_called_once_with(
+                user=self.test_user_info,
+                domain='freshdesk_subdomain',
+                contact_id=432
+            )
+        mock_update_user_recorded_status.assert_called_once_with(1, 432, self.test_user_info.fingerprint())
+        mock_print.assert_any_call('Contact updated successfully.')
+
+    @patch('sys.argv', ['main.py', 'test_github_user', 'freshdesk_subdomain'])
+    @patch('main.get_user_info_from_github')
+    @patch('main.upsert_user_info')
+    @patch('main.update_freshdesk_contact')
+    @patch('main.update_user_recorded_status')
+    def test_main_existing_user_update_freshdesk_contact_error(self, mock_update_user_recorded_status, mock_update_freshdesk_contact, mock_upsert_user_info, mock_get_user_info_from_github):
+        mock_get_user_info_from_github.return_value = self.test_user_info
+        mock_upsert_user_info.return_value = (1, True, 432, None, False)
+        mock_update_freshdesk_contact.side_effect = Exception("Freshdesk API error")
         
         with patch('builtins.print') as mock_print:
             with self.assertRaises(SystemExit) as cm:
                 main()
 
-    
         self.assertEqual(cm.exception.code, 1)
+        mock_update_user_recorded_status.assert_not_called()
+        mock_print.assert_any_call('Error: Freshdesk API error')
+
+    @patch('sys.argv', ['main.py', 'test_github_user', 'freshdesk_subdomain'])
+    @patch('main.get_user_info_from_github')
+    @patch('main.upsert_user_info')
+    @patch('main.update_freshdesk_contact')
+    @patch('main.update_user_recorded_status')
+    def test_main_existing_user_update_user_error(self, mock_update_user_recorded_status, mock_update_freshdesk_contact, mock_upsert_user_info, mock_get_user_info_from_github):
+        mock_get_user_info_from_github.return_value = self.test_user_info
+        mock_upsert_user_info.return_value = (1, True, 432, None, False)
+        mock_update_user_recorded_status.side_effect = Exception("Update user info error")
         
-        mock_get_user_info_from_github.assert_called_once_with('new_github_user')
-        mock_get_user_info_from_db.assert_called_once_with('new_github_user')
-        mock_persist_user_info.assert_called_once_with(test_user_info)
-    
-        mock_create_freshdesk_contact.assert_not_called()
+        with patch('builtins.print') as mock_print:
+            with self.assertRaises(SystemExit) as cm:
+                main()
+
+        self.assertEqual(cm.exception.code, 1)
+        mock_update_freshdesk_contact.assert_called_once()
+        mock_print.assert_any_call('Error: Update user info error')
+
+    @patch('sys.argv', ['main.py', 'test_github_user', 'freshdesk_subdomain'])
+    @patch('main.get_user_info_from_github')
+    @patch('main.upsert_user_info')
+    @patch('main.update_freshdesk_contact')
+    @patch('main.update_user_recorded_status')
+    @patch('main.update_user_synced_at')
+    def test_main_existing_user_unchanged(self, mock_update_user_synced_at, mock_update_user_recorded_status, mock_update_freshdesk_contact, mock_upsert_user_info, mock_get_user_info_from_github):
+        mock_get_user_info_from_github.return_value = self.test_user_info
+        mock_upsert_user_info.return_value = (1, True, 432, self.test_user_info.fingerprint(), False)
+
+        with patch('builtins.print') as mock_print:
+            main()
+
+        mock_update_freshdesk_contact.assert_not_called()
         mock_update_user_recorded_status.assert_not_called()
-    
-        mock_print.assert_any_call('Error: Database error')
+        mock_update_user_synced_at.assert_called_once_with(1)
+        mock_print.assert_any_call('Contact is already up to date.')
         
-    @patch('sys.argv', ['main.py', 'new_github_user', 'freshdesk_subdomain'])
+    @patch('sys.argv', ['main.py', 'test_github_user', 'freshdesk_subdomain'])
     @patch('main.get_user_info_from_github')
-    @patch('main.get_user_info_from_db')
+    @patch('main.upsert_user_info')
     @patch('main.create_freshdesk_contact')
     @patch('main.update_user_recorded_status')
-    @patch('main.persist_user_info')
-    def test_main_user_creation_create_freshdesk_contact_error(self, mock_persist_user_info, mock_update_user_recorded_status, mock_create_freshdesk_contact, mock_get_user_info_from_db, mock_get_user_info_from_github):
+    def test_main_existing_user_not_recorded(self, mock_update_user_recorded_status, mock_create_freshdesk_contact, mock_upsert_user_info, mock_get_user_info_from_github):
+        mock_get_user_info_from_github.return_value = self.test_user_info
+        mock_upsert_user_info.return_value = (1, False, None, None, False)
+        mock_create_freshdesk_contact.return_value = {'id': 432}
+        
+        with patch('builtins.print') as mock_print:
+            main()
+
+        mock_create_freshdesk_contact.assert_called_once_with(
+                new_user=self.test_user_info,
+                domain='freshdesk_subdomain'
+            )
+        mock_update_user_recorded_status.assert_called_once_with(1, 432, self.test_user_info.fingerprint())
+        mock_print.assert_any_call('New freshdesk contact created successfully.')
+        self.assertNotIn(unittest.mock.call('New db user created successfully.'), mock_print.call_args_list)
+
+
+class Batch_Should(unittest.TestCase):
+
+    def setUp(self):
+        sync_flights.reset()
+        clear_contact_index()
+
+    def test_read_usernames_skips_blank_lines_and_comments(self):
+        stream = io.StringIO("octocat\n\n# stale logins\n  hubot  \n")
+
+        self.assertEqual(list(read_usernames(stream)), ['octocat', 'hubot'])
+
+    @patch('main.sync_user')
+    def test_run_batch_isolates_failures(self, mock_sync_user):
+        mock_sync_user.side_effect = ['created', Exception("GitHub API Error"), 'updated']
+
+        with patch('builtins.print') as mock_print:
+            failed = run_batch(['first', 'second', 'third'], 'freshdesk_subdomain')
+
+        self.assertEqual(failed, 1)
+        self.assertEqual(mock_sync_user.call_count, 3)
+        mock_sync_user.assert_any_call('third', 'freshdesk_subdomain')
+        mock_print.assert_any_call('first: created')
+        mock_print.assert_any_call('second: failed: GitHub API Error')
+        mock_print.assert_any_call('third: updated')
+
+    @patch('sys.argv', ['main.py', '--batch', '-', 'freshdesk_subdomain'])
+    @patch('sys.stdin', io.StringIO("octocat\nhubot\n"))
+    @patch('main.sync_user')
+    def test_main_batch_from_stdin(self, mock_sync_user):
+        mock_sync_user.return_value = 'updated'
+
+        with patch('builtins.print'):
+            main()
+
+        self.assertEqual(mock_sync_user.call_count, 2)
+        mock_sync_user.assert_any_call('octocat', 'freshdesk_subdomain')
+        mock_sync_user.assert_any_call('hubot', 'freshdesk_subdomain')
+
+    @patch('sys.stdin', io.StringIO("octocat\nhubot\n"))
+    @patch('main.sync_user')
+    def test_main_batch_writes_metrics(self, mock_sync_user):
+        mock_sync_user.side_effect = ['created', Exception('GitHub API Error')]
+        metrics.reset()
+
+        with tempfile.TemporaryDirectory() as directory:
+            json_path = os.path.join(directory, 'metrics.json')
+            prometheus_path = os.path.join(directory, 'metrics.prom')
+            with patch('sys.argv', ['main.py', '--batch', '-', 'freshdesk_subdomain', '--metrics-json', json_path, '--metrics-prometheus', prometheus_path]), patch('builtins.print'):
+                with self.assertRaises(SystemExit):
+                    main()
+
+            with open(json_path, encoding='utf-8') as summary_file:
+                summary = json.load(summary_file)
+            with open(prometheus_path, encoding='utf-8') as prometheus_file:
+                prometheus = prometheus_file.read()
+
+        self.assertEqual(summary['outcomes'], {'created': 1, 'failed': 1})
+        self.assertIn('sync_outcomes_total{outcome="failed"} 1', prometheus)
 
+    @patch('sys.argv', ['main.py', '--batch', '-', 'freshdesk_subdomain'])
+    @patch('sys.stdin', io.StringIO("octocat\n"))
+    @patch('main.sync_user')
+    def test_main_batch_exits_on_failures(self, mock_sync_user):
+        mock_sync_user.side_effect = Exception("Freshdesk API error")
+
+        with patch('builtins.print'):
+            with self.assertRaises(SystemExit) as cm:
+                main()
+
+        self.assertEqual(cm.exception.code, 1)
+
+    @patch('main.get_users_info_from_github')
+    @patch('main.bulk_upsert_user_info')
+    @patch('main.sync_user')
+    def test_run_batch_prefetches_users_with_graphql(self, mock_sync_user, mock_bulk_upsert_user_info, mock_get_users_info_from_github):
         test_user_info = User(
             id=None,
-            github_username="new_github_user",
+            github_username="octocat",
             name="Test User",
             email="test_user@example.com",
             bio="Test bio",
@@ -156,39 +334,38 @@ class Main_Should(unittest.TestCase):
             is_recorded_fd=False,
             freshdesk_contact_id=None
         )
-        mock_get_user_info_from_github.return_value = test_user_info
-        mock_get_user_info_from_db.return_value = None
-        mock_persist_user_info.return_value = 1
-        mock_create_freshdesk_contact.side_effect = Exception("Freshdesk API error")
-        
+        mock_get_users_info_from_github.return_value = ({'octocat': test_user_info}, ['missing'])
+        mock_bulk_upsert_user_info.return_value = {'octocat': (1, True, 432, None, False)}
+        mock_sync_user.return_value = 'updated'
 
         with patch('builtins.print') as mock_print:
-            with self.assertRaises(SystemExit) as cm:
-                main()
+            failed = run_batch(['octocat', 'missing'], 'freshdesk_subdomain', graphql=True)
 
-            
-        self.assertEqual(cm.exception.code, 1)
-        mock_get_user_info_from_github.assert_called_once_with('new_github_user')
-        mock_get_user_info_from_db.assert_called_once_with('new_github_user')
-        mock_persist_user_info.assert_called_once_with(test_user_info)
-        mock_create_freshdesk_contact.assert_called_once_with(
-                new_user=test_user_info,
-                domain='freshdesk_subdomain'
-            )
-        mock_update_user_recorded_status.assert_not_called()
-        mock_print.assert_any_call('Error: Freshdesk API error')
-    
-    @patch('sys.argv', ['main.py', 'new_github_user', 'freshdesk_subdomain'])
-    @patch('main.get_user_info_from_github')
-    @patch('main.get_user_info_from_db')
-    @patch('main.create_freshdesk_contact')
-    @patch('main.update_user_recorded_status')
-    @patch('main.persist_user_info')
-    def test_main_user_creation_update_status_error(self, mock_persist_user_info, mock_update_user_recorded_status, mock_create_freshdesk_contact, mock_get_user_info_from_db, mock_get_user_info_from_github):
-        
+        self.assertEqual(failed, 0)
+        mock_get_users_info_from_github.assert_called_once_with(['octocat', 'missing'])
+        mock_bulk_upsert_user_info.assert_called_once_with([test_user_info])
+        mock_sync_user.assert_called_once_with('octocat', 'freshdesk_subdomain', user_info=test_user_info, db_state=(1, True, 432, None, False))
+        mock_print.assert_any_call('missing: missing')
+
+    @patch('main.get_users_info_from_github')
+    @patch('main.sync_user')
+    def test_run_batch_falls_back_to_rest_when_graphql_fails(self, mock_sync_user, mock_get_users_info_from_github):
+        mock_get_users_info_from_github.side_effect = Exception("Error fetching users info from GitHub: Bad credentials")
+        mock_sync_user.return_value = 'updated'
+
+        with patch('builtins.print'):
+            failed = run_batch(['octocat'], 'freshdesk_subdomain', graphql=True)
+
+        self.assertEqual(failed, 0)
+        mock_sync_user.assert_called_once_with('octocat', 'freshdesk_subdomain')
+
+    @patch('main.get_users_info_from_github')
+    @patch('main.bulk_upsert_user_info')
+    @patch('main.sync_user')
+    def test_run_batch_upserts_one_by_one_when_bulk_upsert_fails(self, mock_sync_user, mock_bulk_upsert_user_info, mock_get_users_info_from_github):
         test_user_info = User(
             id=None,
-            github_username="new_github_user",
+            github_username="octocat",
             name="Test User",
             email="test_user@example.com",
             bio="Test bio",
@@ -196,40 +373,23 @@ class Main_Should(unittest.TestCase):
             created_at=None,
             is_recorded_fd=False,
             freshdesk_contact_id=None
-        ) 
-        mock_get_user_info_from_github.return_value = test_user_info
-        mock_get_user_info_from_db.return_value = None
-        mock_persist_user_info.return_value = 1  
-        mock_create_freshdesk_contact.return_value = {'id': 432}
+        )
+        mock_get_users_info_from_github.return_value = ({'octocat': test_user_info}, [])
+        mock_bulk_upsert_user_info.side_effect = Exception("Failed to persist users info: Deadlock found")
+        mock_sync_user.return_value = 'updated'
 
-        mock_update_user_recorded_status.side_effect = Exception("Database update error")
-        
-        with patch('builtins.print') as mock_print:
-            with self.assertRaises(SystemExit) as cm:
-                main()
+        with patch('builtins.print'):
+            run_batch(['octocat'], 'freshdesk_subdomain', graphql=True)
 
-            
-        self.assertEqual(cm.exception.code, 1)
-        
-        mock_get_user_info_from_github.assert_called_once_with('new_github_user')
-        mock_get_user_info_from_db.assert_called_once_with('new_github_user')
-        mock_persist_user_info.assert_called_once_with(test_user_info)
-        mock_create_freshdesk_contact.assert_called_once_with(
-                new_user=test_user_info,
-                domain='freshdesk_subdomain'
-            )
-        mock_update_user_recorded_status.assert_called_once_with(1, 432)
-        mock_print.assert_any_call('Error: Database update error')
-    
-    @patch('sys.argv', ['main.py', 'existing_github_user', 'freshdesk_subdomain'])
-    @patch('main.get_user_info_from_github')
-    @patch('main.get_user_info_from_db')
+        mock_sync_user.assert_called_once_with('octocat', 'freshdesk_subdomain', user_info=test_user_info, db_state=None)
+
+    @patch('main.update_user_recorded_status')
     @patch('main.update_freshdesk_contact')
-    def test_main_existing_user_updated(self, mock_update_freshdesk_contact, mock_get_user_info_from_db, mock_get_user_info_from_github):
-        
+    @patch('main.upsert_user_info')
+    def test_sync_user_uses_prefetched_db_state(self, mock_upsert_user_info, mock_update_freshdesk_contact, mock_update_user_recorded_status):
         test_user_info = User(
             id=None,
-            github_username="existing_github_user",
+            github_username="octocat",
             name="Test User",
             email="test_user@example.com",
             bio="Test bio",
@@ -238,35 +398,20 @@ class Main_Should(unittest.TestCase):
             is_recorded_fd=False,
             freshdesk_contact_id=None
         )
-         
-        mock_get_user_info_from_github.return_value = test_user_info
-        mock_get_user_info_from_db.return_value = [(1, True, 432)]  
-        
-
-        with patch('builtins.print') as mock_print:
-            main()
-
 
-        mock_get_user_info_from_github.assert_called_once_with('existing_github_user')
-        mock_get_user_info_from_db.assert_called_once_with('existing_github_user')
-        mock_update_freshdesk_contact.assert_called_once_with(
-                user=test_user_info,
-                domain='freshdesk_subdomain',
-                contact_id=432
-            )
+        outcome = sync_user('octocat', 'freshdesk_subdomain', user_info=test_user_info, db_state=(1, True, 432, None, False))
 
-        mock_print.assert_any_call('Contact updated successfully.')
+        self.assertEqual(outcome, 'updated')
+        mock_upsert_user_info.assert_not_called()
+        mock_update_user_recorded_status.assert_called_once_with(1, 432, test_user_info.fingerprint())
 
-    @patch('sys.argv', ['main.py', 'existing_github_user', 'freshdesk_subdomain'])
-    @patch('main.get_user_info_from_github')
-    @patch('main.get_user_info_from_db')
+    @patch('main.update_user_recorded_status')
     @patch('main.update_freshdesk_contact')
-    @patch('main.update_user_full_info')
-    def test_main_existing_user_update_freshdesk_contact_error(self, mock_update_user_full_info, mock_update_freshdesk_contact, mock_get_user_info_from_db, mock_get_user_info_from_github):
-       
+    @patch('main.create_freshdesk_contact')
+    def test_sync_user_reuses_contact_created_by_interrupted_run(self, mock_create_freshdesk_contact, mock_update_freshdesk_contact, mock_update_user_recorded_status):
         test_user_info = User(
             id=None,
-            github_username="existing_github_user",
+            github_username="octocat",
             name="Test User",
             email="test_user@example.com",
             bio="Test bio",
@@ -275,39 +420,22 @@ class Main_Should(unittest.TestCase):
             is_recorded_fd=False,
             freshdesk_contact_id=None
         )
-        
-        mock_get_user_info_from_github.return_value = test_user_info
-        mock_get_user_info_from_db.return_value = [(1, True, 432)]  
-        mock_update_freshdesk_contact.side_effect = Exception("Freshdesk API error")
-        
-        with patch('builtins.print') as mock_print:
-            with self.assertRaises(SystemExit) as cm:
-                main()
-
-        self.assertEqual(cm.exception.code, 1)
-        
-        mock_get_user_info_from_github.assert_called_once_with('existing_github_user')
-        mock_get_user_info_from_db.assert_called_once_with('existing_github_user')
-        mock_update_freshdesk_contact.assert_called_once_with(
-            user=test_user_info,
-            domain='freshdesk_subdomain',
-            contact_id=432
-        )
-        mock_update_user_full_info.assert_not_called()
+        journal = MagicMock()
+        journal.contact_id.return_value = 432
 
-        mock_print.assert_any_call('Error: Freshdesk API error')
+        outcome = sync_user('octocat', 'freshdesk_subdomain', user_info=test_user_info, db_state=(1, False, None, None, False), journal=journal)
 
+        self.assertEqual(outcome, 'recorded')
+        mock_create_freshdesk_contact.assert_not_called()
+        mock_update_freshdesk_contact.assert_called_once_with(user=test_user_info, domain='freshdesk_subdomain', contact_id=432)
+        mock_update_user_recorded_status.assert_called_once_with(1, 432, test_user_info.fingerprint())
 
-    @patch('sys.argv', ['main.py', 'existing_github_user', 'freshdesk_subdomain'])
-    @patch('main.get_user_info_from_github')
-    @patch('main.get_user_info_from_db')
-    @patch('main.update_freshdesk_contact')
-    @patch('main.update_user_full_info')
-    def test_main_existing_user_update_user_error(self, mock_update_user_full_info, mock_update_freshdesk_contact, mock_get_user_info_from_db, mock_get_user_info_from_github):
-        
+    @patch('main.update_user_recorded_status')
+    @patch('main.create_freshdesk_contact')
+    def test_sync_user_journals_new_contact_before_storing_it(self, mock_create_freshdesk_contact, mock_update_user_recorded_status):
         test_user_info = User(
             id=None,
-            github_username="existing_github_user",
+            github_username="octocat",
             name="Test User",
             email="test_user@example.com",
             bio="Test bio",
@@ -316,40 +444,44 @@ class Main_Should(unittest.TestCase):
             is_recorded_fd=False,
             freshdesk_contact_id=None
         )
-        
-        mock_get_user_info_from_github.return_value = test_user_info
-        mock_get_user_info_from_db.return_value = [(1, True, 432)]  
-        mock_update_freshdesk_contact.return_value = None
-        mock_update_user_full_info.side_effect = Exception("Update user info error")
-        
-        with patch('builtins.print') as mock_print:
-            with self.assertRaises(SystemExit) as cm:
-                main()
+        journal = MagicMock()
+        journal.contact_id.return_value = None
+        mock_create_freshdesk_contact.return_value = {"id": 432}
+        mock_update_user_recorded_status.side_effect = Exception("Database update error")
+
+        with self.assertRaises(Exception):
+            sync_user('octocat', 'freshdesk_subdomain', user_info=test_user_info, db_state=(1, False, None, None, True), journal=journal)
+
+        journal.record_contact.assert_called_once_with('octocat', 432)
+
+    @patch('main.sync_user')
+    def test_run_batch_resumes_from_journal(self, mock_sync_user):
+        mock_sync_user.side_effect = ['created', Exception('GitHub API Error')]
+
+        with tempfile.TemporaryDirectory() as directory:
+            journal = Journal(os.path.join(directory, 'batch.journal'))
+            journal.record_done('octocat', 'created')
+
+            with patch('builtins.print') as mock_print:
+                failed = run_batch(['octocat', 'hubot', 'monalisa'], 'freshdesk_subdomain', journal=journal, resume=True)
+            journal.close()
+
+            reopened = Journal(os.path.join(directory, 'batch.journal'))
+            completed = set(reopened.completed)
+            reopened.close()
+
+        self.assertEqual(failed, 1)
+        self.assertEqual(mock_sync_user.call_count, 2)
+        self.assertEqual(completed, {'octocat', 'hubot'})
+        mock_print.assert_any_call('Skipped 1 users completed by an earlier run')
 
-        self.assertEqual(cm.exception.code, 1)
-        
-        mock_get_user_info_from_github.assert_called_once_with('existing_github_user')
-        mock_get_user_info_from_db.assert_called_once_with('existing_github_user')
-        mock_update_freshdesk_contact.assert_called_once_with(
-            user=test_user_info,
-            domain='freshdesk_subdomain',
-            contact_id=432
-        )
-        
-        mock_update_user_full_info.assert_called_once_with(id=1, user=test_user_info)
-        mock_print.assert_any_call('Error: Update user info error')
-        
-        
-    @patch('sys.argv', ['main.py', 'existing_github_user_not_recorded', 'freshdesk_subdomain'])
-    @patch('main.get_user_info_from_github')
-    @patch('main.get_user_info_from_db')
     @patch('main.create_freshdesk_contact')
-    @patch('main.update_user_recorded_status')
-    def test_main_existing_user_not_recorded(self, mock_update_user_recorded_status, mock_create_freshdesk_contact, mock_get_user_info_from_db, mock_get_user_info_from_github):
-       
+    @patch('main.upsert_user_info')
+    @patch('main.get_user_info_from_github')
+    def test_run_batch_with_outbox_only_queues_pushes(self, mock_get_user_info_from_github, mock_upsert_user_info, mock_create_freshdesk_contact):
         test_user_info = User(
             id=None,
-            github_username="existing_github_user_not_recorded",
+            github_username="octocat",
             name="Test User",
             email="test_user@example.com",
             bio="Test bio",
@@ -358,33 +490,25 @@ class Main_Should(unittest.TestCase):
             is_recorded_fd=False,
             freshdesk_contact_id=None
         )
-        
         mock_get_user_info_from_github.return_value = test_user_info
-        mock_get_user_info_from_db.return_value = [(1, False, None)]  
-        mock_create_freshdesk_contact.return_value = {'id': 432}
-        
+        mock_upsert_user_info.return_value = (1, False, None, None, True)
+
         with patch('builtins.print') as mock_print:
-            main()
+            run_batch(['octocat'], 'freshdesk_subdomain', outbox=True)
 
-        mock_get_user_info_from_github.assert_called_once_with('existing_github_user_not_recorded')
-        mock_get_user_info_from_db.assert_called_once_with('existing_github_user_not_recorded')
-        mock_create_freshdesk_contact.assert_called_once_with(
-                new_user=test_user_info,
-                domain='freshdesk_subdomain'
-            )
-        mock_update_user_recorded_status.assert_called_once_with(1, 432)
-        mock_print.assert_any_call('New freshdesk contact created successfully.')
+        mock_upsert_user_info.assert_called_once_with(test_user_info, outbox_domain='freshdesk_subdomain')
+        mock_create_freshdesk_contact.assert_not_called()
+        mock_print.assert_any_call('octocat: queued')
 
-    @patch('sys.argv', ['main.py', 'existing_github_user_not_recorded', 'freshdesk_subdomain'])
-    @patch('main.get_user_info_from_github')
-    @patch('main.get_user_info_from_db')
-    @patch('main.create_freshdesk_contact')
+    @patch('main.complete_outbox_entry')
+    @patch('main.fail_outbox_entry')
     @patch('main.update_user_recorded_status')
-    def test_main_existing_user_not_recorded_create_contact_error(self, mock_update_user_recorded_status, mock_create_freshdesk_contact, mock_get_user_info_from_db, mock_get_user_info_from_github):
-       
+    @patch('main.create_freshdesk_contact')
+    @patch('main.claim_outbox_entries')
+    def test_drain_outbox_pushes_claimed_entries(self, mock_claim_outbox_entries, mock_create_freshdesk_contact, mock_update_user_recorded_status, mock_fail_outbox_entry, mock_complete_outbox_entry):
         test_user_info = User(
             id=None,
-            github_username="existing_github_user_not_recorded",
+            github_username="octocat",
             name="Test User",
             email="test_user@example.com",
             bio="Test bio",
@@ -393,69 +517,223 @@ class Main_Should(unittest.TestCase):
             is_recorded_fd=False,
             freshdesk_contact_id=None
         )
-        
-        mock_get_user_info_from_github.return_value = test_user_info
-        mock_get_user_info_from_db.return_value = [(1, False, None)]  
-        
-        mock_create_freshdesk_contact.side_effect = Exception("Freshdesk API error")
-        
+        test_user_info.id = 1
+        mock_claim_outbox_entries.side_effect = [[(7, 2, 'freshdesk_subdomain', test_user_info, None, 1)], []]
+        mock_create_freshdesk_contact.return_value = {"id": 432}
+
         with patch('builtins.print') as mock_print:
-            with self.assertRaises(SystemExit) as cm:
-                main()
+            failed = drain_outbox()
 
-        self.assertEqual(cm.exception.code, 1)
-        
-        mock_get_user_info_from_github.assert_called_once_with('existing_github_user_not_recorded')
-        mock_get_user_info_from_db.assert_called_once_with('existing_github_user_not_recorded')
-        mock_create_freshdesk_contact.assert_called_once_with(
-            new_user=test_user_info,
-            domain='freshdesk_subdomain'
-        )
-        
-        mock_update_user_recorded_status.assert_not_called()
-        
-        mock_print.assert_any_call('Error: Freshdesk API error')
+        self.assertEqual(failed, 0)
+        mock_create_freshdesk_contact.assert_called_once_with(new_user=test_user_info, domain='freshdesk_subdomain')
+        mock_update_user_recorded_status.assert_called_once_with(1, 432, test_user_info.fingerprint())
+        mock_complete_outbox_entry.assert_called_once_with(7, 2)
+        mock_fail_outbox_entry.assert_not_called()
+        mock_print.assert_any_call('octocat: recorded')
 
-    @patch('sys.argv', ['main.py', 'existing_github_user_not_recorded', 'freshdesk_subdomain'])
-    @patch('main.get_user_info_from_github')
-    @patch('main.get_user_info_from_db')
+    @patch('main.complete_outbox_entry')
+    @patch('main.fail_outbox_entry')
     @patch('main.create_freshdesk_contact')
-    @patch('main.update_user_recorded_status')
-    def test_update_user_recorded_status_error(self, mock_update_user_recorded_status, mock_create_freshdesk_contact, mock_get_user_info_from_db, mock_get_user_info_from_github):
-
+    @patch('main.claim_outbox_entries')
+    def test_drain_outbox_backs_off_failed_entries(self, mock_claim_outbox_entries, mock_create_freshdesk_contact, mock_fail_outbox_entry, mock_complete_outbox_entry):
         test_user_info = User(
-            id=None,  
-            github_username="existing_github_user_not_recorded",
+            id=None,
+            github_username="octocat",
             name="Test User",
             email="test_user@example.com",
             bio="Test bio",
             location="Test location",
             created_at=None,
-            is_recorded_fd=None,
+            is_recorded_fd=False,
             freshdesk_contact_id=None
         )
+        test_user_info.id = 1
+        mock_claim_outbox_entries.side_effect = [[(7, 2, 'freshdesk_subdomain', test_user_info, None, 3)], []]
+        mock_create_freshdesk_contact.side_effect = Exception("Freshdesk API error")
+
+        with patch('builtins.print'), patch('main.OUTBOX_RETRY_BASE', 30):
+            failed = drain_outbox()
+
+        self.assertEqual(failed, 1)
+        mock_fail_outbox_entry.assert_called_once()
+        self.assertEqual(mock_fail_outbox_entry.call_args.args[0], 7)
+        self.assertEqual(mock_fail_outbox_entry.call_args.args[2], 120)
+        mock_complete_outbox_entry.assert_not_called()
+
+    @patch('main.sync_user')
+    def test_run_batch_coalesces_duplicate_usernames(self, mock_sync_user):
+        mock_sync_user.return_value = 'created'
 
-        mock_get_user_info_from_github.return_value = test_user_info
-        mock_get_user_info_from_db.return_value = [(1, False, None)]  
-        mock_create_freshdesk_contact.return_value = {'id': 432}
-        mock_update_user_recorded_status.side_effect = Exception("Database update error")
-        
         with patch('builtins.print') as mock_print:
-            with self.assertRaises(SystemExit) as cm:
+            failed = run_batch(['octocat', 'OctoCat', 'hubot'], 'freshdesk_subdomain')
+
+        self.assertEqual(failed, 0)
+        self.assertEqual(mock_sync_user.call_count, 2)
+        mock_print.assert_any_call('OctoCat: coalesced')
+
+    @patch('sys.argv', ['main.py', '--org', 'acme', 'freshdesk_subdomain', '--team', 'core', '--workers', '2'])
+    @patch('main.iter_org_members')
+    @patch('main.sync_user')
+    def test_main_org_syncs_streamed_members(self, mock_sync_user, mock_iter_org_members):
+        mock_iter_org_members.return_value = iter(['octocat', 'hubot'])
+        mock_sync_user.return_value = 'created'
+
+        with patch('builtins.print'):
+            main()
+
+        mock_iter_org_members.assert_called_once_with('acme', 'core')
+        mock_sync_user.assert_any_call('octocat', 'freshdesk_subdomain')
+        mock_sync_user.assert_any_call('hubot', 'freshdesk_subdomain')
+
+    @patch('sys.argv', ['main.py', '--org', 'acme', 'freshdesk_subdomain'])
+    @patch('main.iter_org_members')
+    def test_main_org_listing_error(self, mock_iter_org_members):
+        mock_iter_org_members.side_effect = Exception("Error listing members of organization acme: Not Found")
+
+        with patch('builtins.print') as mock_print:
+            with self.assertRaises(SystemExit):
                 main()
 
-            
-        self.assertEqual(cm.exception.code, 1)
-        
-        mock_get_user_info_from_github.assert_called_once_with('existing_github_user_not_recorded')
-        mock_get_user_info_from_db.assert_called_once_with('existing_github_user_not_recorded')
-        mock_create_freshdesk_contact.assert_called_once_with(
-            new_user=test_user_info,
-            domain='freshdesk_subdomain'
-        )
-        mock_update_user_recorded_status.assert_called_once_with(1, 432)
-        
-        mock_print.assert_any_call('Error: Database update error')
-        
+        mock_print.assert_any_call('Error: Error listing members of organization acme: Not Found')
+
+    @patch('sys.argv', ['main.py', '--org', 'acme', 'freshdesk_subdomain', '--workers', '4'])
+    @patch('main.iter_org_members')
+    @patch('main.sync_user')
+    def test_main_org_listing_error_reports_listed_members(self, mock_sync_user, mock_iter_org_members):
+        def members(org, team):
+            yield from ['octocat', 'hubot', 'monalisa']
+            raise Exception("Error listing members of organization acme: Not Found")
+        mock_iter_org_members.side_effect = members
+        mock_sync_user.return_value = 'created'
+        metrics.reset()
+
+        with patch('builtins.print') as mock_print:
+            with self.assertRaises(SystemExit):
+                main()
+
+        for github_username in ['octocat', 'hubot', 'monalisa']:
+            mock_print.assert_any_call(f'{github_username}: created')
+        self.assertEqual(metrics.summary()["outcomes"], {"created": 3})
+        mock_print.assert_any_call('Error: Error listing members of organization acme: Not Found')
+
+    @patch('main.update_users_attempted_at')
+    @patch('main.get_stale_usernames')
+    @patch('main.sync_user')
+    def test_refresh_round_syncs_stale_users(self, mock_sync_user, mock_get_stale_usernames, mock_update_users_attempted_at):
+        mock_get_stale_usernames.return_value = ['octocat', 'hubot']
+        mock_sync_user.return_value = 'unchanged'
+
+        with patch('builtins.print'), patch('main.REFRESH_ACTIVE_INTERVAL', 3600), patch('main.REFRESH_DORMANT_INTERVAL', 604800), patch('main.REFRESH_ACTIVE_WINDOW', 86400), patch('main.REFRESH_RETRY_INTERVAL', 600):
+            failed = refresh_round('freshdesk_subdomain', 2)
+
+        self.assertEqual(failed, 0)
+        mock_get_stale_usernames.assert_called_once_with(2, 3600, 604800, 86400, 600)
+        self.assertEqual(mock_sync_user.call_count, 2)
+        mock_update_users_attempted_at.assert_called_once_with(['octocat', 'hubot'])
+
+    @patch('main.update_users_attempted_at')
+    @patch('main.get_stale_usernames')
+    @patch('main.sync_user')
+    def test_refresh_round_records_failed_attempts(self, mock_sync_user, mock_get_stale_usernames, mock_update_users_attempted_at):
+        mock_get_stale_usernames.return_value = ['ghost', 'octocat']
+        mock_sync_user.side_effect = [GithubUserNotFound("user ghost not found"), Exception("Freshdesk API error")]
+
+        with patch('builtins.print'):
+            failed = refresh_round('freshdesk_subdomain', 2)
+
+        self.assertEqual(failed, 1)
+        mock_update_users_attempted_at.assert_called_once_with(['ghost', 'octocat'])
+
+    @patch('sys.argv', ['main.py', '--refresh', 'freshdesk_subdomain', '--interval', '0'])
+    @patch('main.update_users_attempted_at')
+    @patch('main.get_stale_usernames')
+    @patch('main.sync_user')
+    def test_main_refresh_survives_a_failed_round(self, mock_sync_user, mock_get_stale_usernames, mock_update_users_attempted_at):
+        mock_get_stale_usernames.side_effect = [Exception("Lost connection to server"), ['octocat'], KeyboardInterrupt()]
+        mock_sync_user.return_value = 'unchanged'
+
+        with patch('builtins.print') as mock_print:
+            main()
+
+        mock_print.assert_any_call('Error: Lost connection to server')
+        mock_sync_user.assert_called_once_with('octocat', 'freshdesk_subdomain')
+
+    def test_budgeted_stops_at_time_budget(self):
+        with patch('main.time.monotonic', side_effect=[0, 1, 31]):
+            usernames = list(_budgeted(['octocat', 'hubot', 'monalisa'], budget_seconds=30))
+
+        self.assertEqual(usernames, ['octocat'])
+
+    @patch('sys.argv', ['main.py', '--refresh', 'freshdesk_subdomain', '--once'])
+    @patch('main.update_users_attempted_at')
+    @patch('main.get_stale_usernames')
+    @patch('main.sync_user')
+    def test_main_refresh_once_exits_on_failures(self, mock_sync_user, mock_get_stale_usernames, mock_update_users_attempted_at):
+        mock_get_stale_usernames.return_value = ['octocat']
+        mock_sync_user.side_effect = Exception("Freshdesk API error")
+
+        with patch('builtins.print'):
+            with self.assertRaises(SystemExit):
+                main()
+
+        mock_sync_user.assert_called_once_with('octocat', 'freshdesk_subdomain')
+
+    @patch('sys.argv', ['main.py', '--batch', '-', 'freshdesk_subdomain', '--index-contacts'])
+    @patch('sys.stdin', io.StringIO("octocat\n"))
+    @patch('main.iter_freshdesk_contacts')
+    @patch('main.sync_user')
+    def test_main_batch_indexes_contacts_first(self, mock_sync_user, mock_iter_freshdesk_contacts):
+        mock_iter_freshdesk_contacts.return_value = iter([{"id": 432, "email": "octocat@example.com"}, {"id": 433, "email": None}])
+        mock_sync_user.return_value = 'recorded'
+
+        with patch('builtins.print') as mock_print:
+            main()
+
+        mock_iter_freshdesk_contacts.assert_called_once_with('freshdesk_subdomain')
+        self.assertEqual(get_contact_id('freshdesk_subdomain', 'octocat@example.com'), 432)
+        mock_print.assert_any_call('Indexed 2 Freshdesk contacts')
+
+    @patch('main.iter_freshdesk_contacts')
+    @patch('main.stream_users')
+    @patch('main.create_freshdesk_contact')
+    @patch('main.update_freshdesk_contact')
+    @patch('main.update_user_recorded_status')
+    def test_reconcile_repairs_missing_and_divergent_records(self, mock_update_user_recorded_status, mock_update_freshdesk_contact, mock_create_freshdesk_contact, mock_stream_users, mock_iter_freshdesk_contacts):
+        divergent = User(id=1, github_username="octocat", name="Octocat", email="octocat@example.com", bio=None, location=None, created_at=None, is_recorded_fd=True, freshdesk_contact_id=432)
+        missing = User(id=2, github_username="hubot", name="Hubot", email="hubot@example.com", bio=None, location=None, created_at=None, is_recorded_fd=True, freshdesk_contact_id=999)
+        mock_iter_freshdesk_contacts.return_value = iter([
+            {"id": 432, "name": "Old name", "email": "octocat@example.com"},
+            {"id": 500, "name": "Someone", "email": "someone@example.com"},
+        ])
+        mock_stream_users.return_value = iter([divergent, missing])
+        mock_create_freshdesk_contact.return_value = {"id": 501}
+
+        with patch('builtins.print') as mock_print:
+            failed = reconcile_contacts('freshdesk_subdomain', repair=True)
+
+        self.assertEqual(failed, 0)
+        mock_update_freshdesk_contact.assert_called_once_with(user=divergent, domain='freshdesk_subdomain', contact_id=432)
+        mock_create_freshdesk_contact.assert_called_once_with(new_user=missing, domain='freshdesk_subdomain')
+        mock_update_user_recorded_status.assert_any_call(1, 432, divergent.fingerprint())
+        mock_update_user_recorded_status.assert_any_call(2, 501, missing.fingerprint())
+        mock_print.assert_any_call('orphaned: contact 500')
+        mock_print.assert_any_call('divergent: octocat (contact 432): repaired')
+
+    @patch('main.iter_freshdesk_contacts')
+    @patch('main.stream_users')
+    @patch('main.update_freshdesk_contact')
+    def test_reconcile_only_reports_without_repair(self, mock_update_freshdesk_contact, mock_stream_users, mock_iter_freshdesk_contacts):
+        user = User(id=1, github_username="octocat", name="Octocat", email="octocat@example.com", bio=None, location=None, created_at=None, is_recorded_fd=True, freshdesk_contact_id=432)
+        mock_iter_freshdesk_contacts.return_value = iter([{"id": 432, "name": "Old name", "email": "octocat@example.com"}])
+        mock_stream_users.return_value = iter([user])
+
+        with patch('builtins.print') as mock_print:
+            failed = reconcile_contacts('freshdesk_subdomain')
+
+        self.assertEqual(failed, 0)
+        mock_update_freshdesk_contact.assert_not_called()
+        mock_print.assert_any_call('divergent: octocat (contact 432)')
+
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import asyncio
+import unittest
+from services.metrics import MetricsRegistry, Histogram, STAGE_SECONDS, HTTP_RESPONSES, OUTCOMES, CONCURRENCY_LIMIT
+
+
+class Histogram_Should(unittest.TestCase):
+
+    def test_estimates_quantiles_within_buckets(self):
+        histogram = Histogram(buckets=(0.1, 0.2, 0.4))
+        for value in [0.05] * 50 + [0.15] * 45 + [0.3] * 5:
+            histogram.observe(value)
+
+        self.assertAlmostEqual(histogram.quantile(0.5), 0.1)
+        self.assertGreater(histogram.quantile(0.99), 0.2)
+        self.assertLessEqual(histogram.quantile(0.99), 0.4)
+
+    def test_has_no_quantile_without_observations(self):
+        self.assertIsNone(Histogram().quantile(0.5))
+
+
+class MetricsRegistry_Should(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = MetricsRegistry()
+
+    def test_times_stages_and_counts_errors(self):
+        @self.metrics.timed("github_fetch")
+        def fetch(fail):
+            if fail:
+                raise Exception("GitHub API Error")
+            return "user"
+
+        self.assertEqual(fetch(False), "user")
+        with self.assertRaises(Exception):
+            fetch(True)
+
+        stage = self.metrics.summary()["stages"]["github_fetch"]
+        self.assertEqual(stage["calls"], 2)
+        self.assertEqual(stage["errors"], 1)
+        self.assertIsNotNone(stage["p99_ms"])
+
+    def test_times_coroutines(self):
+        @self.metrics.timed("freshdesk_create")
+        async def create():
+            return {"id": 1}
+
+        self.assertEqual(asyncio.run(create()), {"id": 1})
+        self.assertEqual(self.metrics.summary()["stages"]["freshdesk_create"]["calls"], 1)
+
+    def test_summarizes_counters(self):
+        self.metrics.inc(HTTP_RESPONSES, api="freshdesk:acme", status=201)
+        self.metrics.inc(HTTP_RESPONSES, api="freshdesk:acme", status=429)
+        self.metrics.inc(HTTP_RESPONSES, api="freshdesk:acme", status=201)
+        self.metrics.inc(OUTCOMES, outcome="created")
+
+        summary = self.metrics.summary()
+
+        self.assertEqual(summary["http_responses"], {"freshdesk:acme": {"201": 2, "429": 1}})
+        self.assertEqual(summary["outcomes"], {"created": 1})
+        json.dumps(summary)
+
+    def test_exports_prometheus_text(self):
+        self.metrics.inc(OUTCOMES, outcome='up "to" date')
+        self.metrics.observe(STAGE_SECONDS, 0.02, stage="db_read")
+
+        text = self.metrics.to_prometheus()
+
+        self.assertIn("# TYPE sync_outcomes_total counter", text)
+        self.assertIn('sync_outcomes_total{outcome="up \\"to\\" date"} 1', text)
+        self.assertIn("# TYPE sync_stage_duration_seconds histogram", text)
+        self.assertIn('sync_stage_duration_seconds_bucket{stage="db_read",le="0.025"} 1', text)
+        self.assertIn('sync_stage_duration_seconds_bucket{stage="db_read",le="+Inf"} 1', text)
+        self.assertIn('sync_stage_duration_seconds_count{stage="db_read"} 1', text)
+
+    def test_exports_gauges(self):
+        self.metrics.set(CONCURRENCY_LIMIT, 8, key="freshdesk:example")
+        self.metrics.set(CONCURRENCY_LIMIT, 4, key="freshdesk:example")
+
+        self.assertIn("# TYPE concurrency_limit gauge", self.metrics.to_prometheus())
+        self.assertIn('concurrency_limit{key="freshdesk:example"} 4', self.metrics.to_prometheus())
+        self.assertEqual(self.metrics.summary()["concurrency_limits"], {"freshdesk:example": 4})
+
+    def test_reset_clears_everything(self):
+        self.metrics.inc(OUTCOMES, outcome="created")
+        self.metrics.set(CONCURRENCY_LIMIT, 4, key="freshdesk:example")
+        self.metrics.reset()
+
+        self.assertEqual(self.metrics.to_prometheus(), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
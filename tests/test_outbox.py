@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import patch
+from datetime import datetime
+from services.outbox import claim_outbox_entries, complete_outbox_entry, fail_outbox_entry
+
+
+class Outbox_Should(unittest.TestCase):
+
+    @patch('services.outbox.transaction')
+    def test_claims_entries_with_skip_locked_and_leases_them(self, mock_transaction):
+        mock_cursor = mock_transaction.return_value.__enter__.return_value
+        mock_cursor.fetchall.side_effect = [
+            [(7,), (8,)],
+            [
+                (7, 1, 'example', 1, 'octocat', 'The Octocat', 'octocat@github.com', 'bio', 'San Francisco', datetime(2011, 1, 25), 0, None, None, 1),
+                (8, 3, 'example', 2, 'hubot', 'Hubot', None, None, None, None, 1, 433, 'hash', 2),
+            ],
+        ]
+
+        entries = claim_outbox_entries(10, 300)
+
+        select_sql = mock_cursor.execute.call_args_list[0].args[0]
+        self.assertIn("FOR UPDATE SKIP LOCKED", select_sql)
+        self.assertIn("LIMIT 10", select_sql)
+        self.assertEqual(mock_cursor.execute.call_args_list[1].args[1], (300, 7, 8))
+        self.assertEqual(len(entries), 2)
+        outbox_id, version, domain, user_info, sync_hash, attempts = entries[1]
+        self.assertEqual((outbox_id, version, domain, sync_hash, attempts), (8, 3, 'example', 'hash', 2))
+        self.assertEqual(user_info.github_username, 'hubot')
+        self.assertTrue(user_info.is_recorded_fd)
+        self.assertEqual(user_info.freshdesk_contact_id, 433)
+
+    @patch('services.outbox.transaction')
+    def test_claims_nothing_when_outbox_is_empty(self, mock_transaction):
+        mock_cursor = mock_transaction.return_value.__enter__.return_value
+        mock_cursor.fetchall.return_value = []
+
+        self.assertEqual(claim_outbox_entries(10, 300), [])
+        self.assertEqual(mock_cursor.execute.call_count, 1)
+
+    @patch('services.outbox.transaction')
+    def test_completing_a_reenqueued_entry_makes_it_available_again(self, mock_transaction):
+        mock_cursor = mock_transaction.return_value.__enter__.return_value
+        mock_cursor.rowcount = 0
+
+        complete_outbox_entry(7, 1)
+
+        self.assertEqual(mock_cursor.execute.call_count, 2)
+        self.assertEqual(mock_cursor.execute.call_args_list[1].args[1], (7,))
+
+    @patch('services.outbox.update_query')
+    def test_failed_entry_is_retried_later(self, mock_update_query):
+        fail_outbox_entry(7, Exception("Failed to create contact. Status Code: 500"), 60)
+
+        mock_update_query.assert_called_once()
+        self.assertEqual(mock_update_query.call_args.args[1], ("Failed to create contact. Status Code: 500", 60, 7))
+
+
+if __name__ == '__main__':
+    unittest.main()
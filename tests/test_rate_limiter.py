@@ -0,0 +1,87 @@
+import time
+import asyncio
+import unittest
+from routers.rate_limiter import RateLimitScheduler, TokenBucket
+
+
+class TokenBucket_Should(unittest.TestCase):
+
+    def test_is_unthrottled_until_a_rate_is_known(self):
+        bucket = TokenBucket(capacity=1)
+
+        waits = [bucket.acquire() for _ in range(5)]
+
+        self.assertEqual(waits, [0.0] * 5)
+
+    def test_paces_requests_once_burst_is_used(self):
+        bucket = TokenBucket(capacity=1)
+        bucket.set_rate(20)
+
+        bucket.acquire()
+        waited = bucket.acquire()
+
+        self.assertGreater(waited, 0.0)
+        self.assertLess(waited, 0.2)
+
+    def test_pause_blocks_until_it_ends(self):
+        bucket = TokenBucket(capacity=10)
+        bucket.pause(0.05)
+
+        started = time.monotonic()
+        bucket.acquire()
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+
+    def test_async_acquire_waits_for_pause(self):
+        bucket = TokenBucket(capacity=10)
+        bucket.pause(0.05)
+
+        waited = asyncio.run(bucket.acquire_async())
+
+        self.assertGreaterEqual(waited, 0.04)
+
+
+class RateLimitScheduler_Should(unittest.TestCase):
+
+    def test_learns_rate_from_github_headers(self):
+        scheduler = RateLimitScheduler(burst=5)
+
+        scheduler.observe('github', 200, {'X-RateLimit-Remaining': '3600', 'X-RateLimit-Reset': str(time.time() + 3600)})
+
+        self.assertAlmostEqual(scheduler.bucket('github').rate, 1.0, places=1)
+
+    def test_learns_rate_from_freshdesk_headers(self):
+        scheduler = RateLimitScheduler(burst=5)
+
+        scheduler.observe('freshdesk:example', 201, {'X-RateLimit-Remaining': '120'})
+
+        self.assertAlmostEqual(scheduler.bucket('freshdesk:example').rate, 2.0)
+
+    def test_parks_bucket_on_429(self):
+        scheduler = RateLimitScheduler(burst=5)
+
+        delay = scheduler.observe('freshdesk:example', 429, {'Retry-After': '0.05'})
+        waited = scheduler.acquire('freshdesk:example')
+
+        self.assertEqual(delay, 0.05)
+        self.assertGreater(waited, 0.0)
+        self.assertEqual(scheduler.waits['freshdesk:example'], waited)
+
+    def test_buckets_are_independent(self):
+        scheduler = RateLimitScheduler(burst=5)
+
+        scheduler.observe('freshdesk:first', 429, {'Retry-After': '60'})
+
+        self.assertEqual(scheduler.acquire('freshdesk:second'), 0.0)
+        self.assertEqual(scheduler.acquire('github'), 0.0)
+
+    def test_ignores_missing_or_invalid_headers(self):
+        scheduler = RateLimitScheduler(burst=5)
+
+        self.assertIsNone(scheduler.observe('github', 200, {'X-RateLimit-Remaining': 'n/a'}))
+        self.assertIsNone(scheduler.observe('github', 200, None))
+        self.assertIsNone(scheduler.bucket('github').rate)
+
+
+if __name__ == '__main__':
+    unittest.main()
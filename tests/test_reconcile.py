@@ -0,0 +1,59 @@
+import unittest
+from services.reconcile import reconcile, MISSING, ORPHANED, DIVERGENT, UNLINKED
+from data.models import User
+
+
+def _user(github_username, email, freshdesk_contact_id, bio="Test bio"):
+    return User(
+        id=1,
+        github_username=github_username,
+        name="Test User",
+        email=email,
+        bio=bio,
+        location="Test location",
+        created_at=None,
+        is_recorded_fd=freshdesk_contact_id is not None,
+        freshdesk_contact_id=freshdesk_contact_id
+    )
+
+
+def _contact(contact_id, email):
+    return {"id": contact_id, "name": "Test User", "email": email, "description": "Test bio", "address": "Test location"}
+
+
+class Reconcile_Should(unittest.TestCase):
+
+    def _records(self, contacts, users):
+        return [(kind, user.github_username if user else None, contact_id) for kind, user, contact_id in reconcile(contacts, users)]
+
+    def test_matching_records_are_not_reported(self):
+        records = self._records([_contact(432, "octocat@example.com")], [_user("octocat", "Octocat@example.com", 432)])
+
+        self.assertEqual(records, [])
+
+    def test_reports_missing_divergent_and_orphaned_records(self):
+        contacts = [_contact(432, "octocat@example.com"), _contact(433, "hubot@example.com"), _contact(434, "nobody@example.com")]
+        users = [
+            _user("octocat", "octocat@example.com", 432, bio="New bio"),
+            _user("hubot", "hubot@example.com", 433),
+            _user("monalisa", "monalisa@example.com", 999),
+            _user("newbie", None, None),
+        ]
+
+        records = self._records(contacts, users)
+
+        self.assertEqual(records, [
+            (DIVERGENT, "octocat", 432),
+            (MISSING, "monalisa", None),
+            (MISSING, "newbie", None),
+            (ORPHANED, None, 434),
+        ])
+
+    def test_matches_unlinked_contacts_by_email(self):
+        records = self._records([_contact(432, "octocat@example.com")], [_user("octocat", "octocat@example.com", None)])
+
+        self.assertEqual(records, [(UNLINKED, "octocat", 432)])
+
+
+if __name__ == '__main__':
+    unittest.main()
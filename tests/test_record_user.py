@@ -1,17 +1,20 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from services.record_user import persist_user_info  
+from services.record_user import upsert_user_info, bulk_upsert_user_info
+from services.get_user import get_stale_usernames
+from services.update_user import update_user_recorded_status
 from data.models import User
 from datetime import datetime
 
 class Database_Should(unittest.TestCase):
-    @patch('services.record_user.insert_query')
-    def test_success_persist_user_info(self, mock_insert_query):
-        
-        mock_insert_query.return_value = 1
-        
+    @patch('services.record_user.transaction')
+    def test_upsert_user_info_new_user(self, mock_transaction):
+        mock_cursor = mock_transaction.return_value.__enter__.return_value
+        mock_cursor.rowcount = 1
+        mock_cursor.fetchone.return_value = (1, False, None, None)
+
         test_user_info = User(
-            id=None,  
+            id=None,
             github_username="test",
             name="Test User",
             email="test_user@example.com",
@@ -21,33 +24,26 @@ class Database_Should(unittest.TestCase):
             is_recorded_fd=None,
             freshdesk_contact_id=None
         )
-        user_id = persist_user_info(test_user_info)
-        
-        mock_insert_query.assert_called_once_with(
-            (
-                "INSERT INTO users (github_username, name, email, bio, location, created_at, is_recorded_fd, freshdesk_contact_id) "
-                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
-            ),
-            (
-                "test", 
-                "Test User", 
-                "test_user@example.com", 
-                "Test bio", 
-                "Test location", 
-                None, 
-                0,  
-                None
-            )
+
+        result = upsert_user_info(test_user_info)
+
+        self.assertEqual(result, (1, False, None, None, True))
+        upsert_sql, upsert_params = mock_cursor.execute.call_args_list[0].args
+        self.assertIn("ON DUPLICATE KEY UPDATE", upsert_sql)
+        self.assertEqual(upsert_params, ("test", "Test User", "test_user@example.com", "Test bio", "Test location", None))
+        mock_cursor.execute.assert_called_with(
+            "SELECT id, is_recorded_fd, freshdesk_contact_id, sync_hash FROM users WHERE github_username = ?",
+            ("test",)
         )
-        self.assertEqual(user_id, 1)
 
-    @patch('services.record_user.insert_query')
-    def test_persist_user_info_failure(self, mock_insert_query):
-        
-        mock_insert_query.side_effect = Exception("Database insertion error")
-        
+    @patch('services.record_user.transaction')
+    def test_upsert_user_info_existing_user(self, mock_transaction):
+        mock_cursor = mock_transaction.return_value.__enter__.return_value
+        mock_cursor.rowcount = 2
+        mock_cursor.fetchone.return_value = (1, True, 432, 'hash')
+
         test_user_info = User(
-            id=None,  
+            id=None,
             github_username="test",
             name="Test User",
             email="test_user@example.com",
@@ -57,12 +53,138 @@ class Database_Should(unittest.TestCase):
             is_recorded_fd=None,
             freshdesk_contact_id=None
         )
-        
+
+        self.assertEqual(upsert_user_info(test_user_info), (1, True, 432, 'hash', False))
+
+    @patch('services.record_user.transaction')
+    def test_upsert_user_info_email_taken(self, mock_transaction):
+        mock_cursor = mock_transaction.return_value.__enter__.return_value
+        mock_cursor.rowcount = 0
+        mock_cursor.fetchone.return_value = None
+
+        test_user_info = User(
+            id=None,
+            github_username="test",
+            name="Test User",
+            email="test_user@example.com",
+            bio="Test bio",
+            location="Test location",
+            created_at=None,
+            is_recorded_fd=None,
+            freshdesk_contact_id=None
+        )
+
         with self.assertRaises(Exception) as context:
-            persist_user_info(test_user_info)
-        
-        self.assertEqual(str(context.exception), "Failed to persist user info: Database insertion error")
+            upsert_user_info(test_user_info)
+
+        self.assertEqual(str(context.exception), "Failed to persist user info: email test_user@example.com is already used by another user")
         
+    @patch('services.record_user.insert_many_query')
+    @patch('services.get_user.read_query')
+    def test_bulk_upsert_user_info(self, mock_read_query, mock_insert_many_query):
+        mock_read_query.side_effect = [
+            [("existing", 1, True, 432, "hash")],
+            [("new", 2, False, None, None)],
+        ]
+        users = [
+            User(id=None, github_username="existing", name="Existing User", email=None, bio=None, location=None, created_at=None, is_recorded_fd=None, freshdesk_contact_id=None),
+            User(id=None, github_username="New", name="New User", email=None, bio=None, location=None, created_at=None, is_recorded_fd=None, freshdesk_contact_id=None),
+        ]
+
+        states = bulk_upsert_user_info(users)
+
+        self.assertEqual(states, {"existing": (1, True, 432, "hash", False), "new": (2, False, None, None, True)})
+        self.assertEqual(
+            mock_read_query.call_args_list[0].args,
+            ("SELECT github_username, id, is_recorded_fd, freshdesk_contact_id, sync_hash FROM users WHERE github_username IN (?, ?)", ("existing", "New"))
+        )
+        self.assertEqual(mock_read_query.call_args_list[1].args[1], ("New",))
+        sql, seq_params = mock_insert_many_query.call_args.args
+        self.assertIn("ON DUPLICATE KEY UPDATE", sql)
+        self.assertEqual([params[0] for params in seq_params], ["existing", "New"])
+
+    @patch('services.get_user.read_query')
+    def test_get_stale_usernames(self, mock_read_query):
+        mock_read_query.return_value = [("octocat",), ("hubot",)]
+
+        usernames = get_stale_usernames(100, 3600, 604800, 2592000, 600)
+
+        self.assertEqual(usernames, ["octocat", "hubot"])
+        sql, params = mock_read_query.call_args.args
+        self.assertIn("last_synced_at IS NULL", sql)
+        self.assertIn("last_attempted_at IS NULL", sql)
+        self.assertTrue(sql.endswith("ORDER BY last_attempted_at LIMIT 100"))
+        self.assertEqual(params, (2592000, 3600, 604800, 600))
+
+    @patch('services.update_user.update_query')
+    def test_recorded_status_only_marks_changed_profiles(self, mock_update_query):
+        update_user_recorded_status(1, 432, "hash")
+
+        sql, params = mock_update_query.call_args.args
+        self.assertIn("last_changed_at = IF(sync_hash IS NULL OR sync_hash <=> ?, last_changed_at, NOW())", sql)
+        self.assertLess(sql.index("last_changed_at"), sql.index("sync_hash = ?"))
+        self.assertEqual(params, ("hash", 432, "hash", 1))
+
+    @patch('services.record_user.insert_many_query')
+    @patch('services.get_user.read_query')
+    def test_bulk_upsert_user_info_failure(self, mock_read_query, mock_insert_many_query):
+        mock_read_query.return_value = []
+        mock_insert_many_query.side_effect = Exception("Deadlock found")
+        users = [User(id=None, github_username="new", name=None, email=None, bio=None, location=None, created_at=None, is_recorded_fd=None, freshdesk_contact_id=None)]
+
+        with self.assertRaises(Exception) as context:
+            bulk_upsert_user_info(users)
+
+        self.assertEqual(str(context.exception), "Failed to persist users info: Deadlock found")
+
+    @patch('services.record_user.transaction')
+    def test_upsert_user_info_enqueues_freshdesk_push_in_same_transaction(self, mock_transaction):
+        mock_cursor = mock_transaction.return_value.__enter__.return_value
+        mock_cursor.rowcount = 2
+        mock_cursor.fetchone.return_value = (1, True, 432, 'stale hash')
+
+        test_user_info = User(
+            id=None,
+            github_username="test",
+            name="Test User",
+            email="test_user@example.com",
+            bio="Test bio",
+            location="Test location",
+            created_at=None,
+            is_recorded_fd=None,
+            freshdesk_contact_id=None
+        )
+
+        upsert_user_info(test_user_info, outbox_domain='example')
+
+        self.assertEqual(mock_transaction.call_count, 1)
+        mock_cursor.execute.assert_called_with(
+            "INSERT INTO freshdesk_outbox (user_id, freshdesk_domain) VALUES (?, ?) ON DUPLICATE KEY UPDATE version = version + 1",
+            (1, 'example')
+        )
+
+    @patch('services.record_user.transaction')
+    def test_upsert_user_info_skips_outbox_when_unchanged(self, mock_transaction):
+        mock_cursor = mock_transaction.return_value.__enter__.return_value
+        mock_cursor.rowcount = 0
+        test_user_info = User(
+            id=None,
+            github_username="test",
+            name="Test User",
+            email="test_user@example.com",
+            bio="Test bio",
+            location="Test location",
+            created_at=None,
+            is_recorded_fd=None,
+            freshdesk_contact_id=None
+        )
+        mock_cursor.fetchone.return_value = (1, True, 432, test_user_info.fingerprint())
+
+        upsert_user_info(test_user_info, outbox_domain='example')
+
+        self.assertEqual(mock_cursor.execute.call_count, 2)
+
+
 if __name__ == '__main__':
     unittest.main()
 
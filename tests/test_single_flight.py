@@ -0,0 +1,90 @@
+import time
+import threading
+import unittest
+from services.single_flight import SingleFlight
+
+
+class SingleFlight_Should(unittest.TestCase):
+
+    def _run_concurrently(self, flights, key, func, count):
+        results = []
+        errors = []
+
+        def call():
+            try:
+                results.append(flights.do(key, func))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_shares_one_in_flight_call(self):
+        flights = SingleFlight(window=5)
+        calls = []
+
+        def sync():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'created'
+
+        results, _ = self._run_concurrently(flights, 'octocat', sync, 5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [('created', False)] + [('created', True)] * 4)
+
+    def test_coalesces_repeats_within_window(self):
+        flights = SingleFlight(window=5)
+
+        flights.do('octocat', lambda: 'created')
+
+        self.assertEqual(flights.do('octocat', lambda: 'updated'), ('created', True))
+        self.assertEqual(flights.do('hubot', lambda: 'updated'), ('updated', False))
+
+    def test_runs_again_after_window(self):
+        flights = SingleFlight(window=0)
+
+        flights.do('octocat', lambda: 'created')
+
+        self.assertEqual(flights.do('octocat', lambda: 'unchanged'), ('unchanged', False))
+
+    def test_never_overlaps_calls_of_a_key(self):
+        flights = SingleFlight(window=0)
+        running = []
+        overlaps = []
+        lock = threading.Lock()
+
+        def sync():
+            with lock:
+                running.append(1)
+                if len(running) > 1:
+                    overlaps.append(1)
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+            return 'updated'
+
+        results, _ = self._run_concurrently(flights, 'octocat', sync, 4)
+
+        self.assertEqual(overlaps, [])
+        self.assertEqual(results, [('updated', False)] * 4)
+
+    def test_shares_errors_in_flight_but_retries_after_a_failure(self):
+        flights = SingleFlight(window=5)
+
+        def sync():
+            time.sleep(0.05)
+            raise Exception('Freshdesk API error')
+
+        _, errors = self._run_concurrently(flights, 'octocat', sync, 3)
+
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(flights.do('octocat', lambda: 'created'), ('created', False))
+
+
+if __name__ == '__main__':
+    unittest.main()
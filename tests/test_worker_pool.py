@@ -0,0 +1,99 @@
+import unittest
+import time
+import threading
+from services.worker_pool import run_concurrently, prefetch_in_background
+
+
+class WorkerPool_Should(unittest.TestCase):
+
+    def test_returns_result_for_every_item(self):
+        results = run_concurrently(lambda x: x * 2, range(10), workers=4)
+
+        self.assertEqual(sorted((item, result) for item, result, _ in results), [(i, i * 2) for i in range(10)])
+
+    def test_isolates_errors_per_item(self):
+        def func(item):
+            if item == 'bad':
+                raise Exception("Freshdesk API error")
+            return item
+
+        results = {item: (result, error) for item, result, error in run_concurrently(func, ['good', 'bad'], workers=2)}
+
+        self.assertEqual(results['good'], ('good', None))
+        self.assertIsNone(results['bad'][0])
+        self.assertEqual(str(results['bad'][1]), "Freshdesk API error")
+
+    def test_runs_items_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        results = list(run_concurrently(lambda item: barrier.wait(), range(3), workers=3))
+
+        self.assertTrue(all(error is None for _, _, error in results))
+
+    def test_pulls_items_lazily(self):
+        pulled = []
+
+        def items():
+            for i in range(100):
+                pulled.append(i)
+                yield i
+
+        results = run_concurrently(lambda x: x, items(), workers=2, max_pending=4)
+        next(results)
+
+        self.assertLessEqual(len(pulled), 5)
+
+    def test_yields_started_items_before_a_source_error(self):
+        def items():
+            yield from range(3)
+            raise Exception("Error listing members of organization acme: Not Found")
+
+        done = []
+        with self.assertRaises(Exception) as context:
+            for item, _, _ in run_concurrently(lambda x: time.sleep(0.01) or x, items(), workers=3):
+                done.append(item)
+
+        self.assertEqual(sorted(done), [0, 1, 2])
+        self.assertEqual(str(context.exception), "Error listing members of organization acme: Not Found")
+
+    def test_rejects_invalid_worker_count(self):
+        with self.assertRaises(ValueError):
+            list(run_concurrently(lambda x: x, [1], workers=0))
+
+
+class Prefetch_Should(unittest.TestCase):
+
+    def test_yields_items_in_order(self):
+        self.assertEqual(list(prefetch_in_background(iter(range(50)), max_buffered=3)), list(range(50)))
+
+    def test_stays_bounded_ahead_of_the_consumer(self):
+        produced = []
+
+        def source():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        items = prefetch_in_background(source(), max_buffered=5)
+        next(items)
+        time.sleep(0.1)
+
+        # One item consumed, five buffered and one waiting to be put.
+        self.assertLessEqual(len(produced), 7)
+        items.close()
+
+    def test_raises_source_errors_to_the_consumer(self):
+        def source():
+            yield 'octocat'
+            raise Exception("Error listing members of organization acme: 404")
+
+        items = prefetch_in_background(source(), max_buffered=5)
+
+        self.assertEqual(next(items), 'octocat')
+        with self.assertRaises(Exception) as context:
+            next(items)
+        self.assertEqual(str(context.exception), "Error listing members of organization acme: 404")
+
+
+if __name__ == '__main__':
+    unittest.main()